@@ -0,0 +1,6 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Overhead benchmarks for the SignalFx auto-instrumentors.
+
+Run with ``python -m benchmarks --help``.  See benchmarks/README.md for details.
+"""
@@ -0,0 +1,112 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from collections import OrderedDict
+import argparse
+import sys
+
+from . import harness
+
+# Importing a benchmark module registers its benchmarks.
+from . import (  # noqa
+    decorator,
+    instrumentors,
+    log_injection,
+    propagation,
+    reporting,
+    sampling,
+    scope_managers,
+    server_timing,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measures the per-call time and allocation overhead of SignalFx instrumentation.",
+    )
+    parser.add_argument(
+        "groups", nargs="*", help="benchmark groups to run (default: all)"
+    )
+    parser.add_argument(
+        "-k", dest="keyword", help="only run benchmarks whose name contains this"
+    )
+    parser.add_argument(
+        "-n", "--iterations", type=int, default=2000, help="timed calls per variant"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=100, help="untimed calls made before timing"
+    )
+    parser.add_argument(
+        "--alloc-samples",
+        type=int,
+        default=200,
+        help="calls sampled with tracemalloc per variant (0 to disable)",
+    )
+    parser.add_argument("--save", metavar="PATH", help="write results to a JSON baseline")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="compare results against a JSON baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="percent ns/call increase over the baseline considered a regression (default: 10)",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="list available benchmarks and exit"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    benchmarks = harness.registered(args.groups, args.keyword)
+
+    if args.list:
+        for bench in benchmarks:
+            missing = harness.missing_requirements(bench)
+            note = " (missing: {0})".format(", ".join(missing)) if missing else ""
+            print(harness.key(bench) + note)
+        return 0
+
+    results = OrderedDict()
+    failed = 0
+    for bench in benchmarks:
+        missing = harness.missing_requirements(bench)
+        if missing:
+            print(
+                "skipping {0}: missing {1}".format(harness.key(bench), ", ".join(missing)),
+                file=sys.stderr,
+            )
+            continue
+        try:
+            results[harness.key(bench)] = harness.run(
+                bench, args.iterations, args.warmup, args.alloc_samples
+            )
+        except Exception as e:
+            failed += 1
+            print(
+                "{0} failed: {1!r}".format(harness.key(bench), e), file=sys.stderr
+            )
+
+    print(harness.format_results(results))
+
+    if args.save:
+        harness.dump(results, args.save)
+
+    if args.compare:
+        lines, regressions = harness.compare(
+            results, harness.load(args.compare), args.threshold
+        )
+        print("")
+        print("\n".join(lines))
+        if regressions:
+            print(
+                "\n{0} regression(s) above {1}%".format(len(regressions), args.threshold),
+                file=sys.stderr,
+            )
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Per-call overhead of the @trace decorator with tracing disabled, with the default no-op
+global tracer, and with an active tracer.
+"""
+import os
+
+import opentracing
+
+from signalfx_tracing import settings, utils
+
+from .harness import benchmark
+
+
+def work():
+    return None
+
+
+@benchmark("decorator", "trace")
+def trace_decorator(tracer):
+    previous = opentracing.tracer
+    try:
+        yield "undecorated", work
+
+        settings.reload(dict(os.environ, SIGNALFX_TRACING_ENABLED="false"))
+        yield "tracing disabled", utils.trace(work)
+        settings.reload()
+
+        opentracing.tracer = opentracing.Tracer()
+        yield "no-op tracer", utils.trace(work)
+
+        opentracing.tracer = tracer
+        yield "traced", utils.trace(work)
+    finally:
+        opentracing.tracer = previous
+        settings.reload()
@@ -0,0 +1,210 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Local stand-ins for external services so that instrumentor overhead can be measured without
+a database, cache server, or trace ingest.  The DB-API drivers are registered as the psycopg2 and pymysql
+modules for the lifetime of the benchmark process, so they must be installed before
+dbapi_opentracing is first imported.
+"""
+import contextlib
+import multiprocessing
+import threading
+import socket
+import types
+import sys
+
+try:
+    import socketserver
+except ImportError:  # pragma: no cover
+    import SocketServer as socketserver
+
+try:
+    from http.server import BaseHTTPRequestHandler
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler
+
+
+class Cursor(object):
+    def __init__(self, connection=None, name=None, **kwargs):
+        self.connection = connection
+        self.name = name
+        self.rowcount = -1
+        self.description = None
+
+    def execute(self, query, args=None):
+        self.rowcount = 1
+        return 1
+
+    def executemany(self, query, args):
+        self.rowcount = len(args)
+        return self.rowcount
+
+    def callproc(self, procname, args=()):
+        self.rowcount = 1
+        return args
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Connection(object):
+    def __init__(self, dsn=None, *args, **kwargs):
+        self.dsn = dsn
+        self.db = kwargs.get("database", b"bench")
+
+    def cursor(self, name=None, cursor_factory=None, *args, **kwargs):
+        return (cursor_factory or Cursor)(self, name=name)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_dsn_parameters(self):
+        return {"dbname": "bench"}
+
+
+def _psycopg2_connect(dsn=None, connection_factory=None, **kwargs):
+    return (connection_factory or Connection)(dsn)
+
+
+def _pymysql_connect(*args, **kwargs):
+    return Connection(**kwargs)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def install_dbapi_drivers():
+    """Registers fake psycopg2 and pymysql driver modules in sys.modules"""
+    extensions = _module("psycopg2.extensions", connection=Connection, cursor=Cursor)
+    sql = _module("psycopg2.sql", Composed=type("Composed", (object,), {"seq": ()}))
+    sys.modules["psycopg2"] = _module(
+        "psycopg2", connect=_psycopg2_connect, extensions=extensions, sql=sql
+    )
+    sys.modules["psycopg2.extensions"] = extensions
+    sys.modules["psycopg2.sql"] = sql
+    sys.modules["pymysql"] = _module("pymysql", connect=_pymysql_connect)
+
+
+class _RedisHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough RESP for single command round trips: GETs miss and everything else is OK."""
+
+    def handle(self):
+        null = b"$-1\r\n"
+        while True:
+            header = self.rfile.readline()
+            if not header:
+                return
+            if not header.startswith(b"*"):
+                continue
+            args = []
+            for _ in range(int(header[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            command = args[0].upper() if args else b""
+            if command == b"GET":
+                self.wfile.write(null)
+            elif command == b"HELLO":
+                # RESP3 replies with a map, RESP2 with a flat array of its pairs
+                proto = args[1] if len(args) > 1 else b"2"
+                prefix = b"%1" if proto == b"3" else b"*2"
+                null = b"_\r\n" if proto == b"3" else b"$-1\r\n"
+                self.wfile.write(prefix + b"\r\n$5\r\nproto\r\n:" + proto + b"\r\n")
+            else:
+                self.wfile.write(b"+OK\r\n")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+@contextlib.contextmanager
+def redis_server():
+    """Runs a fake Redis server on an ephemeral localhost port, yielding the port"""
+    server = _ThreadingTCPServer(("127.0.0.1", 0), _RedisHandler)
+    server.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    """Reads and discards posted bodies, keeping connections alive"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_http_sink(conn):
+    server = _ThreadingTCPServer(("127.0.0.1", 0), _SinkHandler)
+    conn.send(server.server_address[1])
+    server.serve_forever()
+
+
+@contextlib.contextmanager
+def http_sink():
+    """
+    Runs an HTTP server accepting and discarding posts on an ephemeral localhost port in a child process, so
+    that its CPU time isn't attributed to the benchmark, yielding its URL.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve_http_sink, args=(child,))
+    process.daemon = True
+    process.start()
+    try:
+        yield "http://127.0.0.1:{}/v1/trace".format(parent.recv())
+    finally:
+        process.terminate()
+        process.join()
+
+
+def _serve_udp_sink(conn):
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    conn.send(sink.getsockname()[1])
+    while True:
+        sink.recv(65535)
+
+
+@contextlib.contextmanager
+def udp_sink():
+    """Runs a UDP socket discarding datagrams on an ephemeral localhost port in a child process, yielding its port"""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve_udp_sink, args=(child,))
+    process.daemon = True
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        process.terminate()
+        process.join()
@@ -0,0 +1,264 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Measurement primitives shared by all benchmark modules.
+
+A benchmark is a generator function registered with ``@benchmark(group, name)``.  It is invoked with a
+``CountingTracer`` and yields ``(variant, call)`` pairs, where ``call`` is a zero-argument callable that performs
+one unit of work (e.g. a single HTTP request).  Each yielded call is measured before the generator is resumed,
+so benchmarks are free to change global state (instrument, uninstrument, swap tracers) between variants.
+The first variant of a benchmark is its baseline and the overhead of every other variant is reported against it.
+"""
+from collections import OrderedDict, namedtuple
+from threading import Lock
+import contextlib
+import importlib
+import platform
+import time
+import json
+import gc
+
+from opentracing.mocktracer import MockTracer
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+
+Measurement = namedtuple("Measurement", "ns_per_call bytes_per_call spans_per_call cpu_ns_per_call")
+Measurement.__new__.__defaults__ = (None,)  # Baselines saved before CPU time was measured
+
+Benchmark = namedtuple("Benchmark", "group name requires variants")
+
+_benchmarks = OrderedDict()
+
+
+def benchmark(group, name, requires=()):
+    """Registers a variant-yielding generator function as a benchmark."""
+
+    def register(variants):
+        _benchmarks[(group, name)] = Benchmark(group, name, tuple(requires), variants)
+        return variants
+
+    return register
+
+
+def registered(groups=None, keyword=None):
+    """Returns all registered benchmarks, optionally filtered by group and name substring"""
+    return [
+        bench
+        for bench in _benchmarks.values()
+        if (not groups or bench.group in groups)
+        and (not keyword or keyword in bench.name)
+    ]
+
+
+def missing_requirements(bench):
+    """Returns the names of the modules a benchmark requires that can't be imported"""
+    missing = []
+    for module in bench.requires:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            missing.append(module)
+    return missing
+
+
+class CountingTracer(MockTracer):
+    """
+    An in-process tracer stand-in.  Spans are fully created and finished as with MockTracer,
+    but are only counted upon finishing so that long runs don't accumulate memory.
+    """
+
+    def __init__(self, scope_manager=None):
+        super(CountingTracer, self).__init__(scope_manager)
+        self._count_lock = Lock()
+        self.finished_count = 0
+
+    def _append_finished_span(self, span):
+        with self._count_lock:
+            self.finished_count += 1
+
+    def reset(self):
+        with self._count_lock:
+            self.finished_count = 0
+
+
+@contextlib.contextmanager
+def null_context():
+    yield None
+
+
+def instrumentor_overhead(library, tracer, make_call, context=null_context):
+    """
+    Standard variants for an auto-instrumentor: the same call made before and after
+    signalfx_tracing.instrument(), with `make_call(state)` invoked anew for each so that
+    clients and apps are created under the desired instrumentation state.
+    """
+    from signalfx_tracing import instrument, uninstrument
+
+    with context() as state:
+        yield "uninstrumented", make_call(state)
+        instrument(tracer, **{library: True})
+        try:
+            yield "instrumented", make_call(state)
+        finally:
+            uninstrument(library)
+
+
+def _allocated_bytes_per_call(call, samples):
+    """
+    Average peak of traced memory allocated during a single call, which captures the transient
+    allocations made by instrumentation even when they are freed before returning.
+    """
+    if not samples or tracemalloc is None or not hasattr(tracemalloc, "reset_peak"):
+        return None
+
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(samples):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+    return float(total) / samples
+
+
+def measure(call, tracer, iterations, warmup=100, alloc_samples=200):
+    for _ in range(warmup):
+        call()
+
+    tracer.reset()
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start, cpu_start = time.perf_counter(), time.process_time()
+        for _ in range(iterations):
+            call()
+        elapsed = time.perf_counter() - start
+        cpu_elapsed = time.process_time() - cpu_start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    spans = float(tracer.finished_count) / iterations
+    return Measurement(
+        ns_per_call=elapsed * 1e9 / iterations,
+        bytes_per_call=_allocated_bytes_per_call(call, alloc_samples),
+        spans_per_call=spans,
+        cpu_ns_per_call=cpu_elapsed * 1e9 / iterations,
+    )
+
+
+def run(bench, iterations, warmup=100, alloc_samples=200):
+    """Measures every variant of a benchmark, returning an OrderedDict of Measurements by variant"""
+    tracer = CountingTracer()
+    results = OrderedDict()
+    variants = bench.variants(tracer)
+    try:
+        for variant, call in variants:
+            results[variant] = measure(call, tracer, iterations, warmup, alloc_samples)
+    finally:
+        # restores any instrumentation state if measuring raised
+        variants.close()
+    return results
+
+
+def key(bench):
+    return "{0}/{1}".format(bench.group, bench.name)
+
+
+def dump(results, path):
+    """Writes {benchmark key: {variant: Measurement}} results as a JSON baseline file"""
+    document = dict(
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        results={
+            name: {variant: m._asdict() for variant, m in variants.items()}
+            for name, variants in results.items()
+        },
+    )
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        document = json.load(f)
+    return {
+        name: {variant: Measurement(**m) for variant, m in variants.items()}
+        for name, variants in document["results"].items()
+    }
+
+
+def _format_optional(value):
+    return "-" if value is None else "{0:.0f}".format(value)
+
+
+def format_results(results):
+    lines = [
+        "{0:<36} {1:<16} {2:>12} {3:>12} {4:>12} {5:>12} {6:>12} {7:>7}".format(
+            "benchmark", "variant", "ns/call", "overhead ns", "cpu ns/call", "bytes/call", "overhead B", "spans"
+        )
+    ]
+    for name, variants in results.items():
+        baseline = None
+        for variant, m in variants.items():
+            if baseline is None:
+                baseline = m
+                overhead_ns = overhead_bytes = "-"
+            else:
+                overhead_ns = "{0:+.0f}".format(m.ns_per_call - baseline.ns_per_call)
+                if m.bytes_per_call is None or baseline.bytes_per_call is None:
+                    overhead_bytes = "-"
+                else:
+                    overhead_bytes = "{0:+.0f}".format(m.bytes_per_call - baseline.bytes_per_call)
+            lines.append(
+                "{0:<36} {1:<16} {2:>12.0f} {3:>12} {4:>12} {5:>12} {6:>12} {7:>7.2f}".format(
+                    name,
+                    variant,
+                    m.ns_per_call,
+                    overhead_ns,
+                    _format_optional(m.cpu_ns_per_call),
+                    _format_optional(m.bytes_per_call),
+                    overhead_bytes,
+                    m.spans_per_call,
+                )
+            )
+    return "\n".join(lines)
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results against a loaded baseline, returning report lines and the list of
+    (benchmark, variant) pairs whose ns/call regressed by more than `threshold` percent.
+    """
+    lines = [
+        "{0:<36} {1:<16} {2:>12} {3:>12} {4:>9} {5:>9}".format(
+            "benchmark", "variant", "baseline ns", "current ns", "change", "spans"
+        )
+    ]
+    regressions = []
+    for name, variants in results.items():
+        for variant, m in variants.items():
+            previous = baseline.get(name, {}).get(variant)
+            if previous is None:
+                continue
+            change = (m.ns_per_call - previous.ns_per_call) / previous.ns_per_call * 100
+            flag = ""
+            if change > threshold:
+                regressions.append((name, variant))
+                flag = " !"
+            spans = "{0:.2f}".format(m.spans_per_call)
+            if m.spans_per_call != previous.spans_per_call:
+                spans = "{0:.2f}->{1:.2f}".format(previous.spans_per_call, m.spans_per_call)
+            lines.append(
+                "{0:<36} {1:<16} {2:>12.0f} {3:>12.0f} {4:>+8.1f}% {5:>9}{6}".format(
+                    name, variant, previous.ns_per_call, m.ns_per_call, change, spans, flag
+                )
+            )
+    return lines, regressions
@@ -0,0 +1,233 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Per-call overhead of each auto-instrumentor, measured as the same request made
+before and after signalfx_tracing.instrument().
+"""
+import contextlib
+import asyncio
+import types
+import sys
+
+from .harness import benchmark, instrumentor_overhead
+from . import fakes
+
+# dbapi_opentracing binds to the driver classes when first imported
+fakes.install_dbapi_drivers()
+
+
+@benchmark("instrumentors", "flask", requires=("flask", "flask_opentracing"))
+def flask_request(tracer):
+    def make_call(_):
+        import flask
+
+        app = flask.Flask("bench")
+
+        @app.route("/hello/<name>")
+        def hello(name):
+            return "Hello {}".format(name)
+
+        client = app.test_client()
+        return lambda: client.get("/hello/world")
+
+    return instrumentor_overhead("flask", tracer, make_call)
+
+
+def _django_view(request, name):
+    from django.http import HttpResponse
+
+    return HttpResponse("Hello {}".format(name))
+
+
+@contextlib.contextmanager
+def _django_settings():
+    import django
+    from django.conf import settings
+    from django.urls import path
+
+    urls = types.ModuleType("benchmarks._django_urls")
+    urls.urlpatterns = [path("hello/<name>", _django_view)]
+    sys.modules[urls.__name__] = urls
+
+    if not settings.configured:
+        settings.configure(
+            DEBUG=False,
+            ALLOWED_HOSTS=["*"],
+            ROOT_URLCONF=urls.__name__,
+            MIDDLEWARE=[],
+            INSTALLED_APPS=[],
+            SECRET_KEY="benchmarks",
+        )
+        django.setup()
+    yield
+
+
+@benchmark("instrumentors", "django", requires=("django", "django_opentracing"))
+def django_request(tracer):
+    def make_call(_):
+        from django.test import Client
+
+        client = Client()
+        return lambda: client.get("/hello/world")
+
+    return instrumentor_overhead("django", tracer, make_call, _django_settings)
+
+
+@benchmark("instrumentors", "falcon", requires=("falcon",))
+def falcon_request(tracer):
+    def make_call(_):
+        import falcon
+        from falcon import testing
+
+        class HelloResource(object):
+            def on_get(self, req, resp, name):
+                resp.body = "Hello {}".format(name)
+
+        app = falcon.API()
+        app.add_route("/hello/{name}", HelloResource())
+        client = testing.TestClient(app)
+        return lambda: client.simulate_get("/hello/world")
+
+    return instrumentor_overhead("falcon", tracer, make_call)
+
+
+@contextlib.contextmanager
+def _event_loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        yield loop
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+@benchmark("instrumentors", "tornado", requires=("tornado", "tornado_opentracing"))
+def tornado_request(tracer):
+    """A full localhost round trip, so both server and AsyncHTTPClient spans are included"""
+
+    def make_call(loop):
+        import tornado.web
+        from tornado.httpclient import AsyncHTTPClient
+        from tornado.httpserver import HTTPServer
+        from tornado.testing import bind_unused_port
+
+        class HelloHandler(tornado.web.RequestHandler):
+            def get(self, name):
+                self.write("Hello {}".format(name))
+
+        async def start():
+            app = tornado.web.Application([(r"/hello/(\w+)", HelloHandler)])
+            sock, port = bind_unused_port()
+            server = HTTPServer(app)
+            server.add_sockets([sock])
+            return AsyncHTTPClient(force_instance=True), port
+
+        client, port = loop.run_until_complete(start())
+        url = "http://127.0.0.1:{}/hello/world".format(port)
+        return lambda: loop.run_until_complete(client.fetch(url))
+
+    return instrumentor_overhead("tornado", tracer, make_call, _event_loop)
+
+
+@benchmark("instrumentors", "requests", requires=("requests", "requests_opentracing"))
+def requests_session(tracer):
+    """Requests made through an in-process transport adapter, so no socket I/O is measured"""
+
+    def make_call(_):
+        import requests
+        from requests.adapters import BaseAdapter
+
+        class LocalAdapter(BaseAdapter):
+            def send(self, request, **kwargs):
+                response = requests.Response()
+                response.status_code = 200
+                response._content = b"Hello world"
+                response.request = request
+                response.url = request.url
+                return response
+
+            def close(self):
+                pass
+
+        session = requests.Session()
+        session.mount("http://", LocalAdapter())
+        return lambda: session.get("http://bench.local/hello/world")
+
+    return instrumentor_overhead("requests", tracer, make_call)
+
+
+@benchmark("instrumentors", "psycopg2", requires=("dbapi_opentracing",))
+def psycopg2_execute(tracer):
+    def make_call(_):
+        import psycopg2
+
+        cursor = psycopg2.connect("dbname=bench").cursor()
+        return lambda: cursor.execute("SELECT * FROM bench WHERE id = %s", (1,))
+
+    return instrumentor_overhead("psycopg2", tracer, make_call)
+
+
+@benchmark("instrumentors", "pymysql", requires=("dbapi_opentracing",))
+def pymysql_execute(tracer):
+    def make_call(_):
+        import pymysql
+
+        cursor = pymysql.connect(database=b"bench").cursor()
+        return lambda: cursor.execute("SELECT * FROM bench WHERE id = %s", (1,))
+
+    return instrumentor_overhead("pymysql", tracer, make_call)
+
+
+@benchmark("instrumentors", "redis", requires=("redis", "redis_opentracing"))
+def redis_get(tracer):
+    def make_call(port):
+        import redis
+
+        client = redis.StrictRedis(host="127.0.0.1", port=port)
+        return lambda: client.get("key")
+
+    return instrumentor_overhead("redis", tracer, make_call, fakes.redis_server)
+
+
+@contextlib.contextmanager
+def _mockupdb_server():
+    from mockupdb import MockupDB
+
+    server = MockupDB(auto_ismaster={"maxWireVersion": 13})
+    server.autoresponds("ping")
+    server.run()
+    try:
+        yield server.uri
+    finally:
+        server.stop()
+
+
+@benchmark(
+    "instrumentors", "pymongo", requires=("pymongo", "pymongo_opentracing", "mockupdb")
+)
+def pymongo_command(tracer):
+    def make_call(uri):
+        import pymongo
+
+        client = pymongo.MongoClient(uri)
+        return lambda: client.bench.command("ping")
+
+    return instrumentor_overhead("pymongo", tracer, make_call, _mockupdb_server)
+
+
+@benchmark("instrumentors", "celery", requires=("celery", "celery_opentracing"))
+def celery_eager_task(tracer):
+    def make_call(_):
+        import celery
+
+        app = celery.Celery("bench", broker="memory://", backend="cache+memory://")
+        app.conf.task_always_eager = True
+
+        @app.task
+        def add(x, y):
+            return x + y
+
+        # celery_opentracing expects request headers, which eager requests only have when given
+        return lambda: add.apply((1, 2), headers={}).get()
+
+    return instrumentor_overhead("celery", tracer, make_call)
@@ -0,0 +1,132 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Cost of emitting a formatted log record within an active span, without trace context injection and
+with eager and lazy fields, of records discarded by handler levels, and of the text and JSON formats.
+Records share a span, as the many records of a request do, except for the span-per-record benchmark
+of the first record of each span.  Records per second are 1e9 / ns per call.
+"""
+import contextlib
+import importlib
+import io
+import logging
+
+from .harness import benchmark
+
+
+@contextlib.contextmanager
+def _injection(tracer, enabled, lazy=False):
+    instrument = importlib.import_module("signalfx_tracing.libraries.logging_.instrument")
+
+    orig = dict(instrument.config.__dict__)
+    # instrument() configures the root logger, whose handler would fail to format records without injection
+    root = logging.getLogger()
+    root_handlers, root_level = root.handlers[:], root.level
+    instrument.config.injection_enabled = enabled
+    instrument.config.lazy_fields = lazy
+    instrument.instrument(tracer)
+    try:
+        yield
+    finally:
+        instrument.uninstrument()
+        instrument.config.__dict__ = orig
+        root.handlers[:] = root_handlers
+        root.setLevel(root_level)
+
+
+def _logger(formatter):
+    """A DEBUG logger with a single INFO handler using the formatter, or format string, and its stream"""
+    logger = logging.getLogger("benchmarks.log_injection")
+    logger.handlers = []
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setLevel(logging.INFO)
+    if not isinstance(formatter, logging.Formatter):
+        formatter = logging.Formatter(formatter)
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    return logger, handler.stream
+
+
+# constants.logging_format without its trace context fields
+_plain_format = "%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] - %(message)s"
+
+
+_modes = (
+    ("disabled", False, False),
+    ("enabled", True, False),
+    ("lazy", True, True),
+)
+
+
+def _variants(tracer, level, span_per_record=False):
+    """
+    Yields (variant, call) without injection and with each kind of fields, logging at the level within an
+    active span shared by all calls, or a new one for each call if span_per_record.
+    """
+    from signalfx_tracing import constants
+
+    for variant, enabled, lazy in _modes:
+        with _injection(tracer, enabled, lazy):
+            logger, stream = _logger(constants.logging_format if enabled else _plain_format)
+
+            def log():
+                logger.log(level, "request handled")
+                stream.seek(0)
+                stream.truncate()
+
+            if span_per_record:
+
+                def call():
+                    with tracer.start_active_span("logging"):
+                        log()
+
+                yield variant, call
+            else:
+                with tracer.start_active_span("logging"):
+                    yield variant, log
+
+
+@benchmark("logging", "injection")
+def injection(tracer):
+    return _variants(tracer, logging.INFO)
+
+
+@benchmark("logging", "filtered")
+def filtered(tracer):
+    """DEBUG records of a DEBUG logger whose only handler is at INFO"""
+    return _variants(tracer, logging.DEBUG)
+
+
+@benchmark("logging", "span-per-record")
+def span_per_record(tracer):
+    """Records that are the first of their span, whose ids are formatted for them"""
+    return _variants(tracer, logging.INFO, span_per_record=True)
+
+
+def _formatters():
+    """Yields (variant, formatter) for the text format and the JSON format with each available encoder"""
+    from signalfx_tracing import constants
+    from signalfx_tracing.libraries.logging_ import json_formatter
+
+    yield "text", logging.Formatter(constants.logging_format)
+    yield "json", json_formatter.JSONFormatter(encode=json_formatter._json_dumps)
+    if json_formatter.orjson is not None:
+        yield "json-orjson", json_formatter.JSONFormatter(encode=json_formatter._orjson_dumps)
+
+
+@benchmark("logging", "format")
+def formats(tracer):
+    """Formatted records with injected trace context, by format"""
+    with _injection(tracer, True):
+        for variant, formatter in _formatters():
+            logger, stream = _logger(formatter)
+
+            def call():
+                logger.info("request handled")
+                stream.seek(0)
+                stream.truncate()
+
+            with tracer.start_active_span("logging"):
+                yield variant, call
@@ -0,0 +1,54 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Span context extraction from the headers of a typical request, with and without B3 headers, comparing
+the B3 codec's scan of every header with the lookups of only its own by utils.extract_span_context().
+"""
+from .harness import benchmark
+
+
+_request_headers = {
+    "Host": "example.com",
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:81.0) Gecko/20100101 Firefox/81.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Cookie": "session=0123456789abcdef",
+    "Upgrade-Insecure-Requests": "1",
+    "Cache-Control": "max-age=0",
+    "X-Forwarded-For": "203.0.113.195",
+    "X-Forwarded-Proto": "https",
+    "X-Request-Id": "f058ebd6-02f7-4d3f-942e-904344e8cde5",
+}
+
+_b3_headers = {"X-B3-TraceId": "463ac35c9f6413ad", "X-B3-SpanId": "a2fb4a1d1a96d312", "X-B3-Sampled": "1"}
+
+
+def _variants(headers):
+    """Yields (variant, call) extracting from the headers, which are looked up case-insensitively as requests do"""
+    from opentracing import Format
+    from jaeger_client import Tracer
+    from jaeger_client.codecs import B3Codec
+    from jaeger_client.reporter import NullReporter
+    from jaeger_client.sampler import ConstSampler
+
+    from signalfx_tracing.utils import extract_span_context
+
+    codecs = {Format.HTTP_HEADERS: B3Codec()}
+    tracer = Tracer("benchmarks", NullReporter(), ConstSampler(True), extra_codecs=codecs)
+    get_header = {name.lower(): value for name, value in headers.items()}.get
+    try:
+        yield "codec", lambda: tracer.extract(Format.HTTP_HEADERS, headers)
+        yield "lookups", lambda: extract_span_context(tracer, get_header, lambda: headers)
+    finally:
+        tracer.close()
+
+
+@benchmark("propagation", "extract_missing", requires=("jaeger_client",))
+def extract_missing(_):
+    return _variants(dict(_request_headers))
+
+
+@benchmark("propagation", "extract_b3", requires=("jaeger_client",))
+def extract_b3(_):
+    return _variants(dict(_request_headers, **_b3_headers))
@@ -0,0 +1,94 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Export cost of finished jaeger spans sent to local HTTP and UDP sinks, by reporter batch size, compression,
+and transport.  Each call reports 100 spans and waits for them to be flushed, so ns/call and cpu ns/call
+divided by 100 are the time and CPU per span, and 1e11 / ns/call is the spans exported per second.
+"""
+from .harness import benchmark
+
+spans_per_call = 100
+
+
+def _finished_spans():
+    from jaeger_client import Tracer
+    from jaeger_client.reporter import NullReporter
+    from jaeger_client.sampler import ConstSampler
+
+    tracer = Tracer("benchmarks", NullReporter(), ConstSampler(True))
+    spans = []
+    for i in range(spans_per_call):
+        with tracer.start_span("span") as span:
+            span.set_tag("index", i)
+            span.set_tag("http.url", "http://localhost/users/{}".format(i))
+        spans.append(span)
+    return spans
+
+
+def _jaeger_config(url, batch_size):
+    from jaeger_client import Config
+
+    return Config(
+        dict(
+            service_name="benchmarks",
+            jaeger_endpoint=url,
+            reporter_batch_size=batch_size,
+            reporter_queue_size=spans_per_call * 10,
+            reporter_flush_interval=None,
+        ),
+        validate=True,
+    )
+
+
+def _export(reporter, spans):
+    """Yields the call reporting and flushing spans with a reporter, closing it once measured"""
+    reporter.set_process("benchmarks", {}, 1024)
+
+    def call():
+        for span in spans:
+            reporter.report_span(span)
+        reporter.flush()
+
+    try:
+        yield call
+    finally:
+        reporter.close()
+
+
+@benchmark("reporting", "http_export", requires=("jaeger_client",))
+def http_export(_):
+    from signalfx_tracing.reporting import create_reporter
+
+    from .fakes import http_sink
+
+    spans = _finished_spans()
+    with http_sink() as url:
+        for variant, batch_size, compression in (
+            ("batch_10", 10, False),
+            ("batch_100", 100, False),
+            ("batch_100_gzip", 100, True),
+        ):
+            reporter = create_reporter(_jaeger_config(url, batch_size), compression=compression)
+            for call in _export(reporter, spans):
+                yield variant, call
+
+
+@benchmark("reporting", "transports", requires=("jaeger_client",))
+def transports(_):
+    from signalfx_tracing.reporting import UDP, create_reporter, create_sender
+
+    from .fakes import http_sink, udp_sink
+
+    spans = _finished_spans()
+    with http_sink() as url:
+        for call in _export(create_reporter(_jaeger_config(url, spans_per_call)), spans):
+            yield "http", call
+
+    with udp_sink() as port:
+        # A whole batch per datagram, and datagrams fitting an Ethernet MTU
+        for variant, max_packet_size in (("udp", 65000), ("udp_mtu", 1472)):
+            config = _jaeger_config(None, spans_per_call)
+            sender = create_sender(
+                config, UDP, max_packet_size=max_packet_size, agent_host="127.0.0.1", agent_port=port
+            )
+            for call in _export(create_reporter(config, sender=sender), spans):
+                yield variant, call
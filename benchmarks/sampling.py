@@ -0,0 +1,58 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Instrumentation cost for sampled and unsampled spans of a jaeger tracer whose spans are discarded
+by a NullReporter, showing what is saved by skipping the tags of unsampled spans.
+"""
+from .harness import benchmark
+
+
+def _tracers():
+    """Yields (variant, tracer) for a const sampler that samples everything and one that samples nothing"""
+    from jaeger_client import Tracer
+    from jaeger_client.reporter import NullReporter
+    from jaeger_client.sampler import ConstSampler
+
+    for variant, decision in (("sampled", True), ("unsampled", False)):
+        tracer = Tracer("benchmarks", NullReporter(), ConstSampler(decision))
+        try:
+            yield variant, tracer
+        finally:
+            tracer.close()
+
+
+@benchmark("sampling", "error_tags", requires=("jaeger_client",))
+def error_tags(_):
+    import signalfx_tracing.patch_span  # noqa
+
+    for variant, tracer in _tracers():
+
+        def call():
+            try:
+                with tracer.start_active_span("failing"):
+                    raise ValueError("failed")
+            except ValueError:
+                pass
+
+        yield variant, call
+
+
+@benchmark("sampling", "falcon", requires=("jaeger_client", "falcon"))
+def falcon_request(_):
+    import falcon
+    from falcon import testing
+
+    from signalfx_tracing import instrument, uninstrument
+
+    class HelloResource(object):
+        def on_get(self, req, resp, name):
+            resp.body = "Hello {}".format(name)
+
+    for variant, tracer in _tracers():
+        instrument(tracer, falcon=True)
+        try:
+            app = falcon.API()
+            app.add_route("/hello/{name}", HelloResource())
+            client = testing.TestClient(app)
+            yield variant, lambda: client.simulate_get("/hello/world?q=1")
+        finally:
+            uninstrument("falcon")
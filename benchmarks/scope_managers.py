@@ -0,0 +1,45 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Cost of active span lookup and of scope activation under each SIGNALFX_SCOPE_MANAGER choice,
+outside of any asyncio task or greenlet.
+"""
+from opentracing.mocktracer import MockTracer
+
+from signalfx_tracing import scope_managers
+
+from .harness import benchmark
+
+
+def _scope_managers():
+    """Yields (name, scope manager class) for each distinct, importable choice"""
+    seen = set()
+    for name in scope_managers.scope_manager_names:
+        if name == scope_managers.AUTO:
+            continue
+        try:
+            cls = scope_managers.scope_manager_class(name)
+        except ImportError:
+            continue
+        if cls not in seen:
+            seen.add(cls)
+            yield name, cls
+
+
+@benchmark("scope_managers", "active_span")
+def active_span(_):
+    for name, cls in _scope_managers():
+        tracer = MockTracer(cls())
+        with tracer.start_active_span("active"):
+            yield name, lambda: tracer.active_span
+
+
+@benchmark("scope_managers", "activate")
+def activate(_):
+    for name, cls in _scope_managers():
+        tracer = MockTracer(cls())
+        span = tracer.start_span("activated")
+
+        def call():
+            tracer.scope_manager.activate(span, False).close()
+
+        yield name, call
@@ -0,0 +1,30 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Per-response cost of the Server-Timing traceparent headers, comparing the former formatting of each
+padded hex id before the header value with the single format of the shared builder.
+"""
+from .harness import benchmark
+
+
+@benchmark("server_timing", "headers")
+def headers(_):
+    from opentracing.mocktracer import MockTracer
+
+    from signalfx_tracing.utils import padded_hex, server_timing_headers
+
+    span = MockTracer().start_span("response")
+
+    def formatted_ids():
+        return (
+            ("Access-Control-Expose-Headers", "Server-Timing"),
+            (
+                "Server-Timing",
+                'traceparent;desc="00-{trace_id}-{span_id}-01"'.format(
+                    trace_id=padded_hex(span.context.trace_id),
+                    span_id=padded_hex(span.context.span_id),
+                ),
+            ),
+        )
+
+    yield "format_ids", formatted_ids
+    yield "shared_builder", lambda: server_timing_headers(span)
@@ -51,7 +51,13 @@ def flake8(session):
     session.install("flake8")
     pip_freeze(session)
     session.run(
-        "flake8", "setup.py", "scripts", "signalfx_tracing", "tests", "noxfile.py"
+        "flake8",
+        "setup.py",
+        "scripts",
+        "signalfx_tracing",
+        "tests",
+        "benchmarks",
+        "noxfile.py",
     )
 
 
@@ -64,6 +70,26 @@ def unit(session):
     )
 
 
+@nox.session(python="3.7", reuse_venv=True)
+def benchmarks(session):
+    build(session)
+    session.install(
+        sdist,
+        "celery",
+        "django",
+        "falcon>=2.0,<3.0",
+        "flask",
+        "mockupdb",
+        "pymongo",
+        "redis",
+        "requests",
+        "tornado>=6.0,<7.0",
+    )
+    session.run("sfx-py-trace-bootstrap")
+    pip_freeze(session)
+    session.run("python", "-m", "benchmarks", *session.posargs)
+
+
 @nox.session(python=("2.7", "3.5", "3.6", "3.7"), reuse_venv=True)
 def bootstrap_with_target(session):
     build(session)
@@ -221,6 +247,15 @@ def falcon_via_bootstrap(session):
     test_falcon(session)
 
 
+@nox.session(python=("3.6", "3.7"), reuse_venv=True)
+def falcon3_via_bootstrap(session):
+    install_unit_tests(session, "falcon>=3.0,<4.0", "requests")
+    session.run("sfx-py-trace-bootstrap")
+    pip_check(session)
+    pip_freeze(session)
+    test_falcon(session)
+
+
 def test_flask(session):
     session.run("pytest", "tests/unit/libraries/flask_")
     session.run("pytest", "tests/integration/flask_")
@@ -5,7 +5,7 @@ import os.path
 import sys
 import os
 
-from signalfx_tracing import utils
+from signalfx_tracing import settings
 
 ap = ArgumentParser()
 ap.add_argument(
@@ -25,7 +25,7 @@ def main():
     if args.token:
         os.environ["SIGNALFX_ACCESS_TOKEN"] = args.token
 
-    if utils.is_truthy(os.environ.get("SIGNALFX_TRACING_ENABLED", True)):
+    if settings.get().tracing_enabled:
         site_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "site_")
         py_path = os.environ.get("PYTHONPATH", "")
         os.environ["PYTHONPATH"] = (
@@ -5,11 +5,11 @@ import traceback
 import os.path
 import sys
 
-from signalfx_tracing import auto_instrument, create_tracer
-from signalfx_tracing.utils import get_module, TracerProxy
+from signalfx_tracing import auto_instrument, create_tracer, settings, startup_profile
+from signalfx_tracing.utils import create_fork_safe_tracer, get_module, TracerProxy
 
 
-access_token = os.environ.get("SIGNALFX_ACCESS_TOKEN")
+access_token = settings.get().access_token
 
 
 def create_celery_tracer():
@@ -32,10 +32,16 @@ if (
     and sys.argv[0].split(os.path.sep)[-1] == "celery"
     and "worker" in sys.argv
 ):
-    create_celery_tracer()
+    with startup_profile.phase("sitecustomize"):
+        create_celery_tracer()
 else:
     try:
-        auto_instrument(create_tracer(access_token=access_token, set_global=True))
+        with startup_profile.phase("sitecustomize"):
+            with startup_profile.phase("create_tracer"):
+                # Replaced in each forked worker of pre-fork servers like gunicorn and uwsgi
+                tracer = create_fork_safe_tracer(access_token=access_token, set_global=True)
+            with startup_profile.phase("auto_instrument"):
+                auto_instrument(tracer)
     except Exception:
         print(traceback.format_exc())
 
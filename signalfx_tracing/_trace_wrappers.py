@@ -0,0 +1,93 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Python 3.6+ @trace implementations for generator, coroutine, and async generator functions,
+whose bodies run after the decorated call returns.  Their spans are started upon first resumption
+and finished upon exhaustion, error, or closing, and are only active while the body is running.
+"""
+import inspect
+
+
+def traced_callable(function):
+    """Returns the span-managing call for the type of function, or None if it's a regular function"""
+    function = getattr(function, "__func__", function)  # classmethod and staticmethod
+    if inspect.isasyncgenfunction(function):
+        return traced_async_generator
+    if inspect.iscoroutinefunction(function):
+        return traced_coroutine
+    if inspect.isgeneratorfunction(function):
+        return traced_generator
+    return None
+
+
+def _resume(scope_manager, span, method, *args):
+    # Not a with statement, whose exit would tag StopIteration as an error
+    scope = scope_manager.activate(span, False)
+    try:
+        return method(*args)
+    finally:
+        scope.close()
+
+
+def traced_generator(tracer, operation_name, tags, wrapped, args, kwargs):
+    generator = wrapped(*args, **kwargs)
+    scope_manager = tracer.scope_manager
+
+    def traced():
+        with tracer.start_span(operation_name, tags=tags) as span:
+            try:
+                value = _resume(scope_manager, span, generator.send, None)
+                while True:
+                    try:
+                        sent = yield value
+                    except GeneratorExit:
+                        _resume(scope_manager, span, generator.close)
+                        return
+                    except BaseException as error:
+                        value = _resume(scope_manager, span, generator.throw, error)
+                    else:
+                        value = _resume(scope_manager, span, generator.send, sent)
+            except StopIteration as stop:
+                return stop.value
+
+    return traced()
+
+
+async def traced_coroutine(tracer, operation_name, tags, wrapped, args, kwargs):
+    with tracer.start_active_span(operation_name, tags=tags):
+        return await wrapped(*args, **kwargs)
+
+
+async def _aresume(scope_manager, span, method, *args):
+    scope = scope_manager.activate(span, False)
+    try:
+        return await method(*args)
+    finally:
+        scope.close()
+
+
+def traced_async_generator(tracer, operation_name, tags, wrapped, args, kwargs):
+    generator = wrapped(*args, **kwargs)
+    scope_manager = tracer.scope_manager
+
+    async def traced():
+        with tracer.start_span(operation_name, tags=tags) as span:
+            try:
+                value = await _aresume(scope_manager, span, generator.asend, None)
+                while True:
+                    try:
+                        sent = yield value
+                    except GeneratorExit:
+                        await _aresume(scope_manager, span, generator.aclose)
+                        return
+                    except BaseException as error:
+                        value = await _aresume(
+                            scope_manager, span, generator.athrow, error
+                        )
+                    else:
+                        value = await _aresume(
+                            scope_manager, span, generator.asend, sent
+                        )
+            except StopAsyncIteration:
+                return
+
+    return traced()
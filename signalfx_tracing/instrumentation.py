@@ -2,22 +2,28 @@
 import logging
 import pkgutil
 import sys
-import os
+
+from wrapt import register_post_import_hook
 
 from .constants import traceable_libraries, auto_instrumentable_libraries
-from .utils import is_truthy, get_module, instrumentation_disabled
+from .utils import get_module, instrumentation_disabled
+from . import settings, startup_profile
 
 
 log = logging.getLogger(__name__)
 
 
+# Libraries whose instrumentation is pending their import by a lazy auto_instrument()
+_deferred_libraries = set()
+
+
 # This set of helpers operates under the assumption that a library
 # is a string representation of a python package/module name
 # and a module is the item in sys.modules after import, keyed by library name.
 
 
 def _tracing_enabled():
-    return is_truthy(os.environ.get("SIGNALFX_TRACING_ENABLED", True))
+    return settings.get().tracing_enabled
 
 
 def _importable_libraries(*libraries):
@@ -64,7 +70,8 @@ def instrument(tracer=None, **libraries):
             uninstrument(library)
         else:
             try:
-                imported_instrumentor(library).instrument(tracer)
+                with startup_profile.phase("instrument {}".format(library)):
+                    imported_instrumentor(library).instrument(tracer)
             except ModuleNotFoundError:
                 log.warning(
                     'Instrumentation package not found for library: "{0}"'.format(
@@ -78,19 +85,58 @@ def instrument(tracer=None, **libraries):
 def uninstrument(*libraries):
     """Invoke the associated auto-instrumentor.uninstrument() for each specified library"""
     for library in libraries:
+        if library in _deferred_libraries:
+            # Cancel pending lazy instrumentation.  There is nothing to revert
+            # (or import) if the library hasn't been imported yet.
+            _deferred_libraries.discard(library)
+            if library not in sys.modules:
+                continue
         instrumentor = imported_instrumentor(library)
         instrumentor.uninstrument()
 
 
-def auto_instrument(tracer=None):
+def _instrument_on_import(tracer, library):
+    def post_import_hook(module):
+        if library not in _deferred_libraries:
+            return
+        _deferred_libraries.discard(library)
+        instrument(tracer, **{library: True})
+
+    return post_import_hook
+
+
+def _defer_instrument(tracer, *libraries):
+    """
+    Register post-import hooks that invoke instrument() for each library upon its first import.
+    Hooks for libraries that have already been imported are invoked immediately.
+    """
+    for library in libraries:
+        _deferred_libraries.add(library)
+        register_post_import_hook(_instrument_on_import(tracer, library), library)
+
+
+def auto_instrument(tracer=None, lazy=None):
     """
     Invoke an auto-instrumentor.instrument() for all auto_instrumentable_libraries
     in current execution path.
+
+    If lazy (SIGNALFX_LAZY_INSTRUMENTATION by default), libraries aren't probed or imported.
+    Each is instead instrumented by an import hook if and when the application imports it.
     """
     if not _tracing_enabled():
         return
 
-    available, unavailable = _importable_libraries(*auto_instrumentable_libraries)
+    if lazy is None:
+        lazy = settings.get().lazy_instrumentation
+
+    if lazy:
+        _defer_instrument(tracer, *auto_instrumentable_libraries)
+        return
+
+    with startup_profile.phase("find importable libraries"):
+        available, unavailable = _importable_libraries(
+            *auto_instrumentable_libraries
+        )
     for library in unavailable:
         log.debug("Unable to auto-instrument {} as it is unavailable.".format(library))
     instrument(tracer, **{lib: True for lib in available})
@@ -1,4 +1,6 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
+from wrapt import wrap_function_wrapper
+
 from signalfx_tracing import utils
 
 # Configures Django tracing as described by
@@ -30,6 +32,60 @@ def get_middleware_and_setting_name():
     return settings.MIDDLEWARE_CLASSES, "MIDDLEWARE_CLASSES"
 
 
+# request.META keys by lowercase header name
+_meta_keys = {}
+
+
+def _meta_key(name):
+    key = _meta_keys.get(name)
+    if key is None:
+        key = _meta_keys[name] = "HTTP_" + name.upper().replace("-", "_")
+    return key
+
+
+def _meta_headers(meta):
+    """The headers of request.META by lowercase name, as django_opentracing provides them to tracers"""
+    headers = {}
+    for k, v in meta.items():
+        k = k.lower().replace("_", "-")
+        if k.startswith("http-"):
+            k = k[5:]
+        headers[k] = v
+    return headers
+
+
+# The private DjangoTracing attributes _apply_tracing() relies on
+_tracing_attributes = ("_current_scopes", "_call_start_span_cb")
+
+
+def _apply_tracing(wrapped, tracing, args, kwargs):
+    """
+    A function wrapper of DjangoTracing._apply_tracing(), which starts request spans with
+    utils.start_request_scope(), looking up only the request.META items of propagated headers.  Versions of
+    django_opentracing lacking the private attributes this relies on start spans themselves.
+    """
+    if not all(hasattr(tracing, name) for name in _tracing_attributes):
+        return wrapped(*args, **kwargs)
+
+    request, view_func, attributes = args
+    meta = request.META
+    scope = utils.start_request_scope(
+        tracing.tracer,
+        request,
+        view_func.__name__,
+        lambda name: meta.get(_meta_key(name)),
+        lambda: _meta_headers(meta),
+        component="django",
+        method=request.method,
+        url=request.get_full_path(),
+        path=request.path,
+        attributes=attributes,
+        start_span_cb=tracing._call_start_span_cb,
+    )
+    tracing._current_scopes[request] = scope
+    return scope
+
+
 def instrument(tracer=None):
     django = utils.get_module("django")
     if utils.is_instrumented(django):
@@ -58,6 +114,7 @@ def instrument(tracer=None):
 
     middleware_classes, setting = get_middleware_and_setting_name()
     setattr(settings, setting, [config.middleware_class] + list(middleware_classes))
+    wrap_function_wrapper("django_opentracing.tracing", "DjangoTracing._apply_tracing", _apply_tracing)
     utils.mark_instrumented(django)
 
 
@@ -85,4 +142,7 @@ def uninstrument():
     middleware, setting = get_middleware_and_setting_name()
     middleware_classes = [i for i in middleware if i != config.middleware_class]
     setattr(settings, setting, middleware_classes)
+
+    django_tracing = utils.get_module("django_opentracing.tracing")
+    utils.revert_wrapper(django_tracing.DjangoTracing, "_apply_tracing")
     utils.mark_uninstrumented(django)
@@ -0,0 +1,42 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+import opentracing
+
+from .middleware import TraceMiddleware
+
+
+class _RequestScope(opentracing.Scope):
+    """The scope of a request span that isn't activated, which only finishes it when closed"""
+
+    def __init__(self, span):
+        super(_RequestScope, self).__init__(None, span)
+
+    def close(self):
+        self.span.finish()
+
+
+class AsyncTraceMiddleware(TraceMiddleware):
+    """
+    TraceMiddleware for Falcon 3 ASGI apps, which await the *_async methods of middleware.  None of its
+    work awaits anything, so these only run the synchronous methods within the request's task.  Scopes
+    activated by them are visible to responders as long as the tracer's scope manager tracks them per
+    task, such as with contextvars.  Otherwise activate_spans should be False, so that concurrent
+    requests don't find each other's spans active, and request spans are only kept on their requests.
+    """
+
+    def __init__(self, tracer=None, attributes=None, trace_response_header_enabled=False, activate_spans=True):
+        super(AsyncTraceMiddleware, self).__init__(tracer, attributes, trace_response_header_enabled)
+        self.activate_spans = activate_spans
+
+    def _start_scope(self, operation_name, child_of, tags):
+        if self.activate_spans:
+            return super(AsyncTraceMiddleware, self)._start_scope(operation_name, child_of, tags)
+        return _RequestScope(self.tracer.start_span(operation_name, child_of=child_of, tags=tags))
+
+    async def process_request_async(self, req, resp):
+        self.process_request(req, resp)
+
+    async def process_resource_async(self, req, resp, resource, params):
+        self.process_resource(req, resp, resource, params)
+
+    async def process_response_async(self, req, resp, resource, req_succeeded):
+        self.process_response(req, resp, resource, req_succeeded)
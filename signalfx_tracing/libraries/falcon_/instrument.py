@@ -1,11 +1,16 @@
 # Copyright (C) 2020 SignalFx. All rights reserved.
-from wrapt import wrap_function_wrapper
+import logging
+import sys
+
+from wrapt import ObjectProxy, wrap_function_wrapper
 import opentracing
 
-from signalfx_tracing import utils
+from signalfx_tracing import scope_managers, utils
+
+from .middleware import EXCEPTION_KEY, TraceMiddleware
 
-from .middleware import TraceMiddleware
 
+log = logging.getLogger(__name__)
 
 config = utils.Config(
     tracer=None,
@@ -13,6 +18,70 @@ config = utils.Config(
 )
 
 
+def _app_class(falcon):
+    """falcon.App, the base of falcon.API and falcon.asgi.App since Falcon 3, or else falcon.API"""
+    return getattr(falcon, "App", None) or falcon.API
+
+
+def _middleware_list(middleware):
+    """Falcon 3 also accepts a single middleware component"""
+    if middleware is None:
+        return []
+    try:
+        return list(middleware)
+    except TypeError:
+        return [middleware]
+
+
+def _handled_exception(req, resp, ex, *args, **kwargs):
+    return req, ex
+
+
+def _record_exception(wrapped, instance, args, kwargs):
+    """
+    Falcon 3 apps handle all exceptions, including those without a registered handler, so those of
+    requests are recorded for TraceMiddleware instead of being found by sys.exc_info()
+    """
+    req, ex = _handled_exception(*args, **kwargs)
+    if req is not None:
+        setattr(req, EXCEPTION_KEY, ex)
+    return wrapped(*args, **kwargs)
+
+
+def _wrap_handle_exception(app_class):
+    if not isinstance(app_class.__dict__.get("_handle_exception"), ObjectProxy):
+        wrap_function_wrapper(app_class, "_handle_exception", _record_exception)
+
+
+def _trace_middleware(app, tracer):
+    asgi = sys.modules.get("falcon.asgi")
+    if asgi is not None and isinstance(app, asgi.App):
+        from .async_middleware import AsyncTraceMiddleware
+
+        _wrap_handle_exception(asgi.App)  # Overrides that of falcon.App
+        # Requests are handled by concurrent tasks of a single thread
+        scope_managers.promote(tracer, scope_managers.ASYNCIO)
+        activate_spans = not scope_managers.is_thread_local(tracer)
+        if not activate_spans:
+            log.warning(
+                "The tracer's thread-local scope manager can't track the spans of concurrent falcon.asgi.App requests, "
+                "so they won't be active spans.  Create the tracer with SIGNALFX_SCOPE_MANAGER=contextvars, or pass "
+                "a contextvars scope manager to create_tracer()."
+            )
+        return AsyncTraceMiddleware(
+            tracer,
+            config.traced_attributes,
+            trace_response_header_enabled=utils.is_trace_response_header_enabled(),
+            activate_spans=activate_spans,
+        )
+
+    return TraceMiddleware(
+        tracer,
+        config.traced_attributes,
+        trace_response_header_enabled=utils.is_trace_response_header_enabled(),
+    )
+
+
 def instrument(tracer=None):
     falcon = utils.get_module("falcon")
     if utils.is_instrumented(falcon):
@@ -21,21 +90,16 @@ def instrument(tracer=None):
     _tracer = tracer or config.tracer or opentracing.tracer
 
     def traced_init(wrapped, instance, args, kwargs):
-        mw = kwargs.pop("middleware", [])
-
-        mw.insert(
-            0,
-            TraceMiddleware(
-                _tracer,
-                config.traced_attributes,
-                trace_response_header_enabled=utils.is_trace_response_header_enabled(),
-            ),
-        )
+        mw = _middleware_list(kwargs.pop("middleware", None))
+        mw.insert(0, _trace_middleware(instance, _tracer))
         kwargs["middleware"] = mw
 
         wrapped(*args, **kwargs)
 
-    wrap_function_wrapper("falcon", "API.__init__", traced_init)
+    app_class = _app_class(falcon)
+    wrap_function_wrapper(app_class, "__init__", traced_init)
+    if app_class is not falcon.API:
+        _wrap_handle_exception(app_class)
     utils.mark_instrumented(falcon)
 
 
@@ -44,5 +108,10 @@ def uninstrument():
     if not utils.is_instrumented(falcon):
         return
 
-    utils.revert_wrapper(falcon.API, "__init__")
+    app_class = _app_class(falcon)
+    utils.revert_wrapper(app_class, "__init__")
+    utils.revert_wrapper(app_class, "_handle_exception")
+    asgi = sys.modules.get("falcon.asgi")
+    if asgi is not None:
+        utils.revert_wrapper(asgi.App, "_handle_exception")
     utils.mark_uninstrumented(falcon)
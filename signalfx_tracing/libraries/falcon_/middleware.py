@@ -1,60 +1,107 @@
 import sys
-import traceback
 
 import opentracing
 from opentracing.ext import tags
 
-from signalfx_tracing.utils import padded_hex
+from signalfx_tracing.sampling_rules import start_tags
+from signalfx_tracing.url_normalizer import normalize_attribute, normalize_path
+from signalfx_tracing.utils import (
+    extract_span_context,
+    format_error_stack,
+    is_sampled,
+    server_timing_headers,
+)
 
 SCOPE_KEY = "_signalfx_scope_key"
 
+# The exception handled by a Falcon 3 app for a request, as recorded by instrumentation
+EXCEPTION_KEY = "_signalfx_exception_key"
+
+# The operation name of spans until their request is routed, which remains that of unrouted requests
+REQUEST_OPERATION_NAME = "falcon.request"
+
+ROUTE_TAG = "http.route"
+
+# Requests with arbitrary methods are routed to resources, so names beyond this many aren't retained
+_resource_names_size = 1024
+
+
+def _status_code(status):
+    """The code of a response status, which is a str like "200 OK" or, since Falcon 3, possibly an int"""
+    if isinstance(status, int):  # Including http.HTTPStatus
+        return str(int(status))
+    return status.split(" ", 1)[0]
+
 
 class TraceMiddleware(object):
     def __init__(self, tracer=None, attributes=None, trace_response_header_enabled=False):
         self.tracer = tracer or opentracing.tracer
         self.attributes = attributes or []
         self.trace_response_header_enabled = trace_response_header_enabled
+        # (operation name, resource name) by (resource class, request method)
+        self._resource_names = {}
 
     def process_request(self, req, resp):
-        operation_name = req.path
+        span_ctx = extract_span_context(self.tracer, req.get_header, lambda: req.headers)
+        scope = self._start_scope(
+            REQUEST_OPERATION_NAME,
+            child_of=span_ctx,
+            tags=start_tags(span_ctx, REQUEST_OPERATION_NAME, req.path),
+        )
 
-        try:
-            span_ctx = self.tracer.extract(opentracing.Format.HTTP_HEADERS, req.headers)
-            scope = self.tracer.start_active_span(operation_name, child_of=span_ctx)
-        except (
-            opentracing.InvalidCarrierException,
-            opentracing.SpanContextCorruptedException,
-        ):
-            scope = self.tracer.start_active_span(operation_name)
+        setattr(req, SCOPE_KEY, scope)
 
         span = scope.span
+        if not is_sampled(span):  # tags of unsampled spans are discarded
+            return
+
         span.set_tag(tags.COMPONENT, "Falcon")
         span.set_tag(tags.HTTP_METHOD, req.method)
-        span.set_tag(tags.HTTP_URL, req.uri.split("?")[0])
+        span.set_tag(tags.HTTP_URL, req.prefix + normalize_path(req.path))
         span.set_tag(tags.SPAN_KIND, tags.SPAN_KIND_RPC_SERVER)
         for attr in self.attributes:
             attr_val = getattr(req, attr, None)
             if attr_val:
-                span.set_tag(attr, attr_val)
+                span.set_tag(attr, normalize_attribute(attr, attr_val))
 
-        setattr(req, SCOPE_KEY, scope)
+    def _start_scope(self, operation_name, child_of, tags):
+        return self.tracer.start_active_span(operation_name, child_of=child_of, tags=tags)
 
     def process_resource(self, req, resp, resource, params):
         scope = getattr(req, SCOPE_KEY, None)
-        if scope is None:
+        if scope is None or not is_sampled(scope.span):
             return
-        resource_name = resource.__class__.__name__
+
+        key = (resource.__class__, req.method)
+        names = self._resource_names.get(key)
+        if names is None:
+            resource_name = resource.__class__.__name__
+            names = ("{0}.on_{1}".format(resource_name, req.method.lower()), resource_name)
+            if len(self._resource_names) < _resource_names_size:
+                self._resource_names[key] = names
+
+        operation_name, resource_name = names
+        scope.span.set_operation_name(operation_name)
         scope.span.set_tag("falcon.resource", resource_name)
-        scope.span.set_operation_name(
-            "{0}.on_{1}".format(resource_name, req.method.lower())
-        )
+        uri_template = getattr(req, "uri_template", None)
+        if uri_template:
+            scope.span.set_tag(ROUTE_TAG, uri_template)
 
     def process_response(self, req, resp, resource, req_succeeded=None):
         scope = getattr(req, SCOPE_KEY, None)
         if scope is None:
             return
 
-        status = resp.status
+        if is_sampled(scope.span):
+            self._tag_response(scope.span, req, resp, resource, req_succeeded)
+
+        if self.trace_response_header_enabled:
+            for name, value in server_timing_headers(scope.span):
+                resp.append_header(name, value)
+        scope.close()
+
+    def _tag_response(self, span, req, resp, resource, req_succeeded):
+        status = _status_code(resp.status)
 
         if resource is None:
             status = "404"
@@ -66,26 +113,21 @@ class TraceMiddleware(object):
                     status = "404"
                 else:
                     status = "500"
-                    scope.span.set_tag(tags.ERROR, True)
-                    scope.span.set_tag("sfx.error.message", str(exc))
-                    scope.span.set_tag("sfx.error.object", str(exc.__class__))
-                    scope.span.set_tag("sfx.error.kind", exc.__class__.__name__)
-                    if tb:
-                        scope.span.set_tag(
-                            "sfx.error.stack", "".join(traceback.format_tb(tb))
-                        )
-
-        scope.span.set_tag(tags.HTTP_STATUS_CODE, status.split(" ")[0])
-
-        if self.trace_response_header_enabled:
-            trace_id = getattr(scope.span.context, "trace_id", 0)
-            span_id = getattr(scope.span.context, "span_id", 0)
-            if trace_id and span_id:
-                resp.append_header("Access-Control-Expose-Headers", "Server-Timing")
-                resp.append_header(
-                    "Server-Timing", 'traceparent;desc="00-{trace_id}-{span_id}-01"'.format(
-                        trace_id=padded_hex(trace_id),
-                        span_id=padded_hex(span_id),
-                    ),
-                )
-        scope.close()
+                    self._tag_error(span, err_type, exc, tb)
+        elif not req_succeeded and status.startswith("5"):
+            # Falcon 3 apps handle all exceptions, so they are no longer being raised
+            exc = getattr(req, EXCEPTION_KEY, None)
+            if exc is None:
+                span.set_tag(tags.ERROR, True)
+            else:
+                self._tag_error(span, type(exc), exc, exc.__traceback__)
+
+        span.set_tag(tags.HTTP_STATUS_CODE, status)
+
+    def _tag_error(self, span, err_type, exc, tb):
+        span.set_tag(tags.ERROR, True)
+        span.set_tag("sfx.error.message", str(exc))
+        span.set_tag("sfx.error.object", str(exc.__class__))
+        span.set_tag("sfx.error.kind", exc.__class__.__name__)
+        if tb:
+            span.set_tag("sfx.error.stack", "".join(format_error_stack(err_type, tb)))
@@ -1,6 +1,6 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
-import opentracing
 from wrapt import wrap_function_wrapper
+import opentracing
 
 from signalfx_tracing import utils
 
@@ -14,6 +14,62 @@ config = utils.Config(
 )
 
 
+def _add_header(response, name, value):
+    existing = response.headers.get(name)
+    response.headers[name] = existing + "," + value if existing else value
+
+
+def _server_timing(tracer):
+    """
+    An after_request function adding the Server-Timing headers of the active request span.  It's
+    registered after, and so invoked before, that of the FlaskTracer which finishes the span.
+    """
+
+    def add_server_timing_headers(response):
+        span = tracer.active_span
+        if span is not None:
+            for name, value in utils.server_timing_headers(span):
+                _add_header(response, name, value)
+        return response
+
+    return add_server_timing_headers
+
+
+def _traced_attributes(attributes, *args, **kwargs):
+    return attributes
+
+
+# The private FlaskTracing attributes _before_request_fn() relies on
+_tracing_attributes = ("_current_scopes", "_call_start_span_cb")
+
+
+def _before_request_fn(wrapped, flask_tracer, args, kwargs):
+    """
+    A function wrapper of FlaskTracing._before_request_fn(), which starts request spans with
+    utils.start_request_scope().  Versions of flask_opentracing or werkzeug lacking the private attributes this
+    relies on start spans themselves.
+    """
+    get_request = getattr(utils.get_module("flask").request, "_get_current_object", None)
+    if get_request is None or not all(hasattr(flask_tracer, name) for name in _tracing_attributes):
+        return wrapped(*args, **kwargs)
+
+    request = get_request()
+    headers = request.headers
+    flask_tracer._current_scopes[request] = utils.start_request_scope(
+        flask_tracer.tracer,
+        request,
+        request.endpoint,
+        headers.get,
+        lambda: {k.lower(): v for k, v in headers},
+        component="Flask",
+        method=request.method,
+        url=request.base_url,
+        path=request.path,
+        attributes=_traced_attributes(*args, **kwargs),
+        start_span_cb=flask_tracer._call_start_span_cb,
+    )
+
+
 def instrument(tracer=None):
     flask = utils.get_module("flask")
     if utils.is_instrumented(flask):
@@ -31,15 +87,24 @@ def instrument(tracer=None):
 
         _tracer = tracer or config.tracer or opentracing.tracer
 
+        # Headers of requests traced by the FlaskTracer.trace() decorator are still added by the FlaskTracer
+        trace_response_header = utils.is_trace_response_header_enabled()
+        server_timing = trace_response_header and config.trace_all
+
         app.config["FLASK_TRACER"] = flask_opentracing.FlaskTracer(
             tracer=_tracer,
             trace_all_requests=config.trace_all,
             app=app,
             traced_attributes=config.traced_attributes,
-            trace_response_header=utils.is_trace_response_header_enabled(),
+            trace_response_header=trace_response_header and not server_timing,
         )
+        if server_timing:
+            app.after_request(_server_timing(_tracer))
 
     wrap_function_wrapper("flask", "Flask.__init__", flask_tracer)
+    wrap_function_wrapper(
+        "flask_opentracing.tracing", "FlaskTracing._before_request_fn", _before_request_fn
+    )
     utils.mark_instrumented(flask)
 
 
@@ -54,4 +119,7 @@ def uninstrument():
         return
 
     utils.revert_wrapper(flask.Flask, "__init__")
+    flask_tracing = utils.get_module("flask_opentracing.tracing")
+    if flask_tracing is not None:
+        utils.revert_wrapper(flask_tracing.FlaskTracing, "_before_request_fn")
     utils.mark_uninstrumented(flask)
@@ -1,2 +1,3 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
 from .instrument import config, instrument, uninstrument  # noqa
+from .json_formatter import JSONFormatter  # noqa
@@ -1,46 +1,99 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
 
-import os
 from wrapt import wrap_function_wrapper
 import opentracing
 
-from signalfx_tracing import utils, tags
-from signalfx_tracing.constants import logging_format
-from signalfx_tracing.utils import padded_hex
+from signalfx_tracing import settings, utils, tags
+from signalfx_tracing.utils import hex_ids, is_sampled
+
+# SIGNALFX_LOGGING_FORMAT value selecting the JSONFormatter
+JSON_FORMAT = "json"
 
 config = utils.Config(
-    injection_enabled=utils.is_truthy(os.environ.get("SIGNALFX_LOGS_INJECTION", False)),
-    logging_format=os.environ.get("SIGNALFX_LOGGING_FORMAT", logging_format),
+    injection_enabled=settings.get().logs_injection,
+    lazy_fields=settings.get().logs_injection_lazy,
+    logging_format=settings.get().logging_format,
 )
 
+_empty_fields = {
+    "sfxTraceId": "",
+    "sfxSpanId": "",
+    "sfxService": "",
+    "sfxEnvironment": "",
+}
+
+
+# LogRecord attribute of the span active upon the creation of a record with lazy fields,
+# which is replaced by the trace context fields once the record is handled.
+_span_attr = "_sfx_span"
+
+_missing = object()
+
+
+def trace_context_fields(tracer):
+    """
+    Returns a function providing the trace context fields of a span of the tracer for a LogRecord.
+    The service and environment are constant for a tracer, and so are only determined once.  The ids
+    are formatted once per span context by hex_ids(), so later records of a span only look them up.
+    """
+    service = getattr(tracer, "service_name", "")
+    environment = getattr(tracer, "tags", {}).get(tags.SFX_ENVIRONMENT, "")
+
+    def fields(span):
+        if not is_sampled(span):  # unsampled traces can't be correlated with logs
+            return _empty_fields
+
+        trace_id, span_id = hex_ids(span.context)
+        return {
+            "sfxTraceId": trace_id,
+            "sfxSpanId": span_id,
+            "sfxService": service,
+            "sfxEnvironment": environment,
+        }
+
+    return fields
+
 
 def makeRecordPatched(tracer):
+    fields = trace_context_fields(tracer)
+
     def patched(makeRecord, instance, args, kwargs):
         rv = makeRecord(*args, **kwargs)
+        rv.__dict__.update(fields(tracer.active_span))
+        return rv
 
-        fields = {
-            "sfxTraceId": "",
-            "sfxSpanId": "",
-            "sfxService": "",
-            "sfxEnvironment": "",
-        }
-
-        span = tracer.active_span
+    return patched
 
-        if span is not None:
-            fields["sfxTraceId"] = padded_hex(span.trace_id)
-            fields["sfxSpanId"] = padded_hex(span.span_id)
-            fields["sfxService"] = tracer.service_name
-            fields["sfxEnvironment"] = tracer.tags.get(tags.SFX_ENVIRONMENT, "")
 
-        for field in fields:
-            setattr(rv, field, fields[field])
+def makeRecordLazyPatched(tracer):
+    """Only keeps the active span on each record, for handlePatched() to add its fields"""
 
+    def patched(makeRecord, instance, args, kwargs):
+        rv = makeRecord(*args, **kwargs)
+        rv.__dict__[_span_attr] = tracer.active_span
         return rv
 
     return patched
 
 
+def handlePatched(tracer):
+    """
+    Adds the trace context fields of the span kept by makeRecordLazyPatched() to a record once the first
+    handler whose level it meets handles it, so that records discarded by handler levels never determine them.
+    The span is removed from the record, which remains picklable for SocketHandler and QueueHandler.
+    """
+    fields = trace_context_fields(tracer)
+
+    def patched(handle, instance, args, kwargs):
+        record = args[0] if args else kwargs["record"]
+        span = record.__dict__.pop(_span_attr, _missing)
+        if span is not _missing:
+            record.__dict__.update(fields(span))
+        return handle(*args, **kwargs)
+
+    return patched
+
+
 def instrument(tracer=None):
     """
     Unlike all other instrumentations, this instrumentation does not patch the logging
@@ -56,13 +109,28 @@ def instrument(tracer=None):
         return
 
     tracer = tracer or opentracing.tracer
-    wrap_function_wrapper(logging, "Logger.makeRecord", makeRecordPatched(tracer))
+    if config.lazy_fields:
+        wrap_function_wrapper(logging, "Logger.makeRecord", makeRecordLazyPatched(tracer))
+        wrap_function_wrapper(logging, "Handler.handle", handlePatched(tracer))
+    else:
+        wrap_function_wrapper(logging, "Logger.makeRecord", makeRecordPatched(tracer))
     level = logging.INFO
 
-    if utils.is_truthy(os.environ.get("SIGNALFX_TRACING_DEBUG", False)):
+    if settings.get().tracing_debug:
         level = logging.DEBUG
 
-    logging.basicConfig(level=level, format=config.logging_format)
+    if config.logging_format.strip().lower() == JSON_FORMAT:
+        from .json_formatter import JSONFormatter
+
+        # Python 2.7's basicConfig() ignores handlers, so the root logger is configured as it would be directly
+        root = logging.getLogger()
+        if not root.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(JSONFormatter())
+            root.addHandler(handler)
+            root.setLevel(level)
+    else:
+        logging.basicConfig(level=level, format=config.logging_format)
 
     utils.mark_instrumented(logging)
 
@@ -73,4 +141,5 @@ def uninstrument():
         return
 
     utils.revert_wrapper(logging.Logger, "makeRecord")
+    utils.revert_wrapper(logging.Handler, "handle")
     utils.mark_uninstrumented(logging)
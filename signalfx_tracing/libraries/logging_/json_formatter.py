@@ -0,0 +1,83 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from collections import OrderedDict
+import json
+import logging
+import sys
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=str).decode("utf-8")
+
+
+_json_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str).encode
+
+# The fastest available encoder of a dict to a JSON str
+dumps = _orjson_dumps if orjson is not None else _json_dumps
+
+# (JSON key, LogRecord attribute) of the trace context fields added by injection, which are converted to str.
+trace_context_keys = (
+    ("signalfx.trace_id", "sfxTraceId"),
+    ("signalfx.span_id", "sfxSpanId"),
+    ("signalfx.service", "sfxService"),
+    ("signalfx.environment", "sfxEnvironment"),
+)
+
+# logging.Formatter's default asctime formats, which it only exposes as attributes since Python 3.3
+default_time_format = "%Y-%m-%d %H:%M:%S"
+default_msec_format = "%s,%03d"
+
+# dicts only preserve their insertion order since Python 3.7
+_ordered_dict = dict if sys.version_info >= (3, 7) else OrderedDict
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats each record as a single line JSON object of the standard fields of the text logging format
+    and its trace context fields, in that order.  Exception and stack information are included if present.
+    The object is encoded by a single call of `encode`, which is orjson's if installed, by default.
+    """
+
+    def __init__(self, datefmt=None, encode=None):
+        super(JSONFormatter, self).__init__(datefmt=datefmt)
+        self.encode = encode or dumps
+        self._time_cache = (None, None)
+
+    def formatTime(self, record, datefmt=None):
+        """The default asctime format, with its seconds formatted only once per second"""
+        if datefmt:
+            return super(JSONFormatter, self).formatTime(record, datefmt)
+
+        seconds = int(record.created)
+        cached_seconds, formatted = self._time_cache
+        if cached_seconds != seconds:
+            formatted = time.strftime(default_time_format, self.converter(record.created))
+            self._time_cache = (seconds, formatted)
+        return default_msec_format % (formatted, record.msecs)
+
+    def format(self, record):
+        fields = _ordered_dict((
+            ("timestamp", self.formatTime(record, self.datefmt)),
+            ("level", record.levelname),
+            ("logger", record.name),
+            ("file", record.filename),
+            ("line", record.lineno),
+            ("message", record.getMessage()),
+        ))
+        for key, attr in trace_context_keys:
+            fields[key] = str(getattr(record, attr, ""))
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            fields["exc_info"] = record.exc_text
+        stack_info = getattr(record, "stack_info", None)
+        if stack_info:
+            fields["stack_info"] = self.formatStack(stack_info)
+
+        return self.encode(fields)
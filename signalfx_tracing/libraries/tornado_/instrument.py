@@ -2,7 +2,7 @@
 from wrapt import wrap_function_wrapper
 import opentracing
 
-from signalfx_tracing import utils
+from signalfx_tracing import scope_managers, utils
 
 
 # Configures Tornado tracing as described by
@@ -16,6 +16,66 @@ config = utils.Config(
 )
 
 
+def _request_handler(handler, *args, **kwargs):
+    return handler
+
+
+def _attributes(handler, attributes, *args, **kwargs):
+    return attributes
+
+
+# The private BaseTornadoTracing methods _apply_tracing() relies on
+_tracing_methods = ("_get_operation_name", "_call_start_span_cb")
+
+
+def _scope_attr():
+    """The request attribute tornado_opentracing stores request scopes in, or None if it isn't defined"""
+    try:
+        from tornado_opentracing._constants import SCOPE_ATTR
+    except ImportError:
+        return None
+    return SCOPE_ATTR
+
+
+def _add_server_timing_headers(handler, span):
+    """Adds the Server-Timing response headers, which tornado_opentracing is configured not to add"""
+    if utils.is_trace_response_header_enabled():
+        for name, value in utils.server_timing_headers(span):
+            handler.add_header(name, value)
+
+
+def _apply_tracing(wrapped, tracing, args, kwargs):
+    """
+    A function wrapper of BaseTornadoTracing._apply_tracing(), which starts request spans with
+    utils.start_request_scope() and adds the Server-Timing response headers.  Versions of tornado_opentracing
+    lacking the private methods and request attribute this relies on start spans themselves.
+    """
+    handler = _request_handler(*args, **kwargs)
+    scope_attr = _scope_attr()
+    if scope_attr is None or not all(hasattr(tracing, name) for name in _tracing_methods):
+        scope = wrapped(*args, **kwargs)
+    else:
+        request = handler.request
+        headers = request.headers
+        scope = utils.start_request_scope(
+            tracing.tracer,
+            request,
+            tracing._get_operation_name(handler),
+            headers.get,
+            lambda: headers,
+            component="tornado",
+            method=request.method,
+            url=request.uri,
+            path=request.path,
+            attributes=_attributes(*args, **kwargs),
+            start_span_cb=tracing._call_start_span_cb,
+        )
+        setattr(request, scope_attr, scope)
+
+    _add_server_timing_headers(handler, scope.span)
+    return scope
+
+
 def instrument(tracer=None):
     tornado = utils.get_module("tornado")
     if utils.is_instrumented(tornado):
@@ -23,6 +83,11 @@ def instrument(tracer=None):
 
     tornado_opentracing = utils.get_module("tornado_opentracing")
 
+    # Request handling isn't thread-bound, so thread-local scopes would leak between requests
+    scope_managers.promote(
+        tracer or config.tracer or opentracing.tracer, scope_managers.TORNADO
+    )
+
     def _tracer_config(wrapped_tracer_config, _, wrapt_args, __):
         """
         A function wrapper for tornado_opentracing's monkey patcher of tornado.web.Application.__init__()
@@ -40,13 +105,16 @@ def instrument(tracer=None):
         kwargs["opentracing_trace_client"] = config.trace_client
         kwargs["opentracing_traced_attributes"] = config.traced_attributes
         kwargs["opentracing_start_span_cb"] = config.start_span_cb
-        kwargs["signalfx_trace_response_headers"] = utils.is_trace_response_header_enabled()
+        kwargs["signalfx_trace_response_headers"] = False  # Added by _apply_tracing instead
 
         wrapped_tracer_config(__init__, app, args, kwargs)
 
     wrap_function_wrapper(
         "tornado_opentracing.application", "tracer_config", _tracer_config
     )
+    wrap_function_wrapper(
+        "tornado_opentracing._tracing", "BaseTornadoTracing._apply_tracing", _apply_tracing
+    )
     tornado_opentracing.init_tracing()
     utils.mark_instrumented(tornado)
 
@@ -60,4 +128,7 @@ def uninstrument():
     tornado_initialization._unpatch_tornado()
     tornado_initialization._unpatch_tornado_client()
 
+    tornado_tracing = utils.get_module("tornado_opentracing._tracing")
+    utils.revert_wrapper(tornado_tracing.BaseTornadoTracing, "_apply_tracing")
+
     utils.mark_uninstrumented(tornado)
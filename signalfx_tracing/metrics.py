@@ -0,0 +1,243 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Self-metrics of the tracers created by create_tracer(), if SIGNALFX_METRICS_ENABLED is True.
+
+The registry is the jaeger metrics factory of those tracers, so it holds jaeger_client's own counters of started
+spans and traces by sampling decision (jaeger:started_spans, jaeger:traces), finished spans
+(jaeger:finished_spans), reported, failed, and dropped spans (jaeger:reporter_spans), and the reporter queue length
+(jaeger:reporter_queue_length), along with those of signalfx_tracing's reporters and senders.  create_tracer()
+adds the spans flushed to the exporter by each instrumentation's component (sfx:flushed_spans) and the latency in
+microseconds of each flush (sfx:reporter_flush_latency).
+
+    >>> from signalfx_tracing import metrics
+    >>> metrics.registry.snapshot()["jaeger:reporter_spans{result=dropped}"]
+
+A snapshot is logged every SIGNALFX_METRICS_LOG_INTERVAL seconds, if that is set.
+"""
+from threading import Lock, Thread
+import bisect
+import logging
+import os
+import time
+
+from . import settings
+
+
+log = logging.getLogger(__name__)
+
+# Microseconds, from 100us to 10s
+default_latency_bounds = (
+    100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000, 2500000, 5000000, 10000000,
+)
+
+
+class Counter(object):
+    """A monotonically increasing count"""
+
+    __slots__ = ("_lock", "_value")
+
+    def __init__(self):
+        self._lock = Lock()
+        self._value = 0
+
+    def __call__(self, value=1):
+        if value > 0:
+            with self._lock:
+                self._value += value
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Gauge(object):
+    """The last value set"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def __call__(self, value):
+        self.value = value
+
+
+class Histogram(object):
+    """Counts of the values recorded in each bucket, where bounds are the inclusive upper bounds of all but the last"""
+
+    __slots__ = ("bounds", "_lock", "_counts")
+
+    def __init__(self, bounds=default_latency_bounds):
+        self.bounds = tuple(bounds)
+        self._lock = Lock()
+        self._counts = [0] * (len(self.bounds) + 1)
+
+    def __call__(self, value):
+        bucket = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[bucket] += 1
+
+    @property
+    def counts(self):
+        with self._lock:
+            return list(self._counts)
+
+    @property
+    def value(self):
+        """The count of recorded values and the bucket bounds of their median, 99th percentile, and maximum"""
+        counts = self.counts
+        return dict(
+            count=sum(counts),
+            p50=self._quantile(counts, 0.5),
+            p99=self._quantile(counts, 0.99),
+            max=self._quantile(counts, 1.0),
+        )
+
+    def _quantile(self, counts, q):
+        """The upper bound of the bucket holding the q quantile, which is infinite for the last, or None if empty"""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if count and seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+
+def metric_key(name, tags=None):
+    if not tags:
+        return name
+    return "{}{{{}}}".format(name, ",".join("{}={}".format(k, tags[k]) for k in sorted(tags)))
+
+
+class MetricsRegistry(object):
+    """
+    A jaeger_client MetricsFactory whose counters, gauges, and timers are retained by name and tags.  Timers record
+    microseconds in Histograms.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _get(self, metric_class, name, tags):
+        key = metric_key(name, tags)
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self._metrics.setdefault(key, metric_class())
+        return metric
+
+    def create_counter(self, name, tags=None):
+        return self._get(Counter, name, tags)
+
+    def create_gauge(self, name, tags=None):
+        return self._get(Gauge, name, tags)
+
+    def create_timer(self, name, tags=None):
+        return self._get(Histogram, name, tags)
+
+    def get(self, name, **tags):
+        """The metric of a name and tags, or None if none was created"""
+        return self._metrics.get(metric_key(name, tags))
+
+    def snapshot(self):
+        """Returns the current value of each metric by its "name{tag=value,...}" key"""
+        return {key: metric.value for key, metric in sorted(list(self._metrics.items()))}
+
+    def _reset_locks(self):
+        """Replaces the locks of the metrics in a forked process, where another thread may have held them"""
+        for metric in list(self._metrics.values()):
+            if hasattr(metric, "_lock"):
+                metric._lock = Lock()
+
+
+# The registry of create_tracer()'s tracers
+registry = MetricsRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry._reset_locks)
+
+
+def metrics_factory():
+    """Returns the metrics factory for new tracers, or None if self-metrics are disabled"""
+    return registry if settings.get().metrics_enabled else None
+
+
+def _component(span):
+    for tag in span.tags:
+        if tag.key == "component":
+            return tag.vStr
+    return "unknown"
+
+
+def instrument_sender(reporter, metrics_factory):
+    """
+    Counts the spans a jaeger Reporter's sender flushes by their component tag as sfx:flushed_spans, and records the
+    latency in microseconds of each flush as sfx:reporter_flush_latency.  Both are recorded by the reporter's thread
+    once per batch, rather than by the threads finishing each span.
+    """
+    sender = getattr(reporter, "_sender", None)
+    if sender is None:
+        return
+    flush_latency = metrics_factory.create_timer(name="sfx:reporter_flush_latency")
+    counters = {}
+    flush = sender.flush
+
+    def count(spans):
+        components = {}
+        for span in spans:
+            component = _component(span)
+            components[component] = components.get(component, 0) + 1
+        for component, flushed in components.items():
+            counter = counters.get(component)
+            if counter is None:
+                counter = counters[component] = metrics_factory.create_counter(
+                    name="sfx:flushed_spans", tags={"component": component}
+                )
+            counter(flushed)
+
+    def instrumented_flush():
+        if not sender.spans:  # The reporter flushes at each interval, whether or not there are spans
+            return flush()
+        count(sender.spans)
+        start = time.time()
+        try:
+            return flush()
+        finally:
+            flush_latency((time.time() - start) * 1e6)
+
+    sender.flush = instrumented_flush
+
+
+def format_snapshot(snapshot):
+    return " ".join("{}={}".format(key, value) for key, value in snapshot.items())
+
+
+# The snapshot logging thread
+_log_thread = [None]
+
+
+def log_periodically(interval):
+    """Starts logging a snapshot of the registry every interval seconds, unless it's running in this process"""
+    thread = _log_thread[0]
+    if thread is not None and thread.is_alive():
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            if _log_thread[0] is not thread:
+                return
+            log.info("signalfx_tracing metrics: {}".format(format_snapshot(registry.snapshot())))
+
+    thread = Thread(target=run, name="signalfx-tracing-metrics")
+    thread.daemon = True
+    _log_thread[0] = thread
+    thread.start()
+
+
+def stop_logging():
+    """Stops the periodic logging of snapshots after its current interval"""
+    _log_thread[0] = None
@@ -0,0 +1,162 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+HTTP header codecs registered by create_tracer() for SIGNALFX_PROPAGATION values that jaeger_client
+doesn't support itself:
+
+* "w3c" - W3C Trace Context traceparent and tracestate headers.
+* A comma separated list like "b3,w3c" - extraction from the first of the listed formats present
+  in a request, and injection of all of them.
+
+"b3" and any other single value are left to jaeger_client.
+"""
+import re
+
+from jaeger_client import SpanContext
+from jaeger_client.codecs import B3Codec, Codec
+from jaeger_client.constants import SAMPLED_FLAG
+from opentracing import InvalidCarrierException, SpanContextCorruptedException
+import six
+
+from .utils import codec_headers
+
+
+B3 = "b3"
+W3C = "w3c"
+
+# The baggage item carrying an extracted tracestate to the spans of the trace, so it can be injected unchanged
+TRACESTATE_BAGGAGE_KEY = "w3c-tracestate"
+
+# version-trace_id-parent_id-flags, all lowercase hex, with any fields of future versions after another dash
+_traceparent_length = 55
+_traceparent = re.compile(r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+_invalid_version = "ff"
+
+# The list-members limit of the specification, with its maximum member length
+_tracestate_max_length = 32 * 257
+
+
+class W3CCodec(Codec):
+    """
+    Supports the traceparent and tracestate headers of https://www.w3.org/TR/trace-context/.
+    A traceparent is rejected by its length before it's parsed, so that each request header costs
+    at most a single match of a fixed length pattern.
+    """
+
+    traceparent_header = "traceparent"
+    tracestate_header = "tracestate"
+
+    # The headers extracted from, as looked up by utils.extract_span_context()
+    context_headers = (traceparent_header,)
+    header_names = (traceparent_header, tracestate_header)
+
+    def inject(self, span_context, carrier):
+        if not isinstance(carrier, dict):
+            raise InvalidCarrierException("carrier not a dictionary")
+        carrier[self.traceparent_header] = "00-%032x-%016x-%02x" % (
+            span_context.trace_id,
+            span_context.span_id,
+            span_context.flags & SAMPLED_FLAG,
+        )
+        tracestate = (span_context.baggage or {}).get(TRACESTATE_BAGGAGE_KEY)
+        if tracestate:
+            carrier[self.tracestate_header] = tracestate
+
+    def extract(self, carrier):
+        if not isinstance(carrier, dict):
+            raise InvalidCarrierException("carrier not a dictionary")
+        traceparent = tracestate = None
+        for header_key, header_value in carrier.items():
+            if header_value is None:
+                continue
+            lower_key = header_key.lower()
+            if lower_key == self.traceparent_header:
+                traceparent = header_value
+            elif lower_key == self.tracestate_header:
+                tracestate = header_value
+        if traceparent is None:
+            return None
+
+        trace_id, span_id, flags = parse_traceparent(traceparent)
+        baggage = None
+        if tracestate and len(tracestate) <= _tracestate_max_length:
+            baggage = {TRACESTATE_BAGGAGE_KEY: tracestate}
+        return SpanContext(
+            trace_id=trace_id, span_id=span_id, parent_id=None, flags=flags, baggage=baggage
+        )
+
+
+def parse_traceparent(traceparent):
+    """
+    Returns the (trace id, parent span id, jaeger flags) of a traceparent header value, raising
+    SpanContextCorruptedException if it's malformed.
+    """
+    if not isinstance(traceparent, six.string_types):
+        raise SpanContextCorruptedException('malformed traceparent "%s"' % (traceparent,))
+    traceparent = traceparent.strip()
+    length = len(traceparent)
+    # Version 00 has exactly four fields, while later versions may append more.
+    if length != _traceparent_length and (
+        length < _traceparent_length
+        or traceparent[_traceparent_length] != "-"
+        or traceparent.startswith("00")
+    ):
+        raise SpanContextCorruptedException('malformed traceparent "%s"' % (traceparent,))
+
+    match = _traceparent.match(traceparent)
+    if match is None:
+        raise SpanContextCorruptedException('malformed traceparent "%s"' % (traceparent,))
+    version, trace_id, span_id, flags = match.groups()
+    trace_id, span_id = int(trace_id, 16), int(span_id, 16)
+    if version == _invalid_version or not trace_id or not span_id:
+        raise SpanContextCorruptedException('invalid traceparent "%s"' % traceparent)
+    return trace_id, span_id, int(flags, 16) & SAMPLED_FLAG
+
+
+class CompositeCodec(Codec):
+    """
+    Extracts the span context of the first of its codecs to find one in a carrier, and injects
+    the span context with every codec.
+    """
+
+    def __init__(self, codecs):
+        self.codecs = tuple(codecs)
+        self.context_headers = self.header_names = None
+        headers = [codec_headers(codec) for codec in self.codecs]
+        if None not in headers:
+            self.context_headers = tuple(name for required, _ in headers for name in required)
+            self.header_names = tuple(name for _, names in headers for name in names)
+
+    def inject(self, span_context, carrier):
+        for codec in self.codecs:
+            codec.inject(span_context, carrier)
+
+    def extract(self, carrier):
+        error = None
+        for codec in self.codecs:
+            try:
+                span_context = codec.extract(carrier)
+            except SpanContextCorruptedException as e:  # Another format may still be valid
+                error = error or e
+                continue
+            if span_context is not None:
+                return span_context
+        if error is not None:
+            raise error
+        return None
+
+
+_codec_classes = {B3: B3Codec, W3C: W3CCodec}
+
+
+def http_headers_codec(propagation):
+    """
+    Returns the HTTP headers codec for a SIGNALFX_PROPAGATION value, or None if it's left to
+    jaeger_client.  Unknown formats in a list are ignored.
+    """
+    names = [name.strip().lower() for name in (propagation or "").split(",")]
+    codecs = [_codec_classes[name]() for name in names if name in _codec_classes]
+    if len(names) == 1:
+        return codecs[0] if names[0] == W3C else None
+    if not codecs:
+        return None
+    return codecs[0] if len(codecs) == 1 else CompositeCodec(codecs)
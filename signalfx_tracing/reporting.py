@@ -0,0 +1,339 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Span export options of create_tracer() beyond jaeger_client's own, which are SIGNALFX_REPORTER_COMPRESSION to
+gzip each batch posted to SIGNALFX_ENDPOINT_URL, a SIGNALFX_REPORTER_BACKPRESSURE policy for spans finished
+while the reporter's queue is full:
+
+* "drop-newest" (default) - the finished span is dropped, as with jaeger_client's reporter.
+* "drop-oldest" - the oldest queued span is dropped in favor of the finished one.
+
+and a SIGNALFX_EXPORT_TRANSPORT for the spans:
+
+* "http" (default) - batches are posted to SIGNALFX_ENDPOINT_URL.
+* "udp" - batches are sent to a local agent at SIGNALFX_AGENT_HOST and SIGNALFX_AGENT_PORT as Thrift compact
+  emitBatch datagrams of at most SIGNALFX_EXPORT_MAX_PACKET_SIZE bytes.
+* "unix" - the same datagrams are sent to the unix socket at SIGNALFX_AGENT_SOCKET.
+
+Batch size, flush interval, and queue size are passed to jaeger_client's configuration.
+"""
+import gzip
+import io
+import logging
+import socket
+
+from jaeger_client import thrift
+from jaeger_client.metrics import MetricsFactory
+from jaeger_client.reporter import Reporter
+from jaeger_client.senders import HTTPSender, Sender
+from jaeger_client.TUDPTransport import TUDPTransport
+from jaeger_client.utils import raise_with_value
+from thrift.protocol import TCompactProtocol
+from thrift.Thrift import TMessageType, TType
+from thrift.transport.TTransport import TMemoryBuffer
+from thrift.TSerialization import serialize
+
+
+log = logging.getLogger(__name__)
+
+
+DROP_NEWEST = "drop-newest"
+DROP_OLDEST = "drop-oldest"
+
+backpressure_policies = (DROP_NEWEST, DROP_OLDEST)
+
+HTTP = "http"
+UDP = "udp"
+UNIX = "unix"
+
+transports = (HTTP, UDP, UNIX)
+
+# jaeger_client's limit, within the 65507 byte payload of a UDP datagram over IPv4
+DEFAULT_MAX_PACKET_SIZE = 65000
+
+
+def gzip_compress(data, compresslevel=6):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=compresslevel) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+class GzipHTTPSender(HTTPSender):
+    """
+    An HTTPSender posting gzip compressed Thrift batches.  As with HTTPSender, batches are posted with a single
+    requests Session, whose connection is kept alive between flushes.
+    """
+
+    def send(self, batch):
+        headers = {"Content-Type": "application/x-thrift", "Content-Encoding": "gzip"}
+        if self.auth_token:
+            headers["Authorization"] = "Bearer {}".format(self.auth_token)
+
+        data = gzip_compress(serialize(batch))
+        headers["Content-Length"] = str(len(data))
+
+        try:
+            self._post(data, headers)
+        except Exception as e:
+            raise_with_value(e, "POST to jaeger_endpoint failed: {}".format(e))
+
+
+class BatchingReporter(Reporter):
+    """
+    A jaeger Reporter applying a backpressure policy when its queue is full, and warning of the first span
+    it drops, which are otherwise only counted by the tracer's metrics.
+    """
+
+    def __init__(self, sender, backpressure=DROP_NEWEST, **kwargs):
+        super(BatchingReporter, self).__init__(sender=sender, **kwargs)
+        self.backpressure = backpressure
+        self._warned = False
+
+        count_dropped = self.metrics.reporter_dropped
+
+        def reporter_dropped(value):
+            if not self._warned:
+                self._warned = True
+                log.warning(
+                    "Dropping finished spans because the reporter queue of {} is full.  Consider increasing "
+                    "SIGNALFX_REPORTER_QUEUE_SIZE.".format(self.queue_capacity)
+                )
+            count_dropped(value)
+
+        self.metrics.reporter_dropped = reporter_dropped
+
+    def report_span(self, span):
+        if self.backpressure == DROP_OLDEST and self.queue.full():
+            self._drop_oldest()
+        super(BatchingReporter, self).report_span(span)
+
+    def _drop_oldest(self):
+        """Removes the oldest queued span, leaving any flush or stop sentinels in place"""
+        with self.queue.mutex:
+            queued = self.queue.queue
+            for i, item in enumerate(queued):
+                if item is not self.stop and item is not self.flusher:
+                    del queued[i]
+                    break
+            else:
+                return False
+        self.queue.task_done()  # The dropped span won't be consumed
+        self.metrics.reporter_dropped(1)
+        return True
+
+
+class TUnixDatagramTransport(TUDPTransport):
+    """A TUDPTransport sending its datagrams to a unix socket"""
+
+    def __init__(self, path, blocking=False):
+        self.transport_path = path
+        self.transport_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.transport_sock.setblocking(blocking)
+
+    def write(self, buf):
+        return self.transport_sock.sendto(buf, self.transport_path)
+
+
+class PacketSenderMetrics(object):
+    """Counters of a PacketSender's datagrams and spans, created by a jaeger metrics factory"""
+
+    def __init__(self, metrics_factory):
+        def counter(name, result):
+            return metrics_factory.create_counter(name=name, tags={"result": result})
+
+        self.packets_sent = counter("sfx:export_packets", "sent")
+        self.packets_failed = counter("sfx:export_packets", "failed")
+        self.spans_sent = counter("sfx:export_spans", "sent")
+        self.spans_dropped = counter("sfx:export_spans", "dropped")
+
+
+class PacketSender(Sender):
+    """
+    A Sender of batches as Thrift compact emitBatch datagrams of at most max_packet_size bytes, like jaeger_client's
+    UDPSender, for any datagram transport.  Each span is encoded once, and packed into as few datagrams as it fits.
+    Nothing is acknowledged, so sending never waits on the agent, and spans are accounted for by the metrics
+    factory's sfx:export_packets counters of sent and failed datagrams and sfx:export_spans counters of spans sent,
+    and dropped for exceeding a datagram alone or being in one that failed to send.  The first failure is logged.
+    """
+
+    def __init__(self, transport, batch_size=10, max_packet_size=DEFAULT_MAX_PACKET_SIZE, metrics_factory=None):
+        super(PacketSender, self).__init__(batch_size=batch_size)
+        self.transport = transport
+        self.max_packet_size = max_packet_size
+        self.metrics = PacketSenderMetrics(metrics_factory or MetricsFactory())
+        self._encoded_process = (None, None)  # (process, its encoding)
+        self._warned = False
+
+    def getProtocol(self, transport):
+        return TCompactProtocol.TCompactProtocol(transport)
+
+    def _warn(self, message):
+        if not self._warned:
+            self._warned = True
+            log.warning(message)
+
+    def _encode(self, thrift_object):
+        buf = TMemoryBuffer()
+        thrift_object.write(self.getProtocol(buf))
+        return buf.getvalue()
+
+    def _encode_packet(self, encoded_process, encoded_spans):
+        """An emitBatch message of encoded process and spans, whose struct encodings are self-contained"""
+        buf = TMemoryBuffer()
+        protocol = self.getProtocol(buf)
+        protocol.writeMessageBegin("emitBatch", TMessageType.ONEWAY, 0)
+        protocol.writeStructBegin("emitBatch_args")
+        protocol.writeFieldBegin("batch", TType.STRUCT, 1)
+        protocol.writeStructBegin("Batch")
+        protocol.writeFieldBegin("process", TType.STRUCT, 1)
+        buf.write(encoded_process)
+        protocol.writeFieldEnd()
+        protocol.writeFieldBegin("spans", TType.LIST, 2)
+        protocol.writeListBegin(TType.STRUCT, len(encoded_spans))
+        buf.write(b"".join(encoded_spans))
+        protocol.writeListEnd()
+        protocol.writeFieldEnd()
+        protocol.writeFieldStop()
+        protocol.writeStructEnd()
+        protocol.writeFieldEnd()
+        protocol.writeFieldStop()
+        protocol.writeStructEnd()
+        protocol.writeMessageEnd()
+        return buf.getvalue()
+
+    def _batch_and_send(self, spans, process):
+        """Sends spans in packets, returning how many were handled, whether sent or dropped"""
+        encoded_process = self._encoded_process[1]
+        if self._encoded_process[0] is not process:
+            encoded_process = self._encode(process)
+            self._encoded_process = (process, encoded_process)
+        # A list header of up to 3 bytes rather than the 1 of no spans
+        max_span_space = self.max_packet_size - len(self._encode_packet(encoded_process, [])) - 2
+
+        packet, packet_size = [], 0
+        for span in spans:
+            with span.update_lock:
+                jaeger_span = thrift.make_jaeger_span(span)
+            encoded = self._encode(jaeger_span)
+            if len(encoded) > max_span_space:
+                self.metrics.spans_dropped(1)
+                self._warn("Dropping span of {} bytes, which exceeds a packet.".format(len(encoded)))
+                continue
+            if packet_size + len(encoded) > max_span_space:
+                self._send_packet(encoded_process, packet)
+                packet, packet_size = [], 0
+            packet.append(encoded)
+            packet_size += len(encoded)
+
+        if packet:
+            self._send_packet(encoded_process, packet)
+        return len(spans)
+
+    def _send_packet(self, encoded_process, encoded_spans):
+        try:
+            self.transport.write(self._encode_packet(encoded_process, encoded_spans))
+        except (socket.error, IOError) as e:
+            self.metrics.packets_failed(1)
+            self.metrics.spans_dropped(len(encoded_spans))
+            self._warn("Failed to send span packet: {}".format(e))
+        else:
+            self.metrics.packets_sent(1)
+            self.metrics.spans_sent(len(encoded_spans))
+
+
+def create_sender(
+    jaeger_config,
+    transport=HTTP,
+    compression=False,
+    max_packet_size=DEFAULT_MAX_PACKET_SIZE,
+    agent_host="localhost",
+    agent_port=6831,
+    agent_socket="",
+):
+    """Returns a sender of the batches of a jaeger_client Config by transport"""
+    batch_size = jaeger_config.reporter_batch_size
+    if transport in (UDP, UNIX):
+        if transport == UDP:
+            datagrams = TUDPTransport(agent_host, agent_port)
+        else:
+            datagrams = TUnixDatagramTransport(agent_socket)
+        return PacketSender(
+            datagrams,
+            batch_size=batch_size,
+            max_packet_size=max_packet_size,
+            metrics_factory=jaeger_config._metrics_factory,
+        )
+
+    sender_class = GzipHTTPSender if compression else HTTPSender
+    return sender_class(
+        endpoint=jaeger_config.jaeger_endpoint,
+        auth_token=jaeger_config.jaeger_auth_token,
+        user=jaeger_config.jaeger_user,
+        password=jaeger_config.jaeger_password,
+        batch_size=batch_size,
+    )
+
+
+def create_reporter(jaeger_config, compression=False, backpressure=DROP_NEWEST, sender=None):
+    """
+    Returns a BatchingReporter for a jaeger_client Config, configured like the reporter of its tracers.  Its
+    sender is that of the Config's endpoint unless provided.
+    """
+    if backpressure not in backpressure_policies:
+        log.warning(
+            "Unknown reporter backpressure policy {!r}.  Using {}.".format(backpressure, DROP_NEWEST)
+        )
+        backpressure = DROP_NEWEST
+
+    if sender is None:
+        sender = create_sender(jaeger_config, compression=compression)
+    return BatchingReporter(
+        sender,
+        backpressure=backpressure,
+        queue_capacity=jaeger_config.reporter_queue_size,
+        flush_interval=jaeger_config.reporter_flush_interval,
+        logger=jaeger_config.logger,
+        metrics_factory=jaeger_config._metrics_factory,
+        error_reporter=jaeger_config.error_reporter,
+    )
+
+
+def close_replaced_reporter(reporter):
+    """
+    Closes a reporter built by a jaeger_client Config, but replaced before reporting any spans, along with the
+    session of its HTTPSender.
+    """
+    reporter.close()
+    client = getattr(getattr(reporter, "_sender", None), "client", None)
+    if client is not None:
+        client.close()
+
+
+def reporter_from_settings(jaeger_config, env):
+    """
+    Returns the reporter for a jaeger_client Config with export options configured by settings, or None if the
+    Config's own reporter suffices.
+    """
+    transport = env.export_transport.strip().lower()
+    if transport not in transports:
+        log.warning("Unknown export transport {!r}.  Using {}.".format(env.export_transport, HTTP))
+        transport = HTTP
+    if transport == UNIX and not env.agent_socket:
+        log.warning("SIGNALFX_AGENT_SOCKET is required by the unix export transport.  Using {}.".format(HTTP))
+        transport = HTTP
+
+    if transport == HTTP:
+        customized = env.reporter_compression or env.reporter_backpressure != DROP_NEWEST
+        if not jaeger_config.jaeger_endpoint or not customized:
+            return None
+
+    sender = create_sender(
+        jaeger_config,
+        transport,
+        compression=env.reporter_compression,
+        max_packet_size=env.export_max_packet_size,
+        agent_host=env.agent_host,
+        agent_port=env.agent_port,
+        agent_socket=env.agent_socket,
+    )
+    return create_reporter(jaeger_config, backpressure=env.reporter_backpressure, sender=sender)
@@ -0,0 +1,131 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Sampling rules for the requests of HTTP server instrumentations, configured by SIGNALFX_SAMPLING_RULES as ";"
+separated "operation:pattern=rate" or "path:pattern=rate" rules, e.g.:
+
+    path:^/health$=drop;path:^/metrics=0.01;operation:^Admin=0.5
+
+The first rule whose regular expression is found in the operation name or request path of a request without a
+propagated span context determines the rate of such requests that are traced, with the remainder started as
+unsampled spans (sampling.priority 0) before any of their tags are built.  Traced requests are still subject to
+the tracer's own sampler.  "drop" is a rate of 0.
+"""
+from collections import OrderedDict
+from threading import Lock
+import logging
+import random
+import re
+
+from opentracing.ext import tags
+
+from . import settings
+
+
+log = logging.getLogger(__name__)
+
+
+OPERATION = "operation"
+PATH = "path"
+DROP = "drop"
+
+# Rates by (operation name, path) beyond this many aren't retained
+_decision_cache_size = 1024
+
+
+def _parse_rate(value):
+    value = value.strip().lower()
+    rate = 0.0 if value == DROP else float(value)
+    if not 0 <= rate <= 1:
+        raise ValueError("rate {} isn't between 0 and 1".format(rate))
+    return rate
+
+
+def parse_rules(value):
+    """
+    Returns the (kind, compiled pattern, rate) of each ";" separated "kind:pattern=rate" rule, split at the last
+    "=" of each.  Invalid rules are logged and ignored.
+    """
+    rules = []
+    for rule in (value or "").split(";"):
+        rule = rule.strip()
+        if not rule:
+            continue
+        kind, _, rest = rule.partition(":")
+        pattern, sep, rate = rest.rpartition("=")
+        try:
+            kind = kind.strip().lower()
+            if kind not in (OPERATION, PATH):
+                raise ValueError("unknown kind {!r}".format(kind))
+            if not sep:
+                raise ValueError("missing rate")
+            rules.append((kind, re.compile(pattern), _parse_rate(rate)))
+        except (re.error, ValueError) as e:
+            log.warning("Ignoring invalid sampling rule {!r}: {}".format(rule, e))
+    return rules
+
+
+class SamplingRules(object):
+    """
+    Determines whether requests are dropped by the rate of the first matching rule.  Rates are retained by operation
+    name and path, so that each is matched against the rules only once.
+    """
+
+    def __init__(self, rules, random=random.random):
+        self.rules = tuple(rules)
+        self.random = random
+        self._rates = OrderedDict()
+        self._rates_lock = Lock()
+
+    def rate(self, operation_name, path):
+        """The rate of the first rule matching the request, or None if none match"""
+        key = (operation_name, path)
+        with self._rates_lock:
+            if key in self._rates:
+                return self._rates[key]
+
+        rate = None
+        for kind, pattern, rule_rate in self.rules:
+            value = operation_name if kind == OPERATION else path
+            if value is not None and pattern.search(value):
+                rate = rule_rate
+                break
+
+        with self._rates_lock:
+            self._rates[key] = rate
+            if len(self._rates) > _decision_cache_size:
+                self._rates.popitem(last=False)
+        return rate
+
+    def drops(self, operation_name, path):
+        rate = self.rate(operation_name, path)
+        if rate is None or rate >= 1:
+            return False
+        return rate <= 0 or self.random() >= rate
+
+
+# (Settings, SamplingRules or None) of the current settings
+_configured = [(None, None)]
+
+
+def get():
+    """Returns the SamplingRules configured by the current settings, or None if there are none"""
+    env = settings.get()
+    configured_env, rules = _configured[0]
+    if configured_env is not env:
+        parsed = parse_rules(env.sampling_rules)
+        rules = SamplingRules(parsed) if parsed else None
+        _configured[0] = (env, rules)
+    return rules
+
+
+def start_tags(span_ctx, operation_name, path):
+    """
+    Returns the tags with which to start the span of a request, which make it unsampled if it has no propagated
+    span context and the configured rules drop it, otherwise None.
+    """
+    if span_ctx is not None:  # The decision was made upstream
+        return None
+    rules = get()
+    if rules is None or not rules.drops(operation_name, path):
+        return None
+    return {tags.SAMPLING_PRIORITY: 0}
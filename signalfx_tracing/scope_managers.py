@@ -0,0 +1,146 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Selection of the scope manager used by create_tracer(), configurable by SIGNALFX_SCOPE_MANAGER.
+
+By default ("auto"), a gevent scope manager is used if gevent has patched threading, otherwise
+thread-local scopes are used until an instrumentor for an asynchronous framework promotes the
+tracer to that framework's scope manager.  Tracers created after promotion are given that manager,
+and a TracerProxy of create_fork_safe_tracer() replaces the tracer it proxies with one using it.
+"""
+import logging
+import sys
+
+from opentracing.scope_managers import ThreadLocalScopeManager
+
+from . import settings
+
+
+log = logging.getLogger(__name__)
+
+
+AUTO = "auto"
+THREAD_LOCAL = "thread-local"
+CONTEXTVARS = "contextvars"
+ASYNCIO = "asyncio"
+TORNADO = "tornado"
+GEVENT = "gevent"
+
+scope_manager_names = (AUTO, THREAD_LOCAL, CONTEXTVARS, ASYNCIO, TORNADO, GEVENT)
+
+# The scope manager name an instrumentor has promoted tracers to, if any
+_promoted = [None]
+
+
+def _contextvars():
+    from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+
+    return ContextVarsScopeManager
+
+
+def _asyncio():
+    # opentracing's AsyncioScopeManager relies on Task.current_task(), removed in Python 3.9.
+    # asyncio tasks run in copies of their creator's context, so contextvars suffice from 3.7.
+    if sys.version_info >= (3, 7):
+        return _contextvars()
+
+    from opentracing.scope_managers.asyncio import AsyncioScopeManager
+
+    return AsyncioScopeManager
+
+
+def _tornado():
+    try:  # Selects the appropriate manager for the installed Tornado version
+        from tornado_opentracing.scope_managers import TornadoScopeManager
+    except ImportError:
+        from opentracing.scope_managers.tornado import TornadoScopeManager
+
+    return TornadoScopeManager
+
+
+def _gevent():
+    from opentracing.scope_managers.gevent import GeventScopeManager
+
+    return GeventScopeManager
+
+
+_loaders = {
+    THREAD_LOCAL: lambda: ThreadLocalScopeManager,
+    CONTEXTVARS: _contextvars,
+    ASYNCIO: _asyncio,
+    TORNADO: _tornado,
+    GEVENT: _gevent,
+}
+
+
+def scope_manager_class(name):
+    """Returns the scope manager class for a name in scope_manager_names, other than auto"""
+    try:
+        loader = _loaders[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown scope manager {!r}.  Expected one of {}.".format(
+                name, ", ".join(scope_manager_names)
+            )
+        )
+    return loader()
+
+
+def _gevent_patched():
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def default_scope_manager():
+    """Returns the scope manager class for a new tracer as configured by SIGNALFX_SCOPE_MANAGER"""
+    name = settings.get().scope_manager
+    if name != AUTO:
+        try:
+            return scope_manager_class(name)
+        except (ValueError, ImportError) as e:
+            log.warning(
+                "Unable to use {!r} scope manager ({}).  Falling back to {!r}.".format(
+                    name, e, AUTO
+                )
+            )
+
+    if _gevent_patched():
+        return _gevent()
+    if _promoted[0] is not None:
+        return scope_manager_class(_promoted[0])
+    return ThreadLocalScopeManager
+
+
+def is_thread_local(tracer):
+    """Whether a tracer tracks active spans only per thread, with the thread-local default, and not per task"""
+    return type(getattr(tracer, "scope_manager", None)) is ThreadLocalScopeManager
+
+
+def promote(tracer, name):
+    """
+    Selects the scope manager named for tracers that would otherwise use the automatically selected
+    thread-local default, for use by instrumentors whose frameworks don't run requests in dedicated
+    threads.  Tracers created from then on use it, and an existing tracer is replaced through its
+    set_scope_manager() if it has one, which is only done before any scopes are active, as those of
+    the replaced manager would be abandoned.  Other tracers keep their scope manager.
+    """
+    if settings.get().scope_manager != AUTO:
+        return
+
+    try:
+        promoted = scope_manager_class(name)
+    except ImportError:
+        log.debug("Unable to promote tracers to {!r} scope manager.".format(name))
+        return
+
+    if promoted is ThreadLocalScopeManager or _gevent_patched():
+        return
+    _promoted[0] = name
+
+    if not is_thread_local(tracer) or tracer.scope_manager.active is not None:
+        return
+
+    set_scope_manager = getattr(tracer, "set_scope_manager", None)
+    if set_scope_manager is not None and set_scope_manager(promoted):
+        log.debug("Promoted tracer to {} scope manager.".format(promoted.__name__))
+    else:
+        log.debug("Unable to promote tracer to {} scope manager.".format(promoted.__name__))
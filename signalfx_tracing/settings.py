@@ -0,0 +1,221 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+A parsed snapshot of all SIGNALFX_* and SPLUNK_* environment configuration.
+
+The environment is read once, upon the first get(), so that instrumentation never needs to consult
+os.environ or parse its values again.  Changes to the environment made after that point are only
+observed after an explicit reload().
+"""
+import logging
+import os
+
+from .constants import (
+    default_max_tag_value_length,
+    logging_format,
+    traceable_libraries,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+# Accepted case-insensitive disabling environment variable values
+_falsy = ("0", "0.0", "f", "false", "n", "no")
+
+
+def is_truthy(value):
+    return bool(value) and str(value).lower().strip() not in _falsy
+
+
+class Settings(object):
+    """An immutable, typed view of the tracing environment variables"""
+
+    __slots__ = (
+        "tracing_enabled",
+        "lazy_instrumentation",
+        "libraries_enabled",
+        "service_name",
+        "endpoint_url",
+        "access_token",
+        "sampler_type",
+        "sampler_param",
+        "sampling_rules",
+        "reporter_max_batch",
+        "reporter_flush_interval",
+        "reporter_queue_size",
+        "reporter_compression",
+        "reporter_backpressure",
+        "export_transport",
+        "export_max_packet_size",
+        "agent_host",
+        "agent_port",
+        "agent_socket",
+        "tail_sampling",
+        "tail_sampling_latency_ms",
+        "tail_sampling_probability",
+        "tail_sampling_max_traces",
+        "tail_sampling_max_spans",
+        "metrics_enabled",
+        "metrics_log_interval",
+        "shutdown_timeout",
+        "shutdown_on_sigterm",
+        "propagation",
+        "tracing_debug",
+        "scope_manager",
+        "environment",
+        "recorded_value_max_length",
+        "error_stack_max_frames",
+        "trace_response_header_enabled",
+        "url_normalization",
+        "url_normalization_rules",
+        "url_normalization_cache_size",
+        "logs_injection",
+        "logs_injection_lazy",
+        "logging_format",
+        "startup_profile",
+        "startup_profile_path",
+    )
+
+    def __init__(self, environ=None):
+        env = _Environment(os.environ if environ is None else environ)
+        _set = super(Settings, self).__setattr__
+
+        _set("tracing_enabled", env.bool("SIGNALFX_TRACING_ENABLED", True))
+        _set("lazy_instrumentation", env.bool("SIGNALFX_LAZY_INSTRUMENTATION", False))
+        _set(
+            "libraries_enabled",
+            {
+                library: env.bool("SIGNALFX_{}_ENABLED".format(library.upper()), True)
+                for library in traceable_libraries
+            },
+        )
+
+        _set("service_name", env.str("SIGNALFX_SERVICE_NAME", "SignalFx-Tracing"))
+        _set(
+            "endpoint_url",
+            env.str(
+                "SIGNALFX_ENDPOINT_URL",
+                env.str(
+                    "SIGNALFX_INGEST_URL",  # Backwards compatibility
+                    "http://localhost:9080/v1/trace",
+                ),
+            ),
+        )
+        _set("access_token", env.str("SIGNALFX_ACCESS_TOKEN"))
+        _set("sampler_type", env.str("SIGNALFX_SAMPLER_TYPE", "const"))
+        _set("sampler_param", env.str("SIGNALFX_SAMPLER_PARAM", "1"))
+        _set("sampling_rules", env.str("SIGNALFX_SAMPLING_RULES", ""))
+        _set("reporter_max_batch", env.int("SIGNALFX_REPORTER_MAX_BATCH", 10))
+        _set("reporter_flush_interval", env.float("SIGNALFX_REPORTER_FLUSH_INTERVAL", 1.0))
+        _set("reporter_queue_size", env.int("SIGNALFX_REPORTER_QUEUE_SIZE", 100))
+        _set("reporter_compression", env.bool("SIGNALFX_REPORTER_COMPRESSION", False))
+        _set("reporter_backpressure", env.str("SIGNALFX_REPORTER_BACKPRESSURE", "drop-newest"))
+        _set("export_transport", env.str("SIGNALFX_EXPORT_TRANSPORT", "http"))
+        _set("export_max_packet_size", env.int("SIGNALFX_EXPORT_MAX_PACKET_SIZE", 65000))
+        _set("agent_host", env.str("SIGNALFX_AGENT_HOST", "localhost"))
+        _set("agent_port", env.int("SIGNALFX_AGENT_PORT", 6831))
+        _set("agent_socket", env.str("SIGNALFX_AGENT_SOCKET", ""))
+        _set("tail_sampling", env.bool("SIGNALFX_TAIL_SAMPLING", False))
+        _set("tail_sampling_latency_ms", env.int("SIGNALFX_TAIL_SAMPLING_LATENCY_MS", 1000))
+        _set("tail_sampling_probability", env.float("SIGNALFX_TAIL_SAMPLING_PROBABILITY", 0.1))
+        _set("tail_sampling_max_traces", env.int("SIGNALFX_TAIL_SAMPLING_MAX_TRACES", 1000))
+        _set("tail_sampling_max_spans", env.int("SIGNALFX_TAIL_SAMPLING_MAX_SPANS", 10000))
+        _set("metrics_enabled", env.bool("SIGNALFX_METRICS_ENABLED", False))
+        _set("metrics_log_interval", env.float("SIGNALFX_METRICS_LOG_INTERVAL", 0.0))
+        _set("shutdown_timeout", env.float("SIGNALFX_SHUTDOWN_TIMEOUT", 5.0))
+        _set("shutdown_on_sigterm", env.bool("SIGNALFX_SHUTDOWN_ON_SIGTERM", False))
+        _set("propagation", env.str("SIGNALFX_PROPAGATION", "b3"))
+        _set("tracing_debug", env.bool("SIGNALFX_TRACING_DEBUG", False))
+        _set(
+            "scope_manager",
+            env.str("SIGNALFX_SCOPE_MANAGER", "auto").strip().lower().replace("_", "-"),
+        )
+        _set("environment", env.str("SIGNALFX_ENV", ""))
+        _set(
+            "recorded_value_max_length",
+            env.int("SIGNALFX_RECORDED_VALUE_MAX_LENGTH", default_max_tag_value_length),
+        )
+        _set("error_stack_max_frames", env.int("SIGNALFX_ERROR_STACK_MAX_FRAMES", 0))
+
+        _set(
+            "trace_response_header_enabled",
+            env.bool("SPLUNK_TRACE_RESPONSE_HEADER_ENABLED", True),
+        )
+
+        _set("url_normalization", env.bool("SIGNALFX_URL_NORMALIZATION", False))
+        _set("url_normalization_rules", env.str("SIGNALFX_URL_NORMALIZATION_RULES", ""))
+        _set(
+            "url_normalization_cache_size",
+            env.int("SIGNALFX_URL_NORMALIZATION_CACHE_SIZE", 1024),
+        )
+
+        _set("logs_injection", env.bool("SIGNALFX_LOGS_INJECTION", False))
+        _set("logs_injection_lazy", env.bool("SIGNALFX_LOGS_INJECTION_LAZY", False))
+        _set("logging_format", env.str("SIGNALFX_LOGGING_FORMAT", logging_format))
+
+        _set("startup_profile", env.bool("SIGNALFX_STARTUP_PROFILE", False))
+        _set("startup_profile_path", env.str("SIGNALFX_STARTUP_PROFILE_PATH"))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are immutable.  Use settings.reload() instead.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Settings are immutable.  Use settings.reload() instead.")
+
+    def __repr__(self):
+        fields = (
+            "{}={!r}".format(name, "***" if name == "access_token" else getattr(self, name))
+            for name in self.__slots__
+        )
+        return "Settings({})".format(", ".join(fields))
+
+    def library_enabled(self, library):
+        return self.libraries_enabled.get(library, True)
+
+
+class _Environment(object):
+    """Typed accessors for a mapping of environment variables"""
+
+    def __init__(self, environ):
+        self.environ = environ
+
+    def str(self, name, default=None):
+        return self.environ.get(name, default)
+
+    def bool(self, name, default):
+        return is_truthy(self.environ.get(name, default))
+
+    def int(self, name, default):
+        return self._number(int, "integer", name, default)
+
+    def float(self, name, default):
+        return self._number(float, "number", name, default)
+
+    def _number(self, parse, description, name, default):
+        value = self.environ.get(name)
+        if value is None:
+            return default
+        try:
+            return parse(value)
+        except ValueError:
+            log.warning(
+                "Invalid {} {}={!r}.  Using default of {}.".format(description, name, value, default)
+            )
+            return default
+
+
+_settings = [None]
+
+
+def get():
+    """Returns the current Settings, reading the environment upon first invocation"""
+    current = _settings[0]
+    if current is None:
+        current = reload()
+    return current
+
+
+def reload(environ=None):
+    """Rereads the environment (or the provided mapping), returning the new Settings"""
+    _settings[0] = Settings(environ)
+    return _settings[0]
@@ -0,0 +1,239 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Bounded flushing of create_tracer()'s tracers at exit, and optionally on SIGTERM.
+
+Each tracer is closed in a daemon thread that is waited on for at most SIGNALFX_SHUTDOWN_TIMEOUT seconds, shared by
+all registered tracers, so a slow or unreachable endpoint can't keep the process from exiting.  Spans still queued
+or buffered by a reporter at the deadline are abandoned.  The spans sent and those that failed to send are counted
+from the results their reporters and senders record.
+
+If SIGNALFX_SHUTDOWN_ON_SIGTERM is True, SIGTERM flushes the tracers the same way before invoking the handler it
+replaced, which may keep the process running, so they're left open.  Without a replaced handler, the tracers are
+closed and the process is terminated as it would have been.  SIGTERM isn't handled if it was being ignored.
+"""
+from threading import RLock, Thread
+import atexit
+import logging
+import os
+import signal
+import time
+
+from jaeger_client.reporter import Reporter
+
+from . import settings
+from .reporting import PacketSenderMetrics
+from .tail_sampling import TailSamplingReporter
+
+
+log = logging.getLogger(__name__)
+
+# Tracers to close at shutdown, in registration order
+_tracers = []
+_lock = RLock()  # Reentrant for SIGTERM arriving while registering
+_exit_handler_registered = [False]
+
+# The SIGTERM handler replaced by ours, once installed
+_previous_sigterm_handler = [None]
+
+
+def _queueing_reporter(reporter):
+    """The jaeger Reporter queueing spans for a tracer's reporter, or None if it doesn't queue them"""
+    while isinstance(reporter, TailSamplingReporter):
+        reporter = reporter.reporter
+    return reporter if isinstance(reporter, Reporter) else None
+
+
+def pending_spans(reporter):
+    """The spans a jaeger Reporter has queued or its sender has buffered, without having sent them"""
+    reporter = _queueing_reporter(reporter)
+    if reporter is None:
+        return 0
+    queue = reporter.queue
+    with queue.mutex:
+        queued = sum(1 for item in queue.queue if item is not reporter.stop and item is not reporter.flusher)
+    return queued + len(getattr(reporter._sender, "spans", ()))
+
+
+class SendResults(object):
+    """
+    The spans a jaeger Reporter sends and fails to send while counting, taken from the counters its consumer thread
+    records them with.  A PacketSender reports every span as successful, so its own counters are used instead.
+    """
+
+    def __init__(self, reporter):
+        self.sent = 0
+        self.failed = 0
+        self._wrapped = []
+        reporter = _queueing_reporter(reporter)
+        if reporter is None:
+            return
+        sender_metrics = getattr(reporter._sender, "metrics", None)
+        if isinstance(sender_metrics, PacketSenderMetrics):
+            self._count(sender_metrics, "spans_sent", "sent")
+            self._count(sender_metrics, "spans_dropped", "failed")
+        else:
+            self._count(reporter.metrics, "reporter_success", "sent")
+        self._count(reporter.metrics, "reporter_failure", "failed")
+
+    def _count(self, metrics, counter_name, result):
+        counter = getattr(metrics, counter_name)
+
+        def count(value):
+            setattr(self, result, getattr(self, result) + value)
+            counter(value)
+
+        setattr(metrics, counter_name, count)
+        self._wrapped.append((metrics, counter_name, counter))
+
+    def stop(self):
+        for metrics, counter_name, counter in self._wrapped:
+            setattr(metrics, counter_name, counter)
+        del self._wrapped[:]
+
+
+def _wait_for(tracer, drain, timeout):
+    """
+    Calls drain in a daemon thread, waiting at most timeout seconds for it.  Returns the count of spans sent, the count
+    that failed to send, and the count abandoned at the deadline.
+    """
+    results = SendResults(tracer.reporter)
+    try:
+        drainer = Thread(target=drain, name="signalfx-tracing-shutdown")
+        drainer.daemon = True
+        try:
+            drainer.start()
+        except RuntimeError:  # Threads can't be started while the interpreter finalizes
+            drain()
+        else:
+            drainer.join(timeout)
+        abandoned = pending_spans(tracer.reporter) if drainer.is_alive() else 0
+        return results.sent, results.failed, abandoned
+    finally:
+        results.stop()
+
+
+def close_tracer(tracer, timeout):
+    """
+    Closes a tracer, waiting at most timeout seconds for its spans to be sent.  Returns the count of spans sent, the
+    count that failed to send, and the count abandoned at the deadline.
+    """
+    return _wait_for(tracer, tracer.close, timeout)
+
+
+def flush_tracer(tracer, timeout):
+    """Like close_tracer(), but leaves the tracer open to report later spans"""
+    flush = getattr(tracer.reporter, "flush", None)
+    if flush is None:
+        return 0, 0, 0
+    reporter = _queueing_reporter(tracer.reporter)
+    if reporter is not None:
+        consumer = reporter._consume_queue_thread
+        if consumer is None or not consumer.is_alive():  # Nothing would take the flush from the queue
+            return 0, 0, pending_spans(reporter)
+    return _wait_for(tracer, flush, timeout)
+
+
+def register(tracer, env=None):
+    """Closes a tracer at shutdown, installing the exit and SIGTERM handlers on first use"""
+    env = env or settings.get()
+    with _lock:
+        _tracers.append(tracer)
+        if not _exit_handler_registered[0]:
+            atexit.register(shutdown)
+            _exit_handler_registered[0] = True
+    if env.shutdown_on_sigterm:
+        install_sigterm_handler()
+
+
+def discard(tracer):
+    """
+    Forgets a tracer inherited by a forked process, so it isn't closed there, and drops the spans its reporter had
+    queued or buffered, which remain the parent's to send.  Called from an after-fork hook, where only the forking
+    thread exists, so no lock that another thread may have held while forking is taken.
+    """
+    _tracers[:] = [registered for registered in _tracers if registered is not tracer]
+    reporter = _queueing_reporter(tracer.reporter)
+    if reporter is None:
+        return
+    reporter.stopped = True  # Any spans still finished with the tracer are dropped
+    reporter.queue = type(reporter.queue)(maxsize=reporter.queue_capacity)
+    if hasattr(reporter._sender, "spans"):
+        reporter._sender.spans = []
+
+
+def _drain_all(tracers, drain, timeout, action):
+    if timeout is None:
+        timeout = settings.get().shutdown_timeout
+    deadline = time.time() + timeout
+    sent = failed = abandoned = 0
+    for tracer in tracers:
+        tracer_sent, tracer_failed, tracer_abandoned = drain(tracer, max(deadline - time.time(), 0))
+        sent += tracer_sent
+        failed += tracer_failed
+        abandoned += tracer_abandoned
+
+    if failed or abandoned:
+        log.warning(
+            "Sent {} spans at {}, but {} failed to send and {} were abandoned unsent after the {}s timeout.".format(
+                sent, action, failed, abandoned, timeout
+            )
+        )
+    elif sent:
+        log.info("Sent {} spans at {}.".format(sent, action))
+    return sent, failed, abandoned
+
+
+def shutdown(timeout=None):
+    """
+    Closes the registered tracers within timeout seconds, defaulting to SIGNALFX_SHUTDOWN_TIMEOUT.  Returns the
+    total count of spans sent, the count that failed to send, and the count abandoned.
+    """
+    with _lock:
+        tracers = list(_tracers)
+        del _tracers[:]
+    return _drain_all(tracers, close_tracer, timeout, "shutdown")
+
+
+def close(tracer, timeout=None):
+    """Closes a registered tracer that has been replaced, within timeout seconds, and stops closing it at shutdown"""
+    with _lock:
+        _tracers[:] = [registered for registered in _tracers if registered is not tracer]
+    return _drain_all([tracer], close_tracer, timeout, "close")
+
+
+def flush(timeout=None):
+    """Like shutdown(), but leaves the registered tracers open"""
+    with _lock:
+        tracers = list(_tracers)
+    return _drain_all(tracers, flush_tracer, timeout, "flush")
+
+
+def _handle_sigterm(signum, frame):
+    previous = _previous_sigterm_handler[0]
+    if callable(previous):
+        flush()
+        previous(signum, frame)
+    else:
+        shutdown()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+
+def install_sigterm_handler():
+    """
+    Flushes the registered tracers on SIGTERM before chaining to the existing handler.  Returns whether the handler
+    is installed, which is only possible from the main thread, and not done if SIGTERM is ignored.
+    """
+    with _lock:
+        current = signal.getsignal(signal.SIGTERM)
+        if current is _handle_sigterm:
+            return True
+        if current == signal.SIG_IGN:
+            return False
+        try:
+            previous = signal.signal(signal.SIGTERM, _handle_sigterm)
+        except ValueError:  # Not the main thread
+            log.warning("Unable to flush spans on SIGTERM, as tracing wasn't configured in the main thread.")
+            return False
+        _previous_sigterm_handler[0] = previous
+        return True
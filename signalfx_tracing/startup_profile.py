@@ -0,0 +1,100 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Opt-in timing of tracer bootstrap phases, enabled by the SIGNALFX_STARTUP_PROFILE environment variable.
+
+Each phase records its wall-clock duration and the number of modules imported while it ran.
+Phases may be nested, as with the per-library phases of auto_instrument().  The profile is
+written as JSON to SIGNALFX_STARTUP_PROFILE_PATH at exit, or to stderr if no path is set, since
+logging may not be configured to emit it.
+"""
+from contextlib import contextmanager
+import threading
+import logging
+import atexit
+import json
+import time
+import sys
+
+from . import settings
+
+
+log = logging.getLogger(__name__)
+
+_clock = getattr(time, "perf_counter", time.time)
+_origin = _clock()
+
+_lock = threading.Lock()
+_local = threading.local()
+_phases = []
+_dump_registered = [False]
+
+
+def enabled():
+    return settings.get().startup_profile
+
+
+@contextmanager
+def phase(name):
+    """Records the duration of and imports made by the enclosed block, if profiling is enabled"""
+    if not enabled():
+        yield
+        return
+
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    modules = len(sys.modules)
+    start = _clock()
+    try:
+        yield
+    finally:
+        end = _clock()
+        _local.depth = depth
+        record = dict(
+            name=name,
+            depth=depth,
+            start_ms=round((start - _origin) * 1000, 3),
+            duration_ms=round((end - start) * 1000, 3),
+            imported_modules=len(sys.modules) - modules,
+        )
+        with _lock:
+            _phases.append(record)
+            if not _dump_registered[0]:
+                _dump_registered[0] = True
+                atexit.register(_dump_at_exit)
+
+
+def report():
+    """Returns the recorded phases in start order, with totals of all top-level phases"""
+    with _lock:
+        phases = sorted(_phases, key=lambda p: (p["start_ms"], p["depth"]))
+    top_level = [p for p in phases if p["depth"] == 0]
+    return dict(
+        total_ms=round(sum(p["duration_ms"] for p in top_level), 3),
+        imported_modules=sum(p["imported_modules"] for p in top_level),
+        loaded_modules=len(sys.modules),
+        phases=phases,
+    )
+
+
+def dump(path=None):
+    """Writes the report to path (default SIGNALFX_STARTUP_PROFILE_PATH), or to stderr if there is none"""
+    path = path or settings.get().startup_profile_path
+    profile = report()
+    if path:
+        try:
+            with open(path, "w") as f:
+                json.dump(profile, f, indent=2)
+        except (IOError, OSError):
+            log.exception("Unable to write startup profile to {}".format(path))
+    else:
+        sys.stderr.write("Startup profile: {}\n".format(json.dumps(profile)))
+
+
+def _dump_at_exit():
+    if enabled():  # Unless profiling has since been disabled, as by tests
+        dump()
+
+
+def reset():
+    with _lock:
+        del _phases[:]
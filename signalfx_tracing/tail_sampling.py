@@ -0,0 +1,174 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Tail-based sampling of finished jaeger spans, enabled by SIGNALFX_TAIL_SAMPLING.
+
+A TailSamplingReporter sits between the tracer and its reporter, buffering the spans of each trace until its local
+root span finishes.  The whole trace is then reported if any of its spans has an error tag, if the root took at
+least SIGNALFX_TAIL_SAMPLING_LATENCY_MS, or else with SIGNALFX_TAIL_SAMPLING_PROBABILITY, and dropped otherwise.
+Spans finishing after their trace's decision follow it.  The buffer holds at most
+SIGNALFX_TAIL_SAMPLING_MAX_TRACES traces and SIGNALFX_TAIL_SAMPLING_MAX_SPANS spans, evicting the oldest traces
+beyond those, which are counted by the tracer's metrics factory.  The trace a span is added to is never evicted.
+
+Only spans sampled by the tracer's head sampler are reported to the stage, so it should sample all traces.
+"""
+from collections import OrderedDict
+from threading import Lock
+import random
+
+from opentracing.ext import tags as ext_tags
+
+from . import settings
+from .tags import SFX_TRACING_LIBRARY
+
+
+class TailSamplingMetrics(object):
+    """Counters of a TailSamplingReporter's decisions and evictions, created by a jaeger metrics factory"""
+
+    def __init__(self, metrics_factory):
+        def counter(result):
+            return metrics_factory.create_counter(name="sfx:tail_sampling_traces", tags={"result": result})
+
+        self.kept_traces = counter("kept")
+        self.dropped_traces = counter("dropped")
+        self.evicted_traces = counter("evicted")
+        self.evicted_spans = metrics_factory.create_counter(
+            name="sfx:tail_sampling_spans", tags={"result": "evicted"}
+        )
+
+
+def _is_error_tag(tag):
+    return tag.key == ext_tags.ERROR and (tag.vBool is True or tag.vStr == "true")
+
+
+def has_error(span):
+    return any(_is_error_tag(tag) for tag in span.tags)
+
+
+def is_local_root(span):
+    """
+    Whether a span is the root of its trace in this process: a trace's first span, or one whose parent was
+    propagated, which jaeger gives the tracer's root span tags like those of create_tracer().
+    """
+    if span.context.parent_id is None:
+        return True
+    return any(tag.key == SFX_TRACING_LIBRARY for tag in span.tags)
+
+
+class TailSamplingReporter(object):
+    """
+    A jaeger reporter buffering spans by trace id, and reporting the traces kept upon their local root's finish
+    to another reporter.
+    """
+
+    def __init__(
+        self,
+        reporter,
+        latency_threshold=1.0,
+        probability=0.1,
+        max_traces=1000,
+        max_spans=10000,
+        metrics_factory=None,
+        random=random.random,
+    ):
+        self.reporter = reporter
+        self.latency_threshold = latency_threshold
+        self.probability = probability
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self.random = random
+        self.metrics = None
+        if metrics_factory is not None:
+            self.metrics = TailSamplingMetrics(metrics_factory)
+
+        self._lock = Lock()
+        self._traces = OrderedDict()  # Buffered spans by trace id, oldest first
+        self._span_count = 0
+        self._decisions = OrderedDict()  # Recent decisions by trace id, for spans finishing after them
+
+    @classmethod
+    def from_settings(cls, reporter, metrics_factory=None, env=None):
+        env = env or settings.get()
+        return cls(
+            reporter,
+            latency_threshold=env.tail_sampling_latency_ms / 1000.0,
+            probability=env.tail_sampling_probability,
+            max_traces=env.tail_sampling_max_traces,
+            max_spans=env.tail_sampling_max_spans,
+            metrics_factory=metrics_factory,
+        )
+
+    def set_process(self, service_name, tags, max_length):
+        self.reporter.set_process(service_name, tags, max_length)
+
+    def report_span(self, span):
+        trace_id = span.context.trace_id
+        root = is_local_root(span)
+        with self._lock:
+            decision = self._decisions.get(trace_id)
+            if decision is None:
+                spans = self._buffer(trace_id, span)
+                if not root:
+                    return
+                del self._traces[trace_id]
+                self._span_count -= len(spans)
+                decision = self._decide(spans, span)
+                self._record_decision(trace_id, decision)
+            else:
+                spans = [span]
+
+        if decision:
+            for buffered in spans:
+                self.reporter.report_span(buffered)
+
+    def _buffer(self, trace_id, span):
+        """
+        Adds a span to its trace's buffer, evicting the oldest other traces beyond the caps, so a single trace
+        may exceed max_spans until its local root finishes.  Requires the lock.
+        """
+        spans = self._traces.get(trace_id)
+        if spans is None:
+            spans = self._traces[trace_id] = []
+        spans.append(span)
+        self._span_count += 1
+        while len(self._traces) > 1 and (len(self._traces) > self.max_traces or self._span_count > self.max_spans):
+            oldest = next(iter(self._traces))
+            if oldest == trace_id:  # Moved behind the others, which are evicted first
+                self._traces[trace_id] = self._traces.pop(trace_id)
+                continue
+            _, evicted = self._traces.popitem(last=False)
+            self._span_count -= len(evicted)
+            if self.metrics is not None:
+                self.metrics.evicted_traces(1)
+                self.metrics.evicted_spans(len(evicted))
+        return spans
+
+    def _decide(self, spans, root=None):
+        keep = any(has_error(span) for span in spans)
+        if not keep and root is not None and root.end_time is not None:
+            keep = root.end_time - root.start_time >= self.latency_threshold
+        if not keep:
+            keep = self.random() < self.probability
+        if self.metrics is not None:
+            (self.metrics.kept_traces if keep else self.metrics.dropped_traces)(1)
+        return keep
+
+    def _record_decision(self, trace_id, decision):
+        self._decisions[trace_id] = decision
+        if len(self._decisions) > self.max_traces:
+            self._decisions.popitem(last=False)
+
+    def flush(self):
+        flush = getattr(self.reporter, "flush", None)
+        return flush() if flush is not None else None
+
+    def close(self):
+        """Decides the traces whose local roots haven't finished, without their latency, and closes the reporter"""
+        with self._lock:
+            pending = [(trace_id, spans, self._decide(spans)) for trace_id, spans in self._traces.items()]
+            self._traces.clear()
+            self._span_count = 0
+        for _, spans, decision in pending:
+            if decision:
+                for span in spans:
+                    self.reporter.report_span(span)
+        return self.reporter.close()
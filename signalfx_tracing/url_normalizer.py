@@ -0,0 +1,133 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+"""
+Normalization of the URL paths recorded by HTTP server instrumentations, enabled by SIGNALFX_URL_NORMALIZATION,
+so that ids within paths don't make span tags unbounded in cardinality:
+
+    /users/123/orders/3fa85f64-5717-4562-b3fc-2c963f66afa6 -> /users/{id}/orders/{uuid}
+
+SIGNALFX_URL_NORMALIZATION_RULES adds ";" separated "pattern=replacement" regular expression substitutions, which
+are applied in order before numeric and UUID path segments are collapsed.
+"""
+from collections import OrderedDict
+from threading import Lock
+import logging
+import re
+
+from . import settings
+
+
+log = logging.getLogger(__name__)
+
+
+ID_PLACEHOLDER = "{id}"
+UUID_PLACEHOLDER = "{uuid}"
+
+# Whole numeric or UUID path segments
+_id_segment = re.compile(
+    r"(?<=/)(?:(\d+)|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(?=/|$)",
+    re.IGNORECASE,
+)
+
+
+def _id_placeholder(match):
+    return ID_PLACEHOLDER if match.group(1) is not None else UUID_PLACEHOLDER
+
+
+def parse_rules(value):
+    """
+    Returns the (compiled pattern, replacement) of each ";" separated "pattern=replacement" rule, split at the
+    last "=" of each.  Invalid rules are logged and ignored.
+    """
+    rules = []
+    for rule in (value or "").split(";"):
+        rule = rule.strip()
+        if not rule:
+            continue
+        pattern, sep, replacement = rule.rpartition("=")
+        try:
+            if not sep:
+                raise ValueError("missing replacement")
+            rules.append((re.compile(pattern), replacement))
+        except (re.error, ValueError) as e:
+            log.warning("Ignoring invalid URL normalization rule {!r}: {}".format(rule, e))
+    return rules
+
+
+class URLNormalizer(object):
+    """
+    Applies its rules to paths and collapses their numeric and UUID segments, retaining the results for the
+    cache_size most recently normalized paths.
+    """
+
+    def __init__(self, rules=(), collapse_ids=True, cache_size=1024):
+        self.rules = tuple(rules)
+        self.collapse_ids = collapse_ids
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = Lock()
+
+    def normalize(self, path):
+        with self._cache_lock:
+            normalized = self._cache.get(path)
+            if normalized is not None:
+                self._cache[path] = self._cache.pop(path)  # Most recently used
+                return normalized
+
+        normalized = path
+        for pattern, replacement in self.rules:
+            normalized = pattern.sub(replacement, normalized)
+        if self.collapse_ids:
+            normalized = _id_segment.sub(_id_placeholder, normalized)
+
+        if self.cache_size > 0:
+            with self._cache_lock:
+                self._cache[path] = normalized
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return normalized
+
+    def normalize_url(self, url):
+        """Normalizes the path of a URL, leaving its scheme, authority, and query intact"""
+        start = url.find("://")
+        start = url.find("/", start + 3) if start != -1 else url.find("/")
+        if start == -1:
+            return url
+        end = url.find("?", start)
+        if end == -1:
+            return url[:start] + self.normalize(url[start:])
+        return url[:start] + self.normalize(url[start:end]) + url[end:]
+
+
+# (Settings, URLNormalizer or None) of the current settings
+_configured = [(None, None)]
+
+
+def get():
+    """Returns the URLNormalizer configured by the current settings, or None if normalization is disabled"""
+    env = settings.get()
+    configured_env, normalizer = _configured[0]
+    if configured_env is not env:
+        normalizer = None
+        if env.url_normalization:
+            normalizer = URLNormalizer(
+                parse_rules(env.url_normalization_rules), cache_size=env.url_normalization_cache_size
+            )
+        _configured[0] = (env, normalizer)
+    return normalizer
+
+
+def normalize_path(path):
+    """The path normalized by the configured URLNormalizer, or the path itself if normalization is disabled"""
+    normalizer = get()
+    return path if normalizer is None or not path else normalizer.normalize(path)
+
+
+def normalize_url(url):
+    """The URL with its path normalized by the configured URLNormalizer, or the URL if normalization is disabled"""
+    normalizer = get()
+    return url if normalizer is None or not url else normalizer.normalize_url(url)
+
+
+def normalize_attribute(attr, value):
+    """Normalizes the value of a traced request attribute if it's the path"""
+    return normalize_path(value) if attr == "path" else value
@@ -1,29 +1,34 @@
 # Copyright (C) 2018-2019 SignalFx. All rights reserved.
+from collections import OrderedDict
+from threading import Lock
+import traceback
 import logging
 import functools
 import importlib
-import atexit
 import sys
 import os
 
+from opentracing.ext import tags as ext_tags
 from wrapt import decorator, ObjectProxy
 import opentracing
 
-from .constants import default_max_tag_value_length, instrumented_attr
+from .constants import instrumented_attr
+from .settings import is_truthy  # noqa
 from .tags import SFX_ENVIRONMENT, SFX_TRACING_LIBRARY, SFX_TRACING_VERSION
 from .version import __version__
+from . import sampling_rules, settings, url_normalizer
 
-
-# Accepted case-insensitive disabling environment variable values
-_falsy = ("0", "0.0", "f", "false", "n", "no")
+try:
+    from ._trace_wrappers import traced_callable
+except SyntaxError:  # Python < 3.6
+    traced_callable = None
 
 
 # Tracer instance from create_tracer()
 _tracer = None
 
-
-def is_truthy(value):
-    return bool(value) and str(value).lower().strip() not in _falsy
+# The default opentracing.tracer, whose spans and scopes are no-ops
+_noop_tracer_class = opentracing.Tracer
 
 
 def get_module(library):
@@ -52,8 +57,7 @@ def mark_uninstrumented(module):
 
 
 def instrumentation_disabled(library):
-    env_var = _get_env_var("SIGNALFX_{}_ENABLED".format(library.upper()), True)
-    return not is_truthy(env_var)
+    return not settings.get().library_enabled(library)
 
 
 class Config(object):
@@ -84,7 +88,8 @@ def create_tracer(access_token=None, set_global=True, config=None, *args, **kwar
     """
     Creates a jaeger_client.Tracer via Config().initialize_tracer().
     Default config argument will consist of service name of 'SignalFx-Tracing' value,
-    B3 span propagation, and a ConstSampler.  These are tunable by env vars.
+    B3 span propagation, and a ConstSampler.  These are tunable by env vars.  A propagation of 'w3c',
+    or a comma separated list like 'b3,w3c', registers the corresponding HTTP headers codec.
 
     By default this function is partially memoized so that the tracer returned on first invocation
     will always be returned in subsequent calls, no matter their arguments.  It can be overridden
@@ -97,39 +102,35 @@ def create_tracer(access_token=None, set_global=True, config=None, *args, **kwar
     if not allow_multiple and _tracer is not None:
         return _tracer
 
+    from . import startup_profile
+
     try:
-        from jaeger_client import Config
-        from jaeger_client import constants
+        with startup_profile.phase("import jaeger_client"):
+            from jaeger_client import Config
+            from jaeger_client import constants
     except ImportError:
         raise RuntimeError(
             "create_tracer() is only for environments with jaeger-client installed."
         )
 
+    env = settings.get()
     config = config or {}
     if "service_name" not in config and "service_name" not in kwargs:
-        config["service_name"] = _get_env_var(
-            "SIGNALFX_SERVICE_NAME", "SignalFx-Tracing"
-        )
+        config["service_name"] = env.service_name
 
     if "jaeger_endpoint" not in config:
-        config["jaeger_endpoint"] = _get_env_var(
-            "SIGNALFX_ENDPOINT_URL",
-            _get_env_var(
-                "SIGNALFX_INGEST_URL",  # Backwards compatibility
-                "http://localhost:9080/v1/trace",
-            ),
-        )
+        config["jaeger_endpoint"] = env.endpoint_url
 
-    access_token = access_token or _get_env_var("SIGNALFX_ACCESS_TOKEN")
+    access_token = access_token or env.access_token
     if "jaeger_user" not in config and access_token is not None:
         config["jaeger_user"] = "auth"
     if "jaeger_password" not in config and access_token is not None:
         config["jaeger_password"] = access_token
 
     if "sampler" not in config:
-        sampler_type = _get_env_var("SIGNALFX_SAMPLER_TYPE", "const")
+        sampler_type = env.sampler_type
 
-        sampler_param = _get_env_var("SIGNALFX_SAMPLER_PARAM", 1)
+        sampler_param = env.sampler_param
         if sampler_type == constants.SAMPLER_TYPE_CONST:
             sampler_param = int(float(sampler_param))
         elif sampler_type in (
@@ -141,14 +142,21 @@ def create_tracer(access_token=None, set_global=True, config=None, *args, **kwar
         config["sampler"] = dict(type=sampler_type, param=sampler_param)
 
     if "propagation" not in config:
-        propagation = _get_env_var("SIGNALFX_PROPAGATION", "b3")
-        config["propagation"] = propagation
+        config["propagation"] = env.propagation
+
+    if "reporter_batch_size" not in config:
+        config["reporter_batch_size"] = env.reporter_max_batch
+    if "reporter_queue_size" not in config:
+        # jaeger_client requires a queue that can hold a whole batch
+        config["reporter_queue_size"] = max(env.reporter_queue_size, int(config["reporter_batch_size"]))
+    if "reporter_flush_interval" not in config:
+        config["reporter_flush_interval"] = env.reporter_flush_interval
 
     logger = logging.getLogger("signalfx-tracing")
     config["logging"] = True
     config["logger"] = logger
 
-    if _get_env_var("SIGNALFX_TRACING_DEBUG", False):
+    if env.tracing_debug:
         logger.setLevel(logging.DEBUG)
 
     config["root_span_tags"] = {
@@ -157,21 +165,65 @@ def create_tracer(access_token=None, set_global=True, config=None, *args, **kwar
     }
 
     tags = config.get("tags", {})
-    tags[SFX_ENVIRONMENT] = tags.get(SFX_ENVIRONMENT, _get_env_var("SIGNALFX_ENV", ""))
+    tags[SFX_ENVIRONMENT] = tags.get(SFX_ENVIRONMENT, env.environment)
     config["tags"] = tags
 
-    config["max_tag_value_length"] = int(
-        _get_env_var(
-            "SIGNALFX_RECORDED_VALUE_MAX_LENGTH",
-            default_max_tag_value_length,
+    config["max_tag_value_length"] = env.recorded_value_max_length
+
+    if "scope_manager" not in kwargs:
+        from .scope_managers import default_scope_manager
+
+        kwargs["scope_manager"] = default_scope_manager()
+
+    from . import metrics
+
+    metrics_factory = None
+    if "metrics_factory" not in kwargs and "metrics" not in kwargs:
+        metrics_factory = metrics.metrics_factory()
+        if metrics_factory is not None:
+            kwargs["metrics_factory"] = metrics_factory
+
+    with startup_profile.phase("jaeger_client.Config"):
+        jaeger_config = Config(config, *args, **kwargs)
+
+    with startup_profile.phase("jaeger_client.Config.new_tracer"):
+        tracer = jaeger_config.new_tracer()
+
+    from .propagation import http_headers_codec
+
+    codec = http_headers_codec(config["propagation"])
+    if codec is not None:
+        from opentracing import Format
+
+        tracer.codecs[Format.HTTP_HEADERS] = codec
+
+    from .reporting import close_replaced_reporter, reporter_from_settings
+
+    reporter = reporter_from_settings(jaeger_config, env)
+    if reporter is not None:
+        close_replaced_reporter(tracer.reporter)
+        tracer.reporter = reporter
+        reporter.set_process(
+            service_name=tracer.service_name,
+            tags=tracer.tags,
+            max_length=tracer.max_tag_value_length,
         )
-    )
 
-    jaeger_config = Config(config, *args, **kwargs)
+    if metrics_factory is not None:
+        metrics.instrument_sender(tracer.reporter, metrics_factory)
+        if env.metrics_log_interval > 0:
+            metrics.log_periodically(env.metrics_log_interval)
+
+    if env.tail_sampling:
+        from .tail_sampling import TailSamplingReporter
 
-    tracer = jaeger_config.new_tracer()
+        tracer.reporter = TailSamplingReporter.from_settings(
+            tracer.reporter, tracer.metrics_factory, env
+        )
+
+    from . import shutdown
 
-    atexit.register(tracer.close)
+    shutdown.register(tracer, env)
 
     if set_global:
         import opentracing
@@ -183,12 +235,6 @@ def create_tracer(access_token=None, set_global=True, config=None, *args, **kwar
     return tracer
 
 
-def _get_env_var(env_var, default=None):
-    not_provided = "__not_provided__"
-    val = os.environ.get(env_var, not_provided)
-    return default if val == not_provided else val
-
-
 def trace(operation_name=None, tags=None, **kwargs):
     """Tracer decorator to allow easy instrumentation:
     @trace
@@ -208,6 +254,15 @@ def trace(operation_name=None, tags=None, **kwargs):
         span = opentracing.tracer.active_span
         span.set_tag('MyTag', 'MyValue')
         return 'MyValue'
+
+    On Python 3.6+, spans of generator, coroutine, and async generator functions cover the execution
+    of their bodies instead of just their invocation, and are active only while the body is running:
+    @trace
+    async def my_traced_coroutine():
+        return await do_async_work()
+
+    If tracing is disabled by SIGNALFX_TRACING_ENABLED, the function is returned undecorated.
+    Calls are passed straight through while the global tracer is the default no-op opentracing.Tracer.
     """
 
     # operation_name will be the traced function if not providing trace arguments
@@ -220,9 +275,20 @@ def trace(operation_name=None, tags=None, **kwargs):
     _wrapped = operation_name
     operation_name = kwargs.pop("deferred_operation_name", _wrapped.__name__)
 
+    if not settings.get().tracing_enabled:
+        return _wrapped
+
+    traced_call = traced_callable(_wrapped) if traced_callable else None
+
     @decorator
     def _trace(wrapped, _, _args, _kwargs):
-        with opentracing.tracer.start_active_span(operation_name, tags=tags):
+        tracer = opentracing.tracer
+        # __class__ is also that of the wrapped tracer for a TracerProxy
+        if tracer.__class__ is _noop_tracer_class:
+            return wrapped(*_args, **_kwargs)
+        if traced_call is not None:
+            return traced_call(tracer, operation_name, tags, wrapped, _args, _kwargs)
+        with tracer.start_active_span(operation_name, tags=tags):
             return wrapped(*_args, **_kwargs)
 
     return _trace(_wrapped)
@@ -233,14 +299,261 @@ class TracerProxy(ObjectProxy):
 
     def __init__(self):
         super(TracerProxy, self).__init__(opentracing.tracer)
+        self._self_tracer_factory = None
 
     def set_tracer(self, tracer):
         self.__wrapped__ = tracer
 
+    def set_scope_manager(self, scope_manager):
+        """
+        Replaces the proxied tracer with one created like it, but with an instance of the scope_manager class, and
+        closes the replaced tracer.  Returns whether it was replaced, which is only possible for the proxies of
+        create_fork_safe_tracer() not given a scope manager.
+        """
+        if self._self_tracer_factory is None:
+            return False
+        from . import shutdown
+
+        replaced = self.__wrapped__
+        self.set_tracer(self._self_tracer_factory(scope_manager))
+        shutdown.close(replaced)
+        return True
+
+
+def create_fork_safe_tracer(access_token=None, set_global=True, config=None, **kwargs):
+    """
+    Creates a tracer via create_tracer() within a TracerProxy that is given a new tracer in each process forked
+    from this one, like the workers of pre-fork servers.  A forked child otherwise inherits a reporter whose
+    thread doesn't exist in it, and so never reports its spans.  New tracers are created with the arguments of
+    the first, and the scope manager class of the tracer they replace, which is discarded without sending the spans
+    it inherited, since those are the parent's to send.  Without os.register_at_fork (Python < 3.7),
+    the proxy always wraps the first tracer.
+    """
+    tracer_proxy = TracerProxy()
+    tracer_proxy.set_tracer(
+        create_tracer(access_token, set_global=False, config=dict(config or {}), **kwargs)
+    )
+    if set_global:
+        opentracing.tracer = tracer_proxy
+
+    def new_tracer(scope_manager):
+        new_kwargs = dict(kwargs, allow_multiple=True, scope_manager=scope_manager)
+        return create_tracer(access_token, set_global=False, config=dict(config or {}), **new_kwargs)
+
+    if "scope_manager" not in kwargs:
+        tracer_proxy._self_tracer_factory = new_tracer
+
+    register_at_fork = getattr(os, "register_at_fork", None)
+    if register_at_fork is not None:
+
+        def recreate_tracer():
+            try:
+                from . import shutdown
+
+                inherited = tracer_proxy.__wrapped__
+                shutdown.discard(inherited)
+                tracer_proxy.set_tracer(new_tracer(type(inherited.scope_manager)))
+            except Exception:
+                logging.getLogger("signalfx-tracing").exception("Failed to create tracer for forked process.")
+
+        register_at_fork(after_in_child=recreate_tracer)
+
+    return tracer_proxy
+
 
 def padded_hex(num):
     return "{:016x}".format(num)
 
 
+_hex_ids_attr = "_sfx_hex_ids"
+
+
+def hex_ids(span_context):
+    """
+    Returns the padded hex trace and span ids of a span context, which are formatted once
+    and stored on the context for subsequent lookups.
+    """
+    ids = getattr(span_context, _hex_ids_attr, None)
+    if ids is None:
+        ids = (padded_hex(span_context.trace_id), padded_hex(span_context.span_id))
+        try:
+            setattr(span_context, _hex_ids_attr, ids)
+        except AttributeError:  # Contexts without a __dict__
+            pass
+    return ids
+
+
+def is_sampled(span):
+    """
+    Whether a span will be reported, in which case its tags are worth computing.  The tags and logs of
+    unsampled spans are discarded by the tracer.  Spans without a sampling decision are considered sampled.
+    """
+    if span is None:
+        return False
+    sampled = getattr(span, "is_sampled", None)
+    return sampled is None or sampled()
+
+
+def is_active_span_sampled(tracer=None):
+    """Whether the active span of the tracer (the global tracer by default) is sampled"""
+    return is_sampled((tracer or opentracing.tracer).active_span)
+
+
+# The jaeger_client.codecs.B3Codec attributes naming its headers, the first of which must be present to extract
+_b3_header_attrs = ("trace_header", "span_header", "parent_span_header", "sampled_header", "flags_header")
+
+_propagation_headers_attr = "_sfx_propagation_headers"
+
+
+def codec_headers(codec):
+    """
+    Returns the (required, all) lowercase names of the headers a codec extracts from, or None if they aren't known.
+    Codecs can declare them as context_headers and header_names attributes.
+    """
+    header_names = getattr(codec, "header_names", None)
+    if header_names is not None:
+        return tuple(codec.context_headers), tuple(header_names)
+    b3_names = tuple(getattr(codec, attr, None) for attr in _b3_header_attrs)
+    if None in b3_names:  # e.g. jaeger's TextCodec, whose baggage headers share a prefix
+        return None
+    b3_names = tuple(name.lower() for name in b3_names)
+    return b3_names[:1], b3_names
+
+
+def propagation_headers(tracer):
+    """
+    Returns the (required, all) lowercase names of the headers the HTTP headers codec of a tracer extracts from,
+    or None if they aren't known.  They are determined once and stored on the codec for subsequent lookups.
+    """
+    codec = (getattr(tracer, "codecs", None) or {}).get(opentracing.Format.HTTP_HEADERS)
+    if codec is None:
+        return None
+    headers = getattr(codec, _propagation_headers_attr, _propagation_headers_attr)
+    if headers is _propagation_headers_attr:
+        headers = codec_headers(codec)
+        try:
+            setattr(codec, _propagation_headers_attr, headers)
+        except AttributeError:
+            pass
+    return headers
+
+
+def extract_span_context(tracer, get_header, headers):
+    """
+    Extracts the span context propagated in the HTTP headers of a request, or returns None if there is none or it's
+    malformed.  If the tracer's headers are known, only they are looked up with get_header(name), which returns None
+    for a missing header, and requests lacking the required ones return immediately.  Otherwise the carrier returned
+    by headers() is extracted from.
+    """
+    names = propagation_headers(tracer)
+    try:
+        if names is None:
+            return tracer.extract(opentracing.Format.HTTP_HEADERS, headers())
+
+        required, header_names = names
+        for name in required:
+            if get_header(name) is not None:
+                break
+        else:
+            return None
+
+        carrier = {}
+        for name in header_names:
+            value = get_header(name)
+            if value is not None:
+                carrier[name] = value
+        return tracer.extract(opentracing.Format.HTTP_HEADERS, carrier)
+    except (opentracing.InvalidCarrierException, opentracing.SpanContextCorruptedException):
+        return None
+
+
+def start_request_scope(
+    tracer, request, operation_name, get_header, headers, component, method, url, path, attributes, start_span_cb
+):
+    """
+    Starts the active scope of a server request span, as the opentracing-contrib framework instrumentations do,
+    but with the span context extracted by extract_span_context(), the sampling rules applied to the operation
+    name and path, and the recorded URL and attributes normalized.  The span is tagged with the component, method,
+    url, and the named attributes of the request, unless it's unsampled, as the tags of those are discarded.
+    start_span_cb(span, request) is then invoked.
+    """
+    span_ctx = extract_span_context(tracer, get_header, headers)
+    scope = tracer.start_active_span(
+        operation_name,
+        child_of=span_ctx,
+        tags=sampling_rules.start_tags(span_ctx, operation_name, path),
+    )
+
+    span = scope.span
+    if is_sampled(span):
+        span.set_tag(ext_tags.COMPONENT, component)
+        span.set_tag(ext_tags.SPAN_KIND, ext_tags.SPAN_KIND_RPC_SERVER)
+        span.set_tag(ext_tags.HTTP_METHOD, method)
+        span.set_tag(ext_tags.HTTP_URL, url_normalizer.normalize_url(url))
+        for attr in attributes:
+            if hasattr(request, attr):
+                payload = getattr(request, attr)
+                if payload not in ("", b""):
+                    span.set_tag(attr, url_normalizer.normalize_attribute(attr, str(payload)))
+
+    start_span_cb(span, request)
+    return scope
+
+
+# Formatted stacks by (exception type, ((code, line number), ...)) of their traceback entries
+_stack_cache = OrderedDict()
+_stack_cache_lock = Lock()
+_stack_cache_size = 256
+
+
+def format_error_stack(exc_type, exc_tb):
+    """
+    Formats the innermost SIGNALFX_ERROR_STACK_MAX_FRAMES (all if 0) entries of a traceback
+    as traceback.format_tb() would, reusing the result for identical stacks of the same exception type.
+    """
+    max_frames = settings.get().error_stack_max_frames
+    entries = []
+    while exc_tb is not None:
+        entries.append(exc_tb)
+        exc_tb = exc_tb.tb_next
+    if max_frames > 0:
+        entries = entries[-max_frames:]
+    if not entries:
+        return []
+
+    key = (exc_type, tuple((tb.tb_frame.f_code, tb.tb_lineno) for tb in entries))
+    with _stack_cache_lock:
+        stack = _stack_cache.get(key)
+    if stack is None:
+        stack = traceback.format_tb(entries[0], limit=len(entries))
+        with _stack_cache_lock:
+            _stack_cache[key] = stack
+            if len(_stack_cache) > _stack_cache_size:
+                _stack_cache.popitem(last=False)
+    return list(stack)
+
+
 def is_trace_response_header_enabled():
-    return is_truthy(os.environ.get("SPLUNK_TRACE_RESPONSE_HEADER_ENABLED", "true"))
+    return settings.get().trace_response_header_enabled
+
+
+# Allows browser scripts of other origins to read the Server-Timing header
+expose_server_timing_header = ("Access-Control-Expose-Headers", "Server-Timing")
+
+_server_timing_traceparent = 'traceparent;desc="00-%016x-%016x-01"'
+
+
+def server_timing_headers(span):
+    """
+    Returns the (name, value) pairs of the response headers providing a span's traceparent to browsers
+    via Server-Timing, or an empty tuple if its context lacks ids.
+    """
+    context = span.context
+    trace_id = getattr(context, "trace_id", 0)
+    span_id = getattr(context, "span_id", 0)
+    if not (trace_id and span_id):
+        return ()
+    return (
+        expose_server_timing_header,
+        ("Server-Timing", _server_timing_traceparent % (trace_id, span_id)),
+    )
@@ -9,6 +9,7 @@ import requests
 import pytest
 
 from signalfx_tracing import instrument
+from signalfx_tracing.libraries.falcon_.middleware import REQUEST_OPERATION_NAME
 
 
 base_url = "http://127.0.0.1:32321/"
@@ -97,6 +98,7 @@ class TestFalconApp(object):
             "path": "/hello",
             "span.kind": "server",
             "falcon.resource": "HelloWorldResource",
+            "http.route": "/hello",
         }
         assert span.tags == expected_tags
 
@@ -111,7 +113,7 @@ class TestFalconApp(object):
         spans = self.tracer.finished_spans()
         assert len(spans) == 1
         span = spans.pop()
-        assert span.operation_name == "/hello/xyz"
+        assert span.operation_name == REQUEST_OPERATION_NAME
         tagged_method = http_method.upper()
         expected_tags = {
             "component": "Falcon",
@@ -148,6 +150,7 @@ class TestFalconApp(object):
             "error": True,
             "sfx.error.kind": "NameError",
             "falcon.resource": "ErrorResource",
+            "http.route": "/error",
         }
 
         err_message = span.tags.pop("sfx.error.message")
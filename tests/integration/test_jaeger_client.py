@@ -2,11 +2,17 @@
 import os
 
 from jaeger_client import Config, Tracer
+from jaeger_client.codecs import B3Codec
+from jaeger_client.senders import HTTPSender
+from opentracing import Format
 import opentracing.span
 import pytest
 import mock
 
-from signalfx_tracing import utils
+from signalfx_tracing import metrics, settings, shutdown, utils
+from signalfx_tracing.propagation import CompositeCodec, W3CCodec
+from signalfx_tracing.reporting import BatchingReporter, GzipHTTPSender, PacketSender
+from signalfx_tracing.tail_sampling import TailSamplingReporter
 
 
 token_var = "SIGNALFX_ACCESS_TOKEN"
@@ -24,15 +30,25 @@ class TestCreateTracer(object):
             "SIGNALFX_SAMPLER_TYPE",
             "SIGNALFX_SAMPLER_PARAM",
             "SIGNALFX_PROPAGATION",
+            "SIGNALFX_REPORTER_MAX_BATCH",
+            "SIGNALFX_REPORTER_QUEUE_SIZE",
+            "SIGNALFX_REPORTER_COMPRESSION",
+            "SIGNALFX_REPORTER_BACKPRESSURE",
+            "SIGNALFX_EXPORT_TRANSPORT",
+            "SIGNALFX_TAIL_SAMPLING",
+            "SIGNALFX_TAIL_SAMPLING_LATENCY_MS",
+            "SIGNALFX_METRICS_ENABLED",
         ):
             try:
                 prev[env_var] = os.environ.pop(env_var)
             except KeyError:
                 pass
+        settings.reload()
         yield
         for env_var in prev:
             if prev[env_var] is not None:
                 os.environ[env_var] = prev[env_var]
+        settings.reload()
 
     @pytest.fixture(autouse=True)
     def reset_cached_tracer(self):
@@ -65,6 +81,7 @@ class TestCreateTracer(object):
 
     def test_creation_with_access_token_env_var(self):
         os.environ[token_var] = "AccessToken"
+        settings.reload()
         tracer = utils.create_tracer()
         assert isinstance(tracer, Tracer)
 
@@ -83,6 +100,9 @@ class TestCreateTracer(object):
         assert created["jaeger_password"] == "auth_token"
         assert created["jaeger_endpoint"] == "http://localhost:9080/v1/trace"
         assert created["propagation"] == "b3"
+        assert created["reporter_batch_size"] == 10
+        assert created["reporter_queue_size"] == 100
+        assert created["reporter_flush_interval"] == 1.0
 
     def test_defaults_overridden_by_config(self):
         config = dict(
@@ -128,6 +148,7 @@ class TestCreateTracer(object):
         env["SIGNALFX_SAMPLER_TYPE"] = "probabilistic"
         env["SIGNALFX_SAMPLER_PARAM"] = ".05"
         env["SIGNALFX_PROPAGATION"] = "SomePropagation"
+        settings.reload()
 
         with mock.patch("jaeger_client.Config") as cfg:
             utils.create_tracer()
@@ -148,6 +169,7 @@ class TestCreateTracer(object):
         env["SIGNALFX_SAMPLER_TYPE"] = ""
         env["SIGNALFX_SAMPLER_PARAM"] = ""
         env["SIGNALFX_PROPAGATION"] = ""
+        settings.reload()
 
         with mock.patch("jaeger_client.Config") as cfg:
             utils.create_tracer()
@@ -167,6 +189,7 @@ class TestCreateTracer(object):
     def test_sampler_by_env_var(self, sampler, param, expected):
         os.environ["SIGNALFX_SAMPLER_TYPE"] = sampler
         os.environ["SIGNALFX_SAMPLER_PARAM"] = param
+        settings.reload()
 
         with mock.patch("jaeger_client.Config") as cfg:
             utils.create_tracer()
@@ -174,6 +197,196 @@ class TestCreateTracer(object):
         assert created["sampler"]["type"] == sampler
         assert created["sampler"]["param"] == expected
 
+    def test_scope_manager_by_env_var(self):
+        from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+
+        os.environ["SIGNALFX_SCOPE_MANAGER"] = "contextvars"
+        settings.reload()
+        try:
+            with mock.patch("jaeger_client.Config") as cfg:
+                utils.create_tracer()
+        finally:
+            os.environ.pop("SIGNALFX_SCOPE_MANAGER")
+        assert cfg.call_args[1]["scope_manager"] is ContextVarsScopeManager
+
+    @pytest.mark.parametrize(
+        "propagation, codec_class",
+        (("w3c", W3CCodec), ("b3,w3c", CompositeCodec), ("b3", B3Codec)),
+    )
+    def test_http_headers_codec_by_env_var(self, propagation, codec_class):
+        os.environ["SIGNALFX_PROPAGATION"] = propagation
+        settings.reload()
+        tracer = utils.create_tracer()
+        assert type(tracer.codecs[Format.HTTP_HEADERS]) is codec_class
+
+        carrier = {}
+        with tracer.start_span("span") as span:
+            tracer.inject(span.context, Format.HTTP_HEADERS, carrier)
+        extracted = tracer.extract(Format.HTTP_HEADERS, carrier)
+        assert extracted.trace_id == span.context.trace_id
+        assert extracted.span_id == span.context.span_id
+        tracer.close()
+
+    def test_reporter_by_env_vars(self):
+        os.environ["SIGNALFX_REPORTER_MAX_BATCH"] = "50"
+        os.environ["SIGNALFX_REPORTER_QUEUE_SIZE"] = "20"
+        os.environ["SIGNALFX_REPORTER_COMPRESSION"] = "true"
+        os.environ["SIGNALFX_REPORTER_BACKPRESSURE"] = "drop-oldest"
+        settings.reload()
+        with mock.patch("signalfx_tracing.reporting.close_replaced_reporter") as close_replaced_reporter:
+            tracer = utils.create_tracer()
+        replaced, = close_replaced_reporter.call_args[0]
+        assert type(replaced._sender) is HTTPSender
+        assert isinstance(tracer.reporter, BatchingReporter)
+        assert isinstance(tracer.reporter._sender, GzipHTTPSender)
+        assert tracer.reporter._sender.batch_size == 50
+        assert tracer.reporter.queue_capacity == 50
+        assert tracer.reporter.backpressure == "drop-oldest"
+        assert tracer.reporter._sender._process.serviceName == "SignalFx-Tracing"
+        tracer.close()
+
+    def test_udp_export_by_env_var(self):
+        os.environ["SIGNALFX_EXPORT_TRANSPORT"] = "udp"
+        settings.reload()
+        tracer = utils.create_tracer()
+        assert isinstance(tracer.reporter._sender, PacketSender)
+        assert tracer.reporter._sender._process.serviceName == "SignalFx-Tracing"
+        tracer.close()
+
+    def test_tail_sampling_by_env_var(self):
+        tracer = utils.create_tracer()
+        assert not isinstance(tracer.reporter, TailSamplingReporter)
+        tracer.close()
+
+        os.environ["SIGNALFX_TAIL_SAMPLING"] = "true"
+        os.environ["SIGNALFX_TAIL_SAMPLING_LATENCY_MS"] = "500"
+        settings.reload()
+        tracer = utils.create_tracer(allow_multiple=True)
+        assert isinstance(tracer.reporter, TailSamplingReporter)
+        assert tracer.reporter.latency_threshold == 0.5
+        assert tracer.reporter.metrics is not None
+        tracer.close()
+
+    def test_self_metrics_by_env_var(self):
+        tracer = utils.create_tracer()
+        assert tracer.metrics_factory is not metrics.registry
+        tracer.close()
+
+        os.environ["SIGNALFX_METRICS_ENABLED"] = "true"
+        settings.reload()
+        tracer = utils.create_tracer(allow_multiple=True)
+        assert tracer.metrics_factory is metrics.registry
+        started = metrics.registry.get("jaeger:started_spans", sampled="y").value
+        tracer.start_span("span", tags=dict(component="test")).finish()
+        tracer.reporter.flush()
+        assert metrics.registry.get("jaeger:started_spans", sampled="y").value == started + 1
+        assert metrics.registry.get("sfx:flushed_spans", component="test").value >= 1
+        tracer.close()
+
+    def test_tracer_is_closed_at_shutdown(self):
+        with mock.patch.object(shutdown, "_tracers", []) as tracers:
+            tracer = utils.create_tracer()
+            assert tracers == [tracer]
+            tracer.start_span("span").finish()
+            sent, failed, abandoned = shutdown.shutdown(timeout=5)
+        assert (sent, failed, abandoned) == (0, 1, 0)  # Nothing accepts the default endpoint's connections
+        assert tracer.reporter.stopped
+
+    def test_fork_safe_tracer_is_recreated_after_fork(self, monkeypatch):
+        hooks = []
+        monkeypatch.setattr(os, "register_at_fork", lambda **kw: hooks.append(kw), raising=False)
+        prev = opentracing.tracer
+        try:
+            proxy = utils.create_fork_safe_tracer(config=dict(service_name="Forking"))
+            assert opentracing.tracer is proxy
+        finally:
+            opentracing.tracer = prev
+        parent = proxy.__wrapped__
+        assert isinstance(proxy, Tracer)
+        assert parent.service_name == "Forking"
+
+        hooks[0]["after_in_child"]()
+        child = proxy.__wrapped__
+        assert child is not parent
+        assert child.reporter is not parent.reporter
+        assert child.service_name == "Forking"
+        assert type(child.scope_manager) is type(parent.scope_manager)
+        assert utils._tracer is child
+        parent.close()
+        child.close()
+
+    def test_fork_safe_tracer_is_replaced_to_promote_its_scope_manager(self, monkeypatch):
+        from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+        from signalfx_tracing import scope_managers
+
+        monkeypatch.setattr(os, "register_at_fork", lambda **kw: None, raising=False)
+        monkeypatch.setattr(scope_managers, "_promoted", [None])
+        with mock.patch.object(shutdown, "_tracers", []) as tracers:
+            proxy = utils.create_fork_safe_tracer(set_global=False, config=dict(service_name="Promoted"))
+            replaced = proxy.__wrapped__
+            scope_managers.promote(proxy, scope_managers.CONTEXTVARS)
+            assert proxy.__wrapped__ is not replaced
+            assert isinstance(proxy.scope_manager, ContextVarsScopeManager)
+            assert proxy.service_name == "Promoted"
+            assert tracers == [proxy.__wrapped__]
+            assert replaced.reporter.stopped
+            proxy.close()
+
+        with mock.patch.object(shutdown, "_tracers", []):
+            given = utils.create_fork_safe_tracer(set_global=False, scope_manager=scope_managers._tornado())
+            assert not given.set_scope_manager(ContextVarsScopeManager)
+            given.close()
+
+    @pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="requires os.register_at_fork")
+    def test_fork_safe_tracer_in_forked_process(self):
+        proxy = utils.create_fork_safe_tracer(set_global=False)
+        parent = proxy.__wrapped__
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            os.write(write_fd, b"1" if proxy.__wrapped__ is not parent else b"0")
+            os._exit(0)
+        os.close(write_fd)
+        assert os.read(read_fd, 1) == b"1"
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        assert proxy.__wrapped__ is parent
+        parent.close()
+
+    @pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="requires os.register_at_fork")
+    def test_forked_process_only_sends_its_own_spans(self):
+        with mock.patch.object(shutdown, "_tracers", []) as tracers:
+            proxy = utils.create_fork_safe_tracer(set_global=False, config=dict(reporter_flush_interval=60))
+            parent = proxy.__wrapped__
+            parent.start_span("parent").finish()
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                try:
+                    child = proxy.__wrapped__
+                    sent = []
+                    child.reporter._sender.send = lambda batch: sent.extend(span.operationName for span in batch.spans)
+                    for _ in range(5):
+                        child.start_span("child").finish()
+                    registered = child in tracers and parent not in tracers
+                    results = shutdown.shutdown(timeout=5)
+                    report = (registered, shutdown.pending_spans(parent.reporter), results, sent)
+                    os.write(write_fd, repr(report).encode())
+                finally:
+                    os._exit(0)
+            os.close(write_fd)
+            report = b""
+            chunk = os.read(read_fd, 1024)
+            while chunk:
+                report += chunk
+                chunk = os.read(read_fd, 1024)
+            os.close(read_fd)
+            os.waitpid(pid, 0)
+            assert report.decode() == repr((True, 0, (5, 0, 0), ["child"] * 5))
+            assert tracers == [parent]
+            assert shutdown.pending_spans(parent.reporter) == 1
+            parent.close()
+
     def test_create_tracer_sanity(self):
         tracer = utils.create_tracer()
         tracer.close()
@@ -1,5 +1,14 @@
+import sys
+
 from signalfx_tracing import tags as ext_tags
 
+# Native coroutine and async generator syntax
+collect_ignore = (
+    ["test_decorator_async.py", "libraries/falcon_/test_falcon_asgi.py"]
+    if sys.version_info < (3, 6)
+    else []
+)
+
 
 class SpanTest(object):
     def assert_span_contains_tags(self, span, tags):
@@ -4,6 +4,7 @@ from django_opentracing import DjangoTracing
 from django.conf import settings
 import opentracing
 import pytest
+import importlib
 import mock
 
 from signalfx_tracing.libraries.django_.instrument import (
@@ -12,8 +13,11 @@ from signalfx_tracing.libraries.django_.instrument import (
 )
 from signalfx_tracing.instrumentation import instrument, uninstrument
 from signalfx_tracing.utils import Config
+from signalfx_tracing import settings as settings_module
 from .conftest import DjangoTestSuite
 
+instrument_module = importlib.import_module("signalfx_tracing.libraries.django_.instrument")
+
 
 class TestDjangoConfig(DjangoTestSuite):
     @pytest.mark.parametrize(
@@ -163,3 +167,94 @@ class TestDjangoConfig(DjangoTestSuite):
         assert not hasattr(settings, "OPENTRACING_TRACER_CALLABLE")
         assert not hasattr(settings, "OPENTRACING_TRACE_ALL")
         assert desired_middleware_class not in getattr(settings, setting)
+
+
+class TestDjangoTracing(DjangoTestSuite):
+    @staticmethod
+    def view(request):
+        pass
+
+    def test_apply_tracing_extracts_propagated_context(self):
+        from django.test import RequestFactory
+
+        tracer = MockTracer()
+        instrument(tracer, django=True)
+        parent = tracer.start_span("parent")
+        headers = {}
+        tracer.inject(parent.context, opentracing.Format.HTTP_HEADERS, headers)
+        meta = {"HTTP_" + k.upper().replace("-", "_"): v for k, v in headers.items()}
+        request = RequestFactory().get("/one/", **meta)
+
+        tracing = DjangoTracing(tracer)
+        scope = tracing._apply_tracing(request, self.view, ["path"])
+        scope.close()
+
+        span = tracer.finished_spans()[0]
+        assert span.operation_name == "view"
+        assert span.parent_id == parent.context.span_id
+        assert span.tags == {
+            "component": "django",
+            "span.kind": "server",
+            "http.method": "GET",
+            "http.url": "/one/",
+            "path": "/one/",
+        }
+
+    def test_apply_tracing_normalizes_urls(self):
+        from django.test import RequestFactory
+
+        tracer = MockTracer()
+        instrument(tracer, django=True)
+        settings_module.reload(dict(SIGNALFX_URL_NORMALIZATION="true"))
+        try:
+            request = RequestFactory().get("/users/123/", {"q": "1"})
+            DjangoTracing(tracer)._apply_tracing(request, self.view, ["path"]).close()
+        finally:
+            settings_module.reload()
+
+        tags = tracer.finished_spans()[0].tags
+        assert tags["http.url"] == "/users/{id}/?q=1"
+        assert tags["path"] == "/users/{id}/"
+
+    def test_apply_tracing_sampling_rules(self):
+        from django.test import RequestFactory
+
+        tracer = MockTracer()
+        instrument(tracer, django=True)
+        settings_module.reload(dict(SIGNALFX_SAMPLING_RULES="operation:^view$=drop"))
+        try:
+            DjangoTracing(tracer)._apply_tracing(RequestFactory().get("/one/"), self.view, []).close()
+        finally:
+            settings_module.reload()
+        assert tracer.finished_spans()[0].tags["sampling.priority"] == 0
+
+    def test_apply_tracing_without_propagated_context(self):
+        from django.test import RequestFactory
+
+        tracer = MockTracer()
+        instrument(tracer, django=True)
+        scope = DjangoTracing(tracer)._apply_tracing(RequestFactory().get("/one/"), self.view, [])
+        scope.close()
+        assert tracer.finished_spans()[0].parent_id is None
+
+    def test_apply_tracing_falls_back_without_private_attributes(self):
+        from django.test import RequestFactory
+
+        tracer = MockTracer()
+        instrument(tracer, django=True)
+        with mock.patch.object(instrument_module, "_tracing_attributes", ("_missing",)), mock.patch(
+            "signalfx_tracing.utils.extract_span_context"
+        ) as extract:
+            DjangoTracing(tracer)._apply_tracing(RequestFactory().get("/one/"), self.view, ["path"]).close()
+        assert not extract.called  # Started by django_opentracing
+        span = tracer.finished_spans()[0]
+        assert span.operation_name == "view"
+        assert span.tags["component"] == "django"
+
+    def test_uninstrument_reverts_apply_tracing(self):
+        from django_opentracing.tracing import DjangoTracing as tracing_class
+
+        instrument(MockTracer(), django=True)
+        assert hasattr(tracing_class._apply_tracing, "__wrapped__")
+        uninstrument("django")
+        assert not hasattr(tracing_class._apply_tracing, "__wrapped__")
@@ -1,6 +1,8 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
+import mock
 import pytest
 
+from signalfx_tracing import scope_managers
 from signalfx_tracing.libraries.falcon_.instrument import config, uninstrument
 
 
@@ -11,6 +13,11 @@ class FalconTestSuite(object):
         yield
         config.__dict__ = orig
 
+    @pytest.fixture(autouse=True)
+    def restored_promoted_scope_manager(self):
+        with mock.patch.object(scope_managers, "_promoted", [None]):
+            yield
+
     @pytest.fixture(autouse=True)
     def uninstrument_falcon(self):
         yield
@@ -3,12 +3,17 @@ import os
 
 import opentracing
 import falcon
+import pytest
 from falcon import testing
 from opentracing.mocktracer import MockTracer
 
 from signalfx_tracing.libraries.falcon_ import config, instrument, uninstrument
-from signalfx_tracing.libraries.falcon_.middleware import TraceMiddleware
+from signalfx_tracing.libraries.falcon_.middleware import (
+    REQUEST_OPERATION_NAME,
+    TraceMiddleware,
+)
 from signalfx_tracing.utils import padded_hex
+from signalfx_tracing import settings
 from .conftest import FalconTestSuite
 
 
@@ -19,10 +24,26 @@ class HelloWorldResource(object):
         resp.body = "Hello World"
 
 
+class GreetingResource(object):
+    def on_get(self, req, resp, name):
+        resp.body = "Hello {}".format(name)
+
+    def on_post(self, req, resp, name):
+        resp.body = "Posted {}".format(name)
+
+
+class UnsampledTracer(MockTracer):
+    def start_span(self, *args, **kwargs):
+        span = super(UnsampledTracer, self).start_span(*args, **kwargs)
+        span.is_sampled = lambda: False
+        return span
+
+
 class TestFalconApplication(FalconTestSuite):
     def make_app(self):
         app = falcon.API()
         app.add_route("/hello", HelloWorldResource())
+        app.add_route("/greet/{name}", GreetingResource())
         return app
 
     def client(self, app):
@@ -81,10 +102,128 @@ class TestFalconApplication(FalconTestSuite):
             "path": "/hello",
             "span.kind": "server",
             "falcon.resource": "HelloWorldResource",
+            "http.route": "/hello",
+        }
+
+    def test_normalized_urls(self):
+        settings.reload(dict(SIGNALFX_URL_NORMALIZATION="true"))
+        try:
+            tracer = MockTracer()
+            instrument(tracer)
+            assert self.client(self.make_app()).simulate_get("/greet/123").content == b"Hello 123"
+        finally:
+            settings.reload()
+
+        tags = tracer.finished_spans()[0].tags
+        assert tags["http.url"] == "http://falconframework.org/greet/{id}"
+        assert tags["path"] == "/greet/{id}"
+        assert tags["http.route"] == "/greet/{name}"
+
+    def test_sampling_rules_drop_requests(self):
+        settings.reload(dict(SIGNALFX_SAMPLING_RULES="path:^/hello$=drop"))
+        try:
+            tracer = MockTracer()
+            instrument(tracer)
+            client = self.client(self.make_app())
+            assert client.simulate_get("/hello").status_code == 200
+            assert client.simulate_get("/greet/one").status_code == 200
+        finally:
+            settings.reload()
+
+        dropped, kept = tracer.finished_spans()
+        assert dropped.tags["sampling.priority"] == 0
+        assert "sampling.priority" not in kept.tags
+
+    def test_route_template_operation_names(self):
+        tracer = MockTracer()
+        instrument(tracer)
+        app = self.make_app()
+        middleware = app._middleware[0][0].__self__
+
+        client = self.client(app)
+        assert client.simulate_get("/greet/one").content == b"Hello one"
+        assert client.simulate_get("/greet/two").content == b"Hello two"
+        assert client.simulate_post("/greet/three").content == b"Posted three"
+
+        spans = tracer.finished_spans()
+        assert [span.operation_name for span in spans] == [
+            "GreetingResource.on_get",
+            "GreetingResource.on_get",
+            "GreetingResource.on_post",
+        ]
+        for span in spans:
+            assert span.tags["http.route"] == "/greet/{name}"
+            assert span.tags["falcon.resource"] == "GreetingResource"
+        assert spans[0].tags["http.url"] == "http://falconframework.org/greet/one"
+        assert spans[1].tags["path"] == "/greet/two"
+
+        assert middleware._resource_names == {
+            (GreetingResource, "GET"): ("GreetingResource.on_get", "GreetingResource"),
+            (GreetingResource, "POST"): ("GreetingResource.on_post", "GreetingResource"),
         }
 
+    def test_unrouted_request_operation_name(self):
+        tracer = MockTracer()
+        instrument(tracer)
+        app = self.make_app()
+
+        client = self.client(app)
+        assert client.simulate_get("/missing/12345").status_code == 404
+
+        spans = tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == REQUEST_OPERATION_NAME
+        assert spans[0].tags["http.status_code"] == "404"
+        assert "http.route" not in spans[0].tags
+
+    def test_extracts_propagated_context(self):
+        tracer = MockTracer()
+        instrument(tracer)
+        parent = tracer.start_span("parent")
+        headers = {}
+        tracer.inject(parent.context, opentracing.Format.HTTP_HEADERS, headers)
+
+        assert self.client(self.make_app()).simulate_get("/hello", headers=headers).status_code == 200
+        span = tracer.finished_spans()[0]
+        assert span.context.trace_id == parent.context.trace_id
+        assert span.parent_id == parent.context.span_id
+
+    def test_extracts_b3_headers(self):
+        pytest.importorskip("jaeger_client")
+        from jaeger_client import Tracer
+        from jaeger_client.codecs import B3Codec
+        from jaeger_client.reporter import InMemoryReporter
+        from jaeger_client.sampler import ConstSampler
+
+        reporter = InMemoryReporter()
+        tracer = Tracer(
+            "falcon", reporter, ConstSampler(True), extra_codecs={opentracing.Format.HTTP_HEADERS: B3Codec()}
+        )
+        instrument(tracer)
+        headers = {"X-B3-TraceId": "000000000000000a", "X-B3-SpanId": "000000000000000b", "X-B3-Sampled": "1"}
+
+        assert self.client(self.make_app()).simulate_get("/hello", headers=headers).status_code == 200
+        span = reporter.get_spans()[0]
+        assert (span.context.trace_id, span.context.parent_id) == (0xA, 0xB)
+        tracer.close()
+
+    def test_unsampled_span_has_no_tags(self):
+        tracer = UnsampledTracer()
+        instrument(tracer)
+        app = self.make_app()
+
+        client = self.client(app)
+        result = client.simulate_get("/hello?qs=1")
+        assert result.content == b"Hello World"
+
+        spans = tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == REQUEST_OPERATION_NAME
+        assert spans[0].tags == {}
+
     def test_response_trace_header_no_server_timing(self):
         os.environ['SPLUNK_TRACE_RESPONSE_HEADER_ENABLED'] = 'false'
+        settings.reload()
         tracer = MockTracer()
         instrument(tracer)
         app = self.make_app()
@@ -95,6 +234,7 @@ class TestFalconApplication(FalconTestSuite):
         assert 'access-control-expose-headers' not in result.headers
         assert 'server-timing' not in result.headers
         del os.environ['SPLUNK_TRACE_RESPONSE_HEADER_ENABLED']
+        settings.reload()
 
     def test_response_trace_header_server_timing(self):
         tracer = MockTracer()
@@ -0,0 +1,167 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+import asyncio
+import logging
+
+from opentracing.mocktracer import MockTracer
+import mock
+import pytest
+
+from signalfx_tracing.libraries.falcon_ import instrument, uninstrument
+from signalfx_tracing.libraries.falcon_.async_middleware import AsyncTraceMiddleware
+from signalfx_tracing import scope_managers
+from .conftest import FalconTestSuite
+
+falcon_asgi = pytest.importorskip("falcon.asgi")
+from falcon import testing  # noqa: E402
+
+
+class GreetingResource(object):
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    async def on_get(self, req, resp, name):
+        active_span = self.tracer.active_span
+        await asyncio.sleep(0.01)  # Interleaves concurrent requests
+        assert self.tracer.active_span is active_span
+        resp.set_header("X-Span-Id", str(active_span.context.span_id))
+        resp.text = "Hello {}".format(name)
+
+
+class ErrorResource(object):
+    async def on_get(self, req, resp):
+        raise ValueError("failed")
+
+
+class ActiveSpanResource(object):
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    async def on_get(self, req, resp):
+        await asyncio.sleep(0.01)
+        resp.text = str(self.tracer.active_span)
+
+
+class UserMiddleware(object):
+    async def process_request(self, req, resp):
+        pass
+
+
+class TestFalconASGIApplication(FalconTestSuite):
+    @pytest.fixture
+    def tracer(self):
+        tracer = MockTracer(scope_managers.scope_manager_class(scope_managers.ASYNCIO)())
+        instrument(tracer)
+        return tracer
+
+    def make_app(self, tracer, **kwargs):
+        app = falcon_asgi.App(**kwargs)
+        app.add_route("/greet/{name}", GreetingResource(tracer))
+        app.add_route("/error", ErrorResource())
+        return app
+
+    def test_instrument_adds_async_middleware(self, tracer):
+        user_middleware = UserMiddleware()
+        app = self.make_app(tracer, middleware=user_middleware)  # A single component
+        trace_middleware, added = app._unprepared_middleware
+        assert isinstance(trace_middleware, AsyncTraceMiddleware)
+        assert trace_middleware.tracer is tracer
+        assert added is user_middleware
+
+    def test_promotes_scope_manager(self):
+        tracer = MockTracer()
+        tracer.set_scope_manager = mock.Mock(return_value=True)
+        instrument(tracer)
+        self.make_app(tracer)
+        expected = scope_managers.scope_manager_class(scope_managers.ASYNCIO)
+        tracer.set_scope_manager.assert_called_once_with(expected)
+        assert scope_managers.default_scope_manager() is expected
+
+    def test_trace_request(self, tracer):
+        client = testing.TestClient(self.make_app(tracer))
+        result = client.simulate_get("/greet/world", query_string="q=1")
+        assert result.text == "Hello world"
+
+        spans = tracer.finished_spans()
+        assert len(spans) == 1
+        span = spans[0]
+        assert result.headers["X-Span-Id"] == str(span.context.span_id)
+        assert span.operation_name == "GreetingResource.on_get"
+        assert span.tags == {
+            "component": "Falcon",
+            "http.method": "GET",
+            "http.status_code": "200",
+            "http.url": "http://falconframework.org/greet/world",
+            "path": "/greet/world",
+            "span.kind": "server",
+            "falcon.resource": "GreetingResource",
+            "http.route": "/greet/{name}",
+        }
+
+    def test_concurrent_requests_have_distinct_active_spans(self, tracer):
+        app = self.make_app(tracer)
+
+        async def requests():
+            async with testing.ASGIConductor(app) as conductor:
+                return await asyncio.gather(
+                    *[conductor.simulate_get("/greet/{}".format(i)) for i in range(5)]
+                )
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(requests())
+        finally:
+            loop.close()
+        assert [result.text for result in results] == ["Hello {}".format(i) for i in range(5)]
+
+        spans = tracer.finished_spans()
+        assert len(spans) == 5
+        assert {result.headers["X-Span-Id"] for result in results} == {
+            str(span.context.span_id) for span in spans
+        }
+        assert all(span.parent_id is None for span in spans)
+
+    def test_thread_local_scope_manager_spans_arent_activated(self, caplog):
+        tracer = MockTracer()
+        instrument(tracer)
+        with caplog.at_level(logging.WARNING, logger="signalfx_tracing.libraries.falcon_.instrument"):
+            app = falcon_asgi.App()
+        assert "thread-local scope manager" in caplog.text
+        app.add_route("/active", ActiveSpanResource(tracer))
+
+        async def requests():
+            async with testing.ASGIConductor(app) as conductor:
+                return await asyncio.gather(*[conductor.simulate_get("/active") for _ in range(5)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(requests())
+        finally:
+            loop.close()
+        assert [result.text for result in results] == ["None"] * 5
+
+        spans = tracer.finished_spans()
+        assert len(spans) == 5
+        assert all(span.parent_id is None for span in spans)
+        assert all(span.operation_name == "ActiveSpanResource.on_get" for span in spans)
+
+    def test_handled_exception_is_tagged(self, tracer):
+        client = testing.TestClient(self.make_app(tracer))
+        assert client.simulate_get("/error").status_code == 500
+
+        spans = tracer.finished_spans()
+        assert len(spans) == 1
+        tags = spans[0].tags
+        assert tags["http.status_code"] == "500"
+        assert tags["error"] is True
+        assert tags["sfx.error.kind"] == "ValueError"
+        assert tags["sfx.error.message"] == "failed"
+        assert "raise ValueError" in tags["sfx.error.stack"]
+
+    def test_uninstrument_reverts_wrappers(self, tracer):
+        uninstrument()
+        app = self.make_app(tracer)
+        assert app._unprepared_middleware == []
+
+        client = testing.TestClient(app)
+        assert client.simulate_get("/error").status_code == 500
+        assert tracer.finished_spans() == []
@@ -4,10 +4,16 @@ from flask_opentracing import FlaskTracer
 from flask import Flask
 import opentracing
 import pytest
+import importlib
+import mock
 
 from signalfx_tracing.libraries.flask_ import config, instrument, uninstrument
+from signalfx_tracing.utils import padded_hex
+from signalfx_tracing import settings
 from .conftest import FlaskTestSuite
 
+instrument_module = importlib.import_module("signalfx_tracing.libraries.flask_.instrument")
+
 
 class TestFlaskConfig(FlaskTestSuite):
     @pytest.mark.parametrize("trace_all", (True, False))
@@ -39,6 +45,10 @@ class TestFlaskApplication(FlaskTestSuite):
         def my_route():
             return "Success!"
 
+        @app.route("/users/<int:user_id>")
+        def user(user_id):
+            return "User {}".format(user_id)
+
         return app
 
     def test_trace_with_default_config(self):
@@ -110,6 +120,85 @@ class TestFlaskApplication(FlaskTestSuite):
 
         assert not tracer.finished_spans()
 
+    def test_normalized_urls(self):
+        settings.reload(dict(SIGNALFX_URL_NORMALIZATION="true"))
+        try:
+            tracer = MockTracer()
+            config.tracer = tracer
+            instrument()
+            response = self.make_app().test_client().get("/users/123?q=1")
+        finally:
+            settings.reload()
+        assert response.status_code == 200
+
+        tags = tracer.finished_spans()[0].tags
+        assert tags["http.url"] == "http://localhost/users/{id}"
+        assert tags["path"] == "/users/{id}"
+
+    def test_sampling_rules_drop_requests(self):
+        settings.reload(dict(SIGNALFX_SAMPLING_RULES="operation:^user$=drop"))
+        try:
+            tracer = MockTracer()
+            config.tracer = tracer
+            instrument()
+            client = self.make_app().test_client()
+            assert client.get("/users/123").status_code == 200
+            assert client.get("/").status_code == 200
+        finally:
+            settings.reload()
+
+        dropped, kept = tracer.finished_spans()
+        assert dropped.operation_name == "user"
+        assert dropped.tags["sampling.priority"] == 0
+        assert "sampling.priority" not in kept.tags
+
+    def test_tracing_falls_back_without_private_attributes(self):
+        tracer = MockTracer()
+        config.tracer = tracer
+        instrument()
+        with mock.patch.object(instrument_module, "_tracing_attributes", ("_missing",)), mock.patch(
+            "signalfx_tracing.utils.extract_span_context"
+        ) as extract:
+            assert self.make_app().test_client().get("/").status_code == 200
+        assert not extract.called  # Started by flask_opentracing
+
+        span = tracer.finished_spans()[0]
+        assert span.operation_name == "my_route"
+        assert span.tags["component"] == "Flask"
+
+    def test_response_trace_header_server_timing(self):
+        tracer = MockTracer()
+        config.tracer = tracer
+        instrument()
+        app = self.make_app()
+
+        @app.after_request
+        def cors(response):
+            response.headers["Access-Control-Expose-Headers"] = "X-Custom"
+            return response
+
+        response = app.test_client().get("/")
+        assert response.status_code == 200
+
+        span = tracer.finished_spans()[0]
+        assert response.headers["Access-Control-Expose-Headers"] == "X-Custom,Server-Timing"
+        assert response.headers["Server-Timing"] == 'traceparent;desc="00-{}-{}-01"'.format(
+            padded_hex(span.context.trace_id), padded_hex(span.context.span_id)
+        )
+
+    def test_response_trace_header_disabled(self):
+        settings.reload(dict(SPLUNK_TRACE_RESPONSE_HEADER_ENABLED="false"))
+        try:
+            config.tracer = MockTracer()
+            instrument()
+            response = self.make_app().test_client().get("/")
+        finally:
+            settings.reload()
+
+        assert response.status_code == 200
+        assert "Access-Control-Expose-Headers" not in response.headers
+        assert "Server-Timing" not in response.headers
+
     def test_uninstrument_reverts_wrapper(self):
         tracer = MockTracer()
         opentracing.tracer = tracer
@@ -1,7 +1,7 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
 import pytest
 
-from signalfx_tracing.libraries.requests_.instrument import config, uninstrument
+from signalfx_tracing.libraries.logging_.instrument import config, uninstrument
 
 
 class LoggingTestSuite(object):
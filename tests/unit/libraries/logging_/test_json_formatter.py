@@ -0,0 +1,117 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from collections import OrderedDict
+import json
+import logging
+import sys
+
+from opentracing.mocktracer import MockTracer
+import pytest
+
+from signalfx_tracing.libraries.logging_ import json_formatter, JSONFormatter
+from signalfx_tracing.libraries.logging_.instrument import (
+    JSON_FORMAT,
+    config,
+    instrument,
+)
+
+from .conftest import LoggingTestSuite
+
+
+def make_record(msg="log %s", args=("statement",), exc_info=None, **fields):
+    record = logging.LogRecord(
+        "json_logger", logging.WARNING, "/path/to/module.py", 12, msg, args, exc_info
+    )
+    record.__dict__.update(fields)
+    return record
+
+
+trace_context = dict(
+    sfxTraceId="000000000000000a",
+    sfxSpanId="000000000000000b",
+    sfxService="json_service",
+    sfxEnvironment="test",
+)
+
+
+class TestJSONFormatter(LoggingTestSuite):
+    def test_format(self):
+        formatter = JSONFormatter()
+        record = make_record(**trace_context)
+        formatted = formatter.format(record)
+
+        assert "\n" not in formatted
+        assert json.loads(formatted) == {
+            "timestamp": logging.Formatter().formatTime(record),
+            "level": "WARNING",
+            "logger": "json_logger",
+            "file": "module.py",
+            "line": 12,
+            "message": "log statement",
+            "signalfx.trace_id": "000000000000000a",
+            "signalfx.span_id": "000000000000000b",
+            "signalfx.service": "json_service",
+            "signalfx.environment": "test",
+        }
+        assert list(json.loads(formatted, object_pairs_hook=OrderedDict))[:6] == [
+            "timestamp", "level", "logger", "file", "line", "message"
+        ]
+
+    def test_format_without_trace_context(self):
+        fields = json.loads(JSONFormatter().format(make_record()))
+        for key, _ in json_formatter.trace_context_keys:
+            assert fields[key] == ""
+
+    def test_format_exception(self):
+        try:
+            raise ValueError("failed")
+        except ValueError:
+            record = make_record(exc_info=sys.exc_info())
+        fields = json.loads(JSONFormatter().format(record))
+        assert fields["exc_info"].startswith("Traceback")
+        assert fields["exc_info"].endswith("ValueError: failed")
+
+    def test_format_time(self):
+        record = make_record()
+        assert JSONFormatter().formatTime(record) == logging.Formatter().formatTime(record)
+        assert JSONFormatter(datefmt="%H:%M").format(record).startswith(
+            '{"timestamp":"' + logging.Formatter().formatTime(record, "%H:%M") + '"'
+        )
+
+    @pytest.mark.skipif(json_formatter.orjson is None, reason="orjson isn't installed")
+    def test_orjson_and_json_encoders_agree(self):
+        record = make_record(msg=u"unicode \u2603 %s", **trace_context)
+        with_orjson = JSONFormatter(encode=json_formatter._orjson_dumps).format(record)
+        with_json = JSONFormatter(encode=json_formatter._json_dumps).format(record)
+        assert json.loads(with_orjson) == json.loads(with_json)
+
+    def test_instrument_configures_json_format(self, monkeypatch):
+        root = logging.getLogger()
+        monkeypatch.setattr(root, "handlers", [])
+        monkeypatch.setattr(root, "level", root.level)
+        config.injection_enabled = True
+        config.logging_format = JSON_FORMAT
+        instrument(MockTracer())
+
+        assert len(root.handlers) == 1
+        assert isinstance(root.handlers[0].formatter, JSONFormatter)
+        assert root.level == logging.INFO
+
+    def test_instrument_keeps_configured_handlers_for_json_format(self, monkeypatch):
+        root = logging.getLogger()
+        handler = logging.NullHandler()
+        monkeypatch.setattr(root, "handlers", [handler])
+        monkeypatch.setattr(root, "level", logging.ERROR)
+        config.injection_enabled = True
+        config.logging_format = JSON_FORMAT
+        instrument(MockTracer())
+
+        assert root.handlers == [handler]
+        assert root.level == logging.ERROR
+
+    def test_format_time_without_default_formats(self, monkeypatch):
+        # Python 2.7's Formatter has no default_time_format or default_msec_format
+        record = make_record()
+        expected = logging.Formatter().formatTime(record)
+        monkeypatch.delattr(logging.Formatter, "default_time_format", raising=False)
+        monkeypatch.delattr(logging.Formatter, "default_msec_format", raising=False)
+        assert JSONFormatter().formatTime(record) == expected
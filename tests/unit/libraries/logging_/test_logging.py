@@ -1,13 +1,20 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
 
+import pickle
 import sys
 import opentracing
 import logging
 
+import pytest
+
 from signalfx_tracing import create_tracer
 from signalfx_tracing.utils import trace
 from signalfx_tracing.tags import SFX_ENVIRONMENT
-from signalfx_tracing.libraries.logging_.instrument import instrument, config
+from signalfx_tracing.libraries.logging_.instrument import (
+    config,
+    instrument,
+    uninstrument,
+)
 
 from .conftest import LoggingTestSuite
 
@@ -18,9 +25,13 @@ else:
 
 
 class TestLogging(LoggingTestSuite):
-    def setup_tracing(self, caplog):
+    def setup_tracing(self, caplog, sampler_param=1):
         tags = {SFX_ENVIRONMENT: "test"}
-        self.tracer = create_tracer(config={"service_name": "loginject", "tags": tags})
+        sampler = {"type": "const", "param": sampler_param}
+        self.tracer = create_tracer(
+            config={"service_name": "loginject", "tags": tags, "sampler": sampler},
+            allow_multiple=True,
+        )
         instrument(self.tracer)
         opentracing.tracer = self.tracer
         caplog.set_level(logging.INFO)
@@ -72,3 +83,120 @@ class TestLogging(LoggingTestSuite):
         assert fields.get("sfxTraceId") == "{:016x}".format(trace_id)
         assert fields.get("sfxService") == "loginject"
         assert fields.get("sfxEnvironment") == "test"
+
+    def test_no_injection_for_unsampled_span(self, caplog):
+        config.injection_enabled = True
+        self.setup_tracing(caplog, sampler_param=0)
+
+        @trace
+        def traced_function():
+            assert not opentracing.tracer.active_span.is_sampled()
+            logging.getLogger().info("log statement")
+
+        traced_function()
+
+        assert len(caplog.records) == 1
+        fields = caplog.records[0].__dict__
+
+        assert fields.get("sfxSpanId") == ""
+        assert fields.get("sfxTraceId") == ""
+        assert fields.get("sfxService") == ""
+        assert fields.get("sfxEnvironment") == ""
+
+    def test_uninstrument(self, caplog):
+        config.injection_enabled = True
+        self.setup_tracing(caplog)
+
+        assert hasattr(logging.Logger.makeRecord, "__wrapped__")
+
+        uninstrument()
+        assert not hasattr(logging.Logger.makeRecord, "__wrapped__")
+
+    @pytest.fixture
+    def formatted(self):
+        """A DEBUG logger and the stream of its INFO handler with the trace context format"""
+        stream = StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(logging.Formatter(config.logging_format))
+        logger = logging.getLogger("lazy_fields")
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        yield logger, stream
+        logger.removeHandler(handler)
+
+    def test_lazy_fields(self, caplog, formatted):
+        config.injection_enabled = True
+        config.lazy_fields = True
+        self.setup_tracing(caplog)
+        logger, stream = formatted
+
+        with self.tracer.start_active_span("lazy") as scope:
+            context = scope.span.context
+            logger.info("log statement")
+
+        record = caplog.records[0]
+        assert record.sfxTraceId == "{:016x}".format(context.trace_id)
+        assert record.sfxSpanId == "{:016x}".format(context.span_id)
+        assert record.sfxService == "loginject"
+        assert record.sfxEnvironment == "test"
+        assert "_sfx_span" not in record.__dict__
+        pickle.dumps(record.__dict__)
+
+        assert "signalfx.trace_id={:016x} signalfx.span_id={:016x}".format(
+            context.trace_id, context.span_id
+        ) in stream.getvalue()
+
+    def test_lazy_fields_of_span_active_upon_record_creation(self, caplog, formatted):
+        config.injection_enabled = True
+        config.lazy_fields = True
+        self.setup_tracing(caplog)
+        logger, stream = formatted
+
+        with self.tracer.start_active_span("created") as scope:
+            context = scope.span.context
+            record = logger.makeRecord(logger.name, logging.INFO, "module.py", 1, "made", (), None)
+
+        with self.tracer.start_active_span("handled"):
+            logger.handle(record)
+
+        assert record.sfxSpanId == "{:016x}".format(context.span_id)
+
+    def test_lazy_fields_not_determined_for_discarded_records(self, caplog, formatted, monkeypatch):
+        config.injection_enabled = True
+        config.lazy_fields = True
+        self.setup_tracing(caplog)
+        logger, stream = formatted
+        monkeypatch.setattr(logger, "propagate", False)  # only the INFO handler handles its records
+
+        with self.tracer.start_active_span("lazy") as scope:
+            logger.debug("discarded by handler levels")
+            assert "_sfx_hex_ids" not in scope.span.context.__dict__
+            logger.info("log statement")
+            assert "_sfx_hex_ids" in scope.span.context.__dict__
+
+        assert "discarded" not in stream.getvalue()
+
+    def test_lazy_fields_for_unsampled_span(self, caplog, formatted):
+        config.injection_enabled = True
+        config.lazy_fields = True
+        self.setup_tracing(caplog, sampler_param=0)
+        logger, stream = formatted
+
+        with self.tracer.start_active_span("lazy"):
+            logger.info("log statement")
+
+        assert caplog.records[0].sfxSpanId == ""
+        assert caplog.records[0].sfxService == ""
+
+    def test_uninstrument_lazy_fields(self, caplog):
+        config.injection_enabled = True
+        config.lazy_fields = True
+        self.setup_tracing(caplog)
+
+        assert hasattr(logging.Logger.makeRecord, "__wrapped__")
+        assert hasattr(logging.Handler.handle, "__wrapped__")
+
+        uninstrument()
+        assert not hasattr(logging.Logger.makeRecord, "__wrapped__")
+        assert not hasattr(logging.Handler.handle, "__wrapped__")
@@ -1,8 +1,10 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
+import mock
 import pytest
 
 from tornado.testing import AsyncHTTPTestCase as BaseAsyncHTTPTestCase
 
+from signalfx_tracing import scope_managers
 from signalfx_tracing.libraries.tornado_.instrument import config, uninstrument
 
 
@@ -19,6 +21,11 @@ class TornadoTestSuite(object):
         yield
         config.__dict__ = orig
 
+    @pytest.fixture(autouse=True)
+    def restored_promoted_scope_manager(self):
+        with mock.patch.object(scope_managers, "_promoted", [None]):
+            yield
+
     @pytest.fixture(autouse=True)
     def uninstrument_tornado(self):
         yield
@@ -4,6 +4,7 @@ from opentracing.ext import tags
 import tornado.web
 import opentracing
 import pytest
+import importlib
 import mock
 
 from signalfx_tracing.libraries.tornado_.instrument import (
@@ -11,9 +12,13 @@ from signalfx_tracing.libraries.tornado_.instrument import (
     instrument,
     uninstrument,
 )
+from signalfx_tracing.utils import padded_hex
+from signalfx_tracing import scope_managers, settings
 from .helpers import AsyncHTTPTestCase
 from .conftest import TornadoTestSuite
 
+instrument_module = importlib.import_module("signalfx_tracing.libraries.tornado_.instrument")
+
 
 class MockApplication(mock.MagicMock):
     def __init__(self, *args, **kwargs):
@@ -60,6 +65,16 @@ class TestTornadoConfig(TornadoTestSuite):
             app = MockApplication()
             assert app.settings.get("opentracing_tracing").tracer is opentracing.tracer
 
+    def test_instrument_promotes_thread_local_scope_manager(self):
+        from tornado_opentracing.scope_managers import TornadoScopeManager
+
+        tracer = MockTracer()
+        tracer.set_scope_manager = mock.Mock(return_value=True)
+        config.tracer = tracer
+        instrument()
+        tracer.set_scope_manager.assert_called_once_with(TornadoScopeManager)
+        assert scope_managers.default_scope_manager() is TornadoScopeManager
+
 
 class Handler(tornado.web.RequestHandler):
     def get(self):
@@ -71,7 +86,7 @@ class TestTornadoApplicationAndClient(AsyncHTTPTestCase, TornadoTestSuite):
         self.tracer = MockTracer()
         config.tracer = self.tracer
         instrument()
-        return tornado.web.Application([("/endpoint", Handler)])
+        return tornado.web.Application([("/endpoint", Handler), ("/endpoint/[0-9]+", Handler)])
 
     def test_instrument_application_and_client(self):
         response = self.http_fetch(self.get_url("/endpoint"))
@@ -82,6 +97,7 @@ class TestTornadoApplicationAndClient(AsyncHTTPTestCase, TornadoTestSuite):
         assert len(spans) == 2
         assert all([span.finished for span in spans])
         server_span, client_span = spans
+        assert server_span.parent_id == client_span.context.span_id
         assert server_span.operation_name == "Handler"
         assert server_span.tags == {
             "component": "tornado",
@@ -101,6 +117,54 @@ class TestTornadoApplicationAndClient(AsyncHTTPTestCase, TornadoTestSuite):
             "http.status_code": 200,
         }
 
+    def test_normalized_urls(self):
+        settings.reload(dict(SIGNALFX_URL_NORMALIZATION="true"))
+        try:
+            response = self.http_fetch(self.get_url("/endpoint/123?q=1"))
+        finally:
+            settings.reload()
+        assert response.code == 200
+
+        server_span = self.tracer.finished_spans()[0]
+        assert server_span.tags["http.url"] == "/endpoint/{id}?q=1"
+        assert server_span.tags["path"] == "/endpoint/{id}"
+
+    def test_response_trace_header_server_timing(self):
+        response = self.http_fetch(self.get_url("/endpoint"))
+        assert response.code == 200
+
+        server_span = self.tracer.finished_spans()[0]
+        assert response.headers["Access-Control-Expose-Headers"] == "Server-Timing"
+        assert response.headers["Server-Timing"] == 'traceparent;desc="00-{}-{}-01"'.format(
+            padded_hex(server_span.context.trace_id), padded_hex(server_span.context.span_id)
+        )
+
+    def test_tracing_falls_back_without_private_methods(self):
+        with mock.patch.object(instrument_module, "_tracing_methods", ("_missing",)), mock.patch(
+            "signalfx_tracing.utils.extract_span_context"
+        ) as extract:
+            response = self.http_fetch(self.get_url("/endpoint"))
+        assert response.code == 200
+        assert not extract.called  # Started by tornado_opentracing
+
+        server_span = self.tracer.finished_spans()[0]
+        assert server_span.operation_name == "Handler"
+        assert server_span.tags["component"] == "tornado"
+        assert response.headers["Server-Timing"] == 'traceparent;desc="00-{}-{}-01"'.format(
+            padded_hex(server_span.context.trace_id), padded_hex(server_span.context.span_id)
+        )
+
+    def test_response_trace_header_disabled(self):
+        settings.reload(dict(SPLUNK_TRACE_RESPONSE_HEADER_ENABLED="false"))
+        try:
+            response = self.http_fetch(self.get_url("/endpoint"))
+        finally:
+            settings.reload()
+
+        assert response.code == 200
+        assert "Access-Control-Expose-Headers" not in response.headers
+        assert "Server-Timing" not in response.headers
+
     def test_uninstrument_application_and_client(self):
         response = self.http_fetch(self.get_url("/endpoint"))
         assert response.code == 200
@@ -166,7 +230,7 @@ class TestTornadoClientAndNotApplication(AsyncHTTPTestCase, TornadoTestSuite):
         config.tracer = self.tracer
         config.trace_all = False
         instrument()
-        return tornado.web.Application([("/endpoint", Handler)])
+        return tornado.web.Application([("/endpoint", Handler), ("/endpoint/[0-9]+", Handler)])
 
     def test_instrument_application_and_client(self):
         response = self.http_fetch(self.get_url("/endpoint"))
@@ -199,3 +263,24 @@ class TestTornadoClientAndNotApplication(AsyncHTTPTestCase, TornadoTestSuite):
         response = self.http_fetch(self.get_url("/endpoint"))
         assert response.code == 200
         assert self.tracer.finished_spans() == []
+
+
+class TestTornadoSamplingRules(AsyncHTTPTestCase, TornadoTestSuite):
+    def get_app(self):
+        self.tracer = MockTracer()
+        config.tracer = self.tracer
+        config.trace_client = False  # Requests would otherwise propagate the client span's context
+        instrument()
+        return tornado.web.Application([("/endpoint", Handler), ("/health", Handler)])
+
+    def test_sampling_rules_drop_requests(self):
+        settings.reload(dict(SIGNALFX_SAMPLING_RULES="path:^/health$=drop"))
+        try:
+            assert self.http_fetch(self.get_url("/health")).code == 200
+            assert self.http_fetch(self.get_url("/endpoint")).code == 200
+        finally:
+            settings.reload()
+
+        dropped, kept = self.tracer.finished_spans()
+        assert dropped.tags["sampling.priority"] == 0
+        assert "sampling.priority" not in kept.tags
@@ -1,11 +1,14 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
+import os
+
 import pytest
+import mock
 
 from opentracing.mocktracer import MockTracer
 import opentracing
 
-from signalfx_tracing.utils import trace
-from signalfx_tracing import tags as ext_tags
+from signalfx_tracing.utils import trace, TracerProxy
+from signalfx_tracing import tags as ext_tags, settings
 
 from .conftest import SpanTest
 
@@ -236,3 +239,45 @@ class TestMethodDecorator(DecoratorTest):
         self.assert_span_with_exception(spans[0], error)
 
         assert Thing().traced_method.__name__ == "traced_method"
+
+
+class TestDecoratorFastPaths(DecoratorTest):
+    def test_tracing_disabled_returns_undecorated_function(self):
+        def traced_function():
+            return 123
+
+        os.environ["SIGNALFX_TRACING_ENABLED"] = "False"
+        settings.reload()
+        try:
+            assert trace(traced_function) is traced_function
+            assert trace("operation_name")(traced_function) is traced_function
+        finally:
+            os.environ.pop("SIGNALFX_TRACING_ENABLED")
+            settings.reload()
+
+    @pytest.mark.parametrize("proxied", (False, True))
+    def test_noop_tracer_is_passed_through(self, proxied):
+        @trace("operation_name", tags=dict(one=1))
+        def traced_function(*args, **kwargs):
+            assert args == (1,)
+            assert kwargs == dict(one=1)
+            return 123
+
+        noop_tracer = opentracing.Tracer()
+        if proxied:
+            proxy = TracerProxy()
+            proxy.set_tracer(noop_tracer)
+            noop_tracer = proxy
+        opentracing.tracer = noop_tracer
+
+        with mock.patch.object(opentracing.Tracer, "start_active_span") as start:
+            assert traced_function(1, one=1) == 123
+        assert not start.called
+        assert traced_function.__name__ == "traced_function"
+
+        # The global tracer is rechecked on each call
+        opentracing.tracer = self.tracer
+        assert traced_function(1, one=1) == 123
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == "operation_name"
@@ -0,0 +1,262 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+import asyncio
+
+from opentracing.mocktracer import MockTracer
+import opentracing
+import pytest
+
+try:
+    from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+except ImportError:  # Python < 3.7
+    from opentracing.scope_managers.asyncio import (
+        AsyncioScopeManager as ContextVarsScopeManager,
+    )
+
+from signalfx_tracing.utils import trace
+
+from .conftest import SpanTest
+
+
+class CustomException(Exception):
+    pass
+
+
+class AsyncDecoratorTest(SpanTest):
+    @pytest.fixture(autouse=True)
+    def _setup_tracer(self):
+        self.tracer = MockTracer(ContextVarsScopeManager())
+        opentracing.tracer = self.tracer
+
+    @pytest.fixture
+    def loop(self):
+        loop = asyncio.new_event_loop()
+        yield loop
+        loop.close()
+
+
+class TestGeneratorDecorator(AsyncDecoratorTest):
+    def test_span_covers_iteration(self):
+        @trace("operation_name", tags=dict(one=1))
+        def traced_generator(count):
+            for i in range(count):
+                assert self.tracer.active_span.operation_name == "operation_name"
+                yield i
+
+        generator = traced_generator(3)
+        assert self.tracer.finished_spans() == []
+        assert traced_generator.__name__ == "traced_generator"
+
+        assert next(generator) == 0
+        assert self.tracer.active_span is None
+        assert self.tracer.finished_spans() == []
+
+        assert list(generator) == [1, 2]
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == "operation_name"
+        assert spans[0].tags == dict(one=1)
+
+    def test_span_parent_is_active_span_upon_first_iteration(self):
+        @trace
+        def traced_generator():
+            yield 1
+
+        generator = traced_generator()
+        with self.tracer.start_active_span("parent") as scope:
+            assert list(generator) == [1]
+
+        child, parent = self.tracer.finished_spans()
+        assert child.operation_name == "traced_generator"
+        assert child.parent_id == scope.span.context.span_id
+
+    def test_send_and_return_value(self):
+        @trace
+        def traced_generator():
+            received = yield "first"
+            received = yield received * 2
+            return received
+
+        def delegator():
+            result = yield from traced_generator()
+            yield result
+
+        generator = delegator()
+        assert next(generator) == "first"
+        assert generator.send(2) == 4
+        assert generator.send("returned") == "returned"
+        assert len(self.tracer.finished_spans()) == 1
+
+    def test_close_finishes_span_without_error(self):
+        closed = []
+
+        @trace
+        def traced_generator():
+            try:
+                yield 1
+                yield 2
+            finally:
+                closed.append(self.tracer.active_span.operation_name)
+
+        generator = traced_generator()
+        assert next(generator) == 1
+        generator.close()
+
+        assert closed == ["traced_generator"]
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert "error" not in spans[0].tags
+
+    def test_errored_generator(self):
+        error = CustomException("SomeException")
+
+        @trace
+        def traced_generator():
+            yield 1
+            raise error
+
+        with pytest.raises(CustomException):
+            list(traced_generator())
+
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        self.assert_span_with_exception(spans[0], error)
+
+    def test_thrown_exception_is_delivered(self):
+        @trace
+        def traced_generator():
+            try:
+                yield 1
+            except CustomException:
+                yield "handled"
+
+        generator = traced_generator()
+        next(generator)
+        assert generator.throw(CustomException()) == "handled"
+        generator.close()
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert "error" not in spans[0].tags
+
+
+class TestCoroutineDecorator(AsyncDecoratorTest):
+    def test_span_covers_awaited_execution(self, loop):
+        @trace("operation_name", tags=dict(one=1))
+        async def traced_coroutine(value):
+            await asyncio.sleep(0.01)
+            assert self.tracer.active_span.operation_name == "operation_name"
+            return value
+
+        assert asyncio.iscoroutinefunction(traced_coroutine)
+        assert traced_coroutine.__name__ == "traced_coroutine"
+
+        coroutine = traced_coroutine(123)
+        assert self.tracer.finished_spans() == []
+        assert loop.run_until_complete(coroutine) == 123
+
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == "operation_name"
+        assert spans[0].tags == dict(one=1)
+        assert spans[0].finish_time - spans[0].start_time >= 0.01
+
+    def test_concurrent_coroutines_have_own_context(self, loop):
+        @trace
+        async def child():
+            await asyncio.sleep(0)
+
+        @trace
+        async def parent(name):
+            await asyncio.sleep(0)
+            await child()
+            return self.tracer.active_span
+
+        async def run():
+            return await asyncio.gather(parent("one"), parent("two"))
+
+        parent_one, parent_two = loop.run_until_complete(run())
+        spans = self.tracer.finished_spans()
+        children = [span for span in spans if span.operation_name == "child"]
+        assert sorted(span.parent_id for span in children) == sorted(
+            [parent_one.context.span_id, parent_two.context.span_id]
+        )
+
+    def test_errored_coroutine(self, loop):
+        error = CustomException("SomeException")
+
+        @trace
+        async def traced_coroutine():
+            await asyncio.sleep(0)
+            raise error
+
+        with pytest.raises(CustomException):
+            loop.run_until_complete(traced_coroutine())
+
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        self.assert_span_with_exception(spans[0], error)
+
+    def test_coroutine_method(self, loop):
+        class Thing(object):
+            @trace
+            async def traced_method(self, value):
+                return value
+
+        assert loop.run_until_complete(Thing().traced_method(1)) == 1
+        assert len(self.tracer.finished_spans()) == 1
+
+
+class TestAsyncGeneratorDecorator(AsyncDecoratorTest):
+    def test_span_covers_iteration(self, loop):
+        @trace("operation_name")
+        async def traced_generator(count):
+            for i in range(count):
+                await asyncio.sleep(0)
+                assert self.tracer.active_span.operation_name == "operation_name"
+                yield i
+
+        async def consume():
+            items = []
+            async for item in traced_generator(3):
+                assert self.tracer.active_span is None
+                items.append(item)
+            return items
+
+        assert loop.run_until_complete(consume()) == [0, 1, 2]
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert spans[0].operation_name == "operation_name"
+        assert spans[0].tags == dict()
+
+    def test_aclose_finishes_span_without_error(self, loop):
+        @trace
+        async def traced_generator():
+            yield 1
+            yield 2
+
+        async def consume():
+            generator = traced_generator()
+            assert await generator.__anext__() == 1
+            await generator.aclose()
+
+        loop.run_until_complete(consume())
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        assert "error" not in spans[0].tags
+
+    def test_errored_async_generator(self, loop):
+        error = CustomException("SomeException")
+
+        @trace
+        async def traced_generator():
+            yield 1
+            raise error
+
+        async def consume():
+            return [item async for item in traced_generator()]
+
+        with pytest.raises(CustomException):
+            loop.run_until_complete(consume())
+
+        spans = self.tracer.finished_spans()
+        assert len(spans) == 1
+        self.assert_span_with_exception(spans[0], error)
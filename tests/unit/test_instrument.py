@@ -2,6 +2,7 @@
 import sys
 import os
 
+from wrapt import notify_module_loaded
 import pytest
 import mock
 import six
@@ -12,7 +13,7 @@ from signalfx_tracing.constants import (
     auto_instrumentable_libraries,
 )
 from signalfx_tracing.instrumentation import instrument, uninstrument, auto_instrument
-from signalfx_tracing import utils
+from signalfx_tracing import instrumentation, settings, utils
 
 if six.PY2:
     from contextlib import nested
@@ -56,6 +57,7 @@ expected_auto_instrumentable_libraries = (
 )
 
 tracing_enabled_env_var = "SIGNALFX_TRACING_ENABLED"
+lazy_instrumentation_env_var = "SIGNALFX_LAZY_INSTRUMENTATION"
 
 
 class TestInstrument(object):
@@ -115,6 +117,7 @@ class TestInstrument(object):
             with nested(*contexts):
                 yield
         finally:
+            instrumentation._deferred_libraries.clear()
             for library, module in module_store.items():
                 if module:
                     sys.modules[library] = module
@@ -153,12 +156,14 @@ class TestInstrument(object):
     ):
         env_var = "SIGNALFX_{0}_ENABLED".format(module_name.upper())
         os.environ[env_var] = "False"
+        settings.reload()
         try:
             instrument(**{module_name: True})
             mod = utils.get_module(module_name)
             assert not hasattr(mod, instrumented_attr)
         finally:
             os.environ.pop(env_var)
+            settings.reload()
 
     def test_auto_instrument_instruments_all_available_libraries(self):
         modules = [(utils.get_module(lib), lib) for lib in expected_traceable_libraries]
@@ -177,6 +182,7 @@ class TestInstrument(object):
     )
     def test_env_var_disables_instrument(self, env_var, are_uninstrumented):
         os.environ[tracing_enabled_env_var] = env_var
+        settings.reload()
         try:
             modules = [utils.get_module(lib) for lib in expected_traceable_libraries]
             assert self.all_are_uninstrumented(modules)
@@ -187,6 +193,7 @@ class TestInstrument(object):
             assert self.all_are_uninstrumented(modules) is are_uninstrumented
         finally:
             os.environ.pop(tracing_enabled_env_var)
+            settings.reload()
 
     @pytest.mark.parametrize(
         "env_var, are_uninstrumented", [("False", True), ("0", True), ("True", False)]
@@ -195,6 +202,7 @@ class TestInstrument(object):
         self, env_var, are_uninstrumented
     ):
         os.environ[tracing_enabled_env_var] = env_var
+        settings.reload()
         try:
             modules = [
                 utils.get_module(lib) for lib in expected_auto_instrumentable_libraries
@@ -206,6 +214,7 @@ class TestInstrument(object):
             assert self.all_are_uninstrumented(modules) is are_uninstrumented
         finally:
             os.environ.pop(tracing_enabled_env_var)
+            settings.reload()
 
     @pytest.mark.parametrize(
         "env_var, are_uninstrumented", [("False", True), ("0", True), ("True", False)]
@@ -219,6 +228,7 @@ class TestInstrument(object):
         ]
         for enabled in enableds:
             os.environ[enabled] = env_var
+        settings.reload()
         try:
             modules = [
                 utils.get_module(lib) for lib in expected_auto_instrumentable_libraries
@@ -231,3 +241,60 @@ class TestInstrument(object):
         finally:
             for enabled in enableds:
                 os.environ.pop(enabled)
+            settings.reload()
+
+    @pytest.fixture
+    def unimported_redis(self):
+        """Removes the stubbed redis module from sys.modules, returning it for later import"""
+        module = sys.modules.pop("redis")
+        module.__name__ = "redis"
+        yield module
+        sys.modules.setdefault("redis", module)
+
+    def import_module(self, module):
+        sys.modules[module.__name__] = module
+        notify_module_loaded(module)
+
+    def test_lazy_auto_instrument_instruments_imported_libraries(self):
+        modules = [
+            utils.get_module(lib) for lib in expected_auto_instrumentable_libraries
+        ]
+        assert self.all_are_uninstrumented(modules)
+
+        auto_instrument(lazy=True)
+
+        for module in modules:
+            assert getattr(module, instrumented_attr) is True
+
+    def test_lazy_auto_instrument_defers_until_import(self, unimported_redis):
+        auto_instrument(lazy=True)
+        assert not hasattr(unimported_redis, instrumented_attr)
+        assert "redis" in instrumentation._deferred_libraries
+
+        self.import_module(unimported_redis)
+        assert getattr(unimported_redis, instrumented_attr) is True
+        assert "redis" not in instrumentation._deferred_libraries
+
+    def test_uninstrument_cancels_lazy_instrumentation(self, unimported_redis):
+        auto_instrument(lazy=True)
+        uninstrument("redis")
+        assert "redis" not in sys.modules
+
+        self.import_module(unimported_redis)
+        assert not hasattr(unimported_redis, instrumented_attr)
+
+    @pytest.mark.parametrize("env_var, is_lazy", [("True", True), ("False", False)])
+    def test_env_var_enables_lazy_auto_instrument(
+        self, unimported_redis, env_var, is_lazy
+    ):
+        os.environ[lazy_instrumentation_env_var] = env_var
+        settings.reload()
+        try:
+            with mock.patch.object(
+                instrumentation, "_importable_libraries", return_value=([], [])
+            ):
+                auto_instrument()
+            assert ("redis" in instrumentation._deferred_libraries) is is_lazy
+        finally:
+            os.environ.pop(lazy_instrumentation_env_var)
+            settings.reload()
@@ -0,0 +1,159 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from threading import Thread
+import logging
+import time
+
+from jaeger_client import Tracer
+from jaeger_client.reporter import InMemoryReporter, Reporter
+from jaeger_client.sampler import ConstSampler
+from jaeger_client.senders import Sender
+import mock
+import pytest
+
+from signalfx_tracing import metrics, settings
+from signalfx_tracing.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_counter_counts():
+    counter = Counter()
+    counter()
+    counter(5)
+    counter(0)
+    assert counter.value == 6
+
+
+def test_counter_is_thread_safe():
+    counter = Counter()
+
+    def increment():
+        for _ in range(10000):
+            counter(1)
+            counter(2)
+
+    threads = [Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value == 120000
+
+
+def test_counter_counts_non_integers():
+    counter = Counter()
+    counter(0.5)
+    counter(0.25)
+    assert counter.value == 0.75
+
+
+def test_locks_are_replaced_after_forking():
+    registry = MetricsRegistry()
+    counter = registry.create_counter("spans")
+    histogram = registry.create_timer("latency")
+    held = counter._lock
+    held.acquire()  # As if by a thread of the forking process
+    registry._reset_locks()
+    counter(1)
+    histogram(1)
+    assert counter.value == 1
+    assert counter._lock is not held
+
+
+def test_histogram_buckets_values():
+    histogram = Histogram(bounds=(10, 100))
+    for value in (5, 10, 50, 50, 1000):
+        histogram(value)
+    assert histogram.counts == [2, 2, 1]
+    assert histogram.value == dict(count=5, p50=100, p99=float("inf"), max=float("inf"))
+
+
+def test_empty_histogram_has_no_quantiles():
+    assert Histogram().value == dict(count=0, p50=None, p99=None, max=None)
+
+
+def test_registry_retains_metrics_by_name_and_tags():
+    registry = MetricsRegistry()
+    counter = registry.create_counter("spans", tags={"sampled": "y", "state": "started"})
+    assert registry.create_counter("spans", tags={"state": "started", "sampled": "y"}) is counter
+    counter(2)
+    registry.create_gauge("queue_length")(7)
+    registry.create_timer("latency")(150)
+
+    assert registry.get("spans", sampled="y", state="started") is counter
+    assert registry.get("missing") is None
+    snapshot = registry.snapshot()
+    assert snapshot["spans{sampled=y,state=started}"] == 2
+    assert snapshot["queue_length"] == 7
+    assert snapshot["latency"]["count"] == 1
+    assert list(snapshot) == sorted(snapshot)
+
+
+def test_registry_collects_jaeger_metrics():
+    registry = MetricsRegistry()
+    reporter = InMemoryReporter()
+    tracer = Tracer("metrics", reporter, ConstSampler(True), metrics_factory=registry)
+    tracer.start_span("span").finish()
+    assert registry.get("jaeger:started_spans", sampled="y").value == 1
+    assert registry.get("jaeger:traces", sampled="y", state="started").value == 1
+    assert registry.get("jaeger:finished_spans").value == 1
+
+
+class SlowSender(Sender):
+    def send(self, batch):
+        time.sleep(0.002)
+
+
+def instrumented_tracer(registry, batch_size=10):
+    reporter = Reporter(SlowSender(batch_size=batch_size), flush_interval=None)
+    metrics.instrument_sender(reporter, registry)
+    return Tracer("metrics", reporter, ConstSampler(True))
+
+
+def test_flushed_spans_are_counted_by_component():
+    registry = MetricsRegistry()
+    tracer = instrumented_tracer(registry, batch_size=2)
+    for component in ("flask", "flask", "redis-py"):
+        tracer.start_span("span", tags=dict(component=component)).finish()
+    tracer.start_span("span").finish()
+    tracer.reporter.close()
+
+    assert registry.get("sfx:flushed_spans", component="flask").value == 2
+    assert registry.get("sfx:flushed_spans", component="redis-py").value == 1
+    assert registry.get("sfx:flushed_spans", component="unknown").value == 1
+
+
+def test_flushes_are_timed():
+    registry = MetricsRegistry()
+    tracer = instrumented_tracer(registry)
+    tracer.start_span("span").finish()
+    tracer.reporter.flush()
+    tracer.reporter.flush()  # Without spans to send
+    tracer.reporter.close()
+
+    latency = registry.get("sfx:reporter_flush_latency")
+    assert latency.value["count"] == 1
+    assert sum(latency.counts[latency.bounds.index(2500):]) == 1  # At least the 2ms of sending
+
+
+@pytest.mark.parametrize("enabled", ("true", "false"))
+def test_metrics_factory_by_settings(enabled):
+    env = settings.Settings(dict(SIGNALFX_METRICS_ENABLED=enabled))
+    with mock.patch("signalfx_tracing.settings.get", return_value=env):
+        factory = metrics.metrics_factory()
+    assert (factory is metrics.registry) is (enabled == "true")
+
+
+def test_snapshots_are_logged_periodically(caplog):
+    metrics.registry.create_counter("test:logged")(3)
+    with mock.patch.object(metrics, "_log_thread", [None]):
+        with caplog.at_level(logging.INFO, logger="signalfx_tracing.metrics"):
+            metrics.log_periodically(0.01)
+            thread = metrics._log_thread[0]
+            metrics.log_periodically(0.01)
+            assert metrics._log_thread[0] is thread
+            deadline = time.time() + 5
+            while not caplog.records and time.time() < deadline:
+                time.sleep(0.01)
+            metrics.stop_logging()
+            thread.join(5)
+    assert "test:logged=3" in caplog.records[0].getMessage()
+    assert not thread.is_alive()
@@ -0,0 +1,244 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from opentracing import Format, InvalidCarrierException, SpanContextCorruptedException
+from opentracing.mocktracer import MockTracer
+import pytest
+
+pytest.importorskip("jaeger_client")
+
+from jaeger_client import SpanContext  # noqa: E402
+from jaeger_client.codecs import B3Codec  # noqa: E402
+
+from signalfx_tracing import utils  # noqa: E402
+from signalfx_tracing.propagation import (  # noqa: E402
+    TRACESTATE_BAGGAGE_KEY,
+    CompositeCodec,
+    W3CCodec,
+    http_headers_codec,
+    parse_traceparent,
+)
+
+traceparent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+trace_id = 0x0AF7651916CD43DD8448EB211C80319C
+span_id = 0xB7AD6B7169203331
+
+
+class TestParseTraceparent(object):
+    def test_valid(self):
+        assert parse_traceparent(traceparent) == (trace_id, span_id, 1)
+        assert parse_traceparent(traceparent[:-2] + "00") == (trace_id, span_id, 0)
+        assert parse_traceparent(traceparent[:-2] + "03") == (trace_id, span_id, 1)
+
+    def test_future_version_with_additional_fields(self):
+        assert parse_traceparent("cc" + traceparent[2:] + "-what-the-future-holds") == (
+            trace_id,
+            span_id,
+            1,
+        )
+
+    @pytest.mark.parametrize(
+        "value",
+        (
+            "",
+            None,
+            traceparent[:-1],
+            traceparent + "-",
+            traceparent + "0",
+            "cc" + traceparent[2:] + "0",
+            traceparent.upper(),
+            "ff" + traceparent[2:],
+            "00-00000000000000000000000000000000-b7ad6b7169203331-01",
+            "00-0af7651916cd43dd8448eb211c80319c-0000000000000000-01",
+            "00-0af7651916cd43dd8448eb211c80319c-b7ad6b716920333g-01",
+            "00_0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01",
+            "0" * 10000,
+        ),
+    )
+    def test_malformed(self, value):
+        with pytest.raises(SpanContextCorruptedException):
+            parse_traceparent(value)
+
+
+class TestW3CCodec(object):
+    def test_extract(self):
+        context = W3CCodec().extract({"Traceparent": traceparent, "TraceState": "congo=t61rcWkgMzE"})
+        assert context.trace_id == trace_id
+        assert context.span_id == span_id
+        assert context.parent_id is None
+        assert context.flags == 1
+        assert context.baggage == {TRACESTATE_BAGGAGE_KEY: "congo=t61rcWkgMzE"}
+
+    def test_extract_without_traceparent(self):
+        assert W3CCodec().extract({"tracestate": "congo=t61rcWkgMzE"}) is None
+
+    def test_invalid_carrier(self):
+        with pytest.raises(InvalidCarrierException):
+            W3CCodec().extract([])
+        with pytest.raises(InvalidCarrierException):
+            W3CCodec().inject(SpanContext(1, 2, None, 1), [])
+
+    def test_inject(self):
+        carrier = {}
+        W3CCodec().inject(SpanContext(trace_id, span_id, None, 1), carrier)
+        assert carrier == {"traceparent": traceparent}
+
+        carrier = {}
+        context = SpanContext(0xA, 0xB, 0xC, 0, baggage={TRACESTATE_BAGGAGE_KEY: "congo=t61rcWkgMzE"})
+        W3CCodec().inject(context, carrier)
+        assert carrier == {
+            "traceparent": "00-0000000000000000000000000000000a-000000000000000b-00",
+            "tracestate": "congo=t61rcWkgMzE",
+        }
+
+    def test_round_trip(self):
+        carrier = {}
+        codec = W3CCodec()
+        codec.inject(SpanContext(trace_id, span_id, None, 1), carrier)
+        context = codec.extract(carrier)
+        assert (context.trace_id, context.span_id, context.flags) == (trace_id, span_id, 1)
+
+
+class TestCompositeCodec(object):
+    @pytest.fixture
+    def codec(self):
+        return CompositeCodec((B3Codec(), W3CCodec()))
+
+    def test_extract_b3(self, codec):
+        context = codec.extract({"X-B3-TraceId": "a", "X-B3-SpanId": "b", "X-B3-Sampled": "1"})
+        assert (context.trace_id, context.span_id, context.flags) == (0xA, 0xB, 1)
+
+    def test_extract_w3c(self, codec):
+        context = codec.extract({"traceparent": traceparent})
+        assert (context.trace_id, context.span_id) == (trace_id, span_id)
+
+    def test_extract_prefers_first_codec(self, codec):
+        context = codec.extract({"X-B3-TraceId": "a", "X-B3-SpanId": "b", "traceparent": traceparent})
+        assert (context.trace_id, context.span_id) == (0xA, 0xB)
+
+    def test_extract_falls_back_from_corrupted(self, codec):
+        context = codec.extract({"X-B3-TraceId": "z", "X-B3-SpanId": "b", "traceparent": traceparent})
+        assert (context.trace_id, context.span_id) == (trace_id, span_id)
+
+    def test_extract_raises_if_all_corrupted(self, codec):
+        with pytest.raises(SpanContextCorruptedException):
+            codec.extract({"X-B3-TraceId": "z", "X-B3-SpanId": "b", "traceparent": "00-z"})
+
+    def test_extract_none(self, codec):
+        assert codec.extract({"Other": "header"}) is None
+
+    def test_inject_all(self, codec):
+        carrier = {}
+        codec.inject(SpanContext(0xA, 0xB, None, 1), carrier)
+        assert carrier == {
+            "X-B3-TraceId": "000000000000000a",
+            "X-B3-SpanId": "000000000000000b",
+            "X-B3-Sampled": "1",
+            "traceparent": "00-0000000000000000000000000000000a-000000000000000b-01",
+        }
+
+
+@pytest.mark.parametrize(
+    "propagation, expected",
+    (
+        ("b3", None),
+        ("", None),
+        (None, None),
+        ("SomePropagation", None),
+        ("w3c", W3CCodec),
+        (" W3C ", W3CCodec),
+        ("w3c,unknown", W3CCodec),
+        ("b3,w3c", CompositeCodec),
+        ("w3c, b3", CompositeCodec),
+    ),
+)
+def test_http_headers_codec(propagation, expected):
+    codec = http_headers_codec(propagation)
+    if expected is None:
+        assert codec is None
+    else:
+        assert type(codec) is expected
+
+
+def test_http_headers_codec_order():
+    assert [type(codec) for codec in http_headers_codec("w3c,b3").codecs] == [W3CCodec, B3Codec]
+
+
+class HeaderLookups(dict):
+    """Request headers recording the names looked up by utils.extract_span_context()"""
+
+    def __init__(self, *args, **kwargs):
+        super(HeaderLookups, self).__init__(*args, **kwargs)
+        self.looked_up = []
+
+    def get_header(self, name):
+        self.looked_up.append(name)
+        return self.get(name)
+
+    def all_headers(self):
+        raise AssertionError("Known headers shouldn't be copied")
+
+
+class TestExtractSpanContext(object):
+    def tracer(self, codec):
+        from jaeger_client import Tracer
+        from jaeger_client.reporter import NullReporter
+        from jaeger_client.sampler import ConstSampler
+
+        return Tracer(
+            "extraction", NullReporter(), ConstSampler(True), extra_codecs={Format.HTTP_HEADERS: codec}
+        )
+
+    def test_propagation_headers(self):
+        assert utils.propagation_headers(self.tracer(B3Codec())) == (
+            ("x-b3-traceid",),
+            ("x-b3-traceid", "x-b3-spanid", "x-b3-parentspanid", "x-b3-sampled", "x-b3-flags"),
+        )
+        assert utils.propagation_headers(self.tracer(W3CCodec())) == (
+            ("traceparent",),
+            ("traceparent", "tracestate"),
+        )
+        assert utils.propagation_headers(self.tracer(http_headers_codec("w3c,b3"))) == (
+            ("traceparent", "x-b3-traceid"),
+            ("traceparent", "tracestate", "x-b3-traceid", "x-b3-spanid", "x-b3-parentspanid",
+             "x-b3-sampled", "x-b3-flags"),
+        )
+        assert utils.propagation_headers(MockTracer()) is None
+
+    def test_propagation_headers_stored_on_codec(self):
+        codec = B3Codec()
+        tracer = self.tracer(codec)
+        headers = utils.propagation_headers(tracer)
+        assert getattr(codec, "_sfx_propagation_headers") is headers
+        assert utils.propagation_headers(tracer) is headers
+
+    def test_unknown_headers_of_jaeger_codec(self):
+        from jaeger_client.codecs import TextCodec
+
+        tracer = self.tracer(TextCodec())
+        assert utils.propagation_headers(tracer) is None
+        assert utils.propagation_headers(self.tracer(CompositeCodec((TextCodec(), W3CCodec())))) is None
+
+        headers = {"uber-trace-id": "a:b:0:1"}
+        context = utils.extract_span_context(tracer, headers.get, lambda: headers)
+        assert (context.trace_id, context.span_id) == (0xA, 0xB)
+
+    def test_missing_headers_fast_path(self):
+        headers = HeaderLookups({"x-b3-spanid": "b", "accept": "*/*"})
+        tracer = self.tracer(http_headers_codec("b3,w3c"))
+        assert utils.extract_span_context(tracer, headers.get_header, headers.all_headers) is None
+        assert headers.looked_up == ["x-b3-traceid", "traceparent"]
+
+    def test_extract_b3(self):
+        headers = HeaderLookups({"x-b3-traceid": "a", "x-b3-spanid": "b", "x-b3-sampled": "1"})
+        context = utils.extract_span_context(self.tracer(B3Codec()), headers.get_header, headers.all_headers)
+        assert (context.trace_id, context.span_id, context.flags) == (0xA, 0xB, 1)
+
+    def test_extract_w3c(self):
+        headers = HeaderLookups({"traceparent": traceparent})
+        tracer = self.tracer(http_headers_codec("b3,w3c"))
+        context = utils.extract_span_context(tracer, headers.get_header, headers.all_headers)
+        assert (context.trace_id, context.span_id) == (trace_id, span_id)
+
+    def test_malformed_context_is_none(self):
+        headers = HeaderLookups({"traceparent": "00-malformed"})
+        tracer = self.tracer(W3CCodec())
+        assert utils.extract_span_context(tracer, headers.get_header, headers.all_headers) is None
@@ -0,0 +1,306 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from collections import Counter
+import gzip
+import io
+import socket
+
+from jaeger_client import Config, Tracer, thrift
+from jaeger_client.reporter import NullReporter
+from jaeger_client.sampler import ConstSampler
+from jaeger_client.senders import HTTPSender, Sender
+from jaeger_client.thrift_gen.agent import Agent
+from jaeger_client.TUDPTransport import TUDPTransport
+from thrift.protocol import TCompactProtocol
+from thrift.transport.TTransport import TMemoryBuffer
+from thrift.TSerialization import serialize
+import mock
+import pytest
+
+from signalfx_tracing import settings
+from signalfx_tracing.reporting import (
+    BatchingReporter,
+    GzipHTTPSender,
+    PacketSender,
+    TUnixDatagramTransport,
+    close_replaced_reporter,
+    create_reporter,
+    reporter_from_settings,
+)
+
+
+class CollectingSender(Sender):
+    def __init__(self, batch_size=10):
+        super(CollectingSender, self).__init__(batch_size=batch_size)
+        self.sent = []
+
+    def send(self, batch):
+        self.sent.extend(span.operationName for span in batch.spans)
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer("reporting", NullReporter(), ConstSampler(True))
+    yield tracer
+    tracer.close()
+
+
+class CountingMetricsFactory(object):
+    def __init__(self):
+        self.counts = Counter()
+
+    def create_counter(self, name, tags=None):
+        key = (name, tuple(sorted((tags or {}).items())))
+
+        def increment(value):
+            self.counts[key] += value
+
+        return increment
+
+    def count(self, name, result):
+        return self.counts[(name, (("result", result),))]
+
+
+def finished_spans(tracer, count, value=""):
+    spans = []
+    for i in range(count):
+        span = tracer.start_span("span{}".format(i), tags=dict(index=i, value=value))
+        span.finish()
+        spans.append(span)
+    return spans
+
+
+def unconsumed(reporter):
+    reporter._consume_queue_thread = object()  # Keeps report_span() from starting a consumer
+    return reporter
+
+
+def test_gzip_sender_posts_compressed_batches(tracer):
+    sender = GzipHTTPSender("http://localhost/v1/trace", auth_token="token")
+    sender.set_process("reporting", {}, 1024)
+    batch = thrift.make_jaeger_batch(spans=finished_spans(tracer, 2), process=sender._process)
+    with mock.patch.object(sender, "_post") as post:
+        sender.send(batch)
+
+    data, headers = post.call_args[0]
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Content-Type"] == "application/x-thrift"
+    assert headers["Authorization"] == "Bearer token"
+    assert headers["Content-Length"] == str(len(data))
+    assert gzip.GzipFile(fileobj=io.BytesIO(data)).read() == serialize(batch)
+
+
+def test_drop_newest_keeps_queued_spans(tracer):
+    reporter = unconsumed(BatchingReporter(CollectingSender(batch_size=1), queue_capacity=2))
+    spans = finished_spans(tracer, 3)
+    for span in spans:
+        reporter.report_span(span)
+    assert list(reporter.queue.queue) == spans[:2]
+
+
+def test_drop_oldest_keeps_finished_spans(tracer):
+    reporter = unconsumed(
+        BatchingReporter(CollectingSender(batch_size=1), backpressure="drop-oldest", queue_capacity=2)
+    )
+    spans = finished_spans(tracer, 3)
+    for span in spans:
+        reporter.report_span(span)
+    assert list(reporter.queue.queue) == spans[1:]
+    assert reporter.queue.unfinished_tasks == 2
+
+
+def test_drop_oldest_keeps_sentinels(tracer):
+    reporter = unconsumed(
+        BatchingReporter(CollectingSender(batch_size=1), backpressure="drop-oldest", queue_capacity=2)
+    )
+    span, newer = finished_spans(tracer, 2)
+    reporter.queue.put(reporter.flusher)
+    reporter.report_span(span)
+    reporter.report_span(newer)
+    assert list(reporter.queue.queue) == [reporter.flusher, newer]
+
+
+def test_first_dropped_span_is_warned_of(tracer):
+    reporter = unconsumed(BatchingReporter(CollectingSender(batch_size=1), queue_capacity=1))
+    with mock.patch("signalfx_tracing.reporting.log") as log:
+        for span in finished_spans(tracer, 3):
+            reporter.report_span(span)
+    assert log.warning.call_count == 1
+
+
+def test_reported_spans_are_sent(tracer):
+    sender = CollectingSender(batch_size=2)
+    reporter = BatchingReporter(sender, backpressure="drop-oldest", queue_capacity=10, flush_interval=None)
+    reporter.set_process("reporting", {}, 1024)
+    for span in finished_spans(tracer, 3):
+        reporter.report_span(span)
+    reporter.close()
+    assert sender.sent == ["span0", "span1", "span2"]
+
+
+def test_create_reporter():
+    config = Config(
+        dict(
+            service_name="reporting",
+            jaeger_endpoint="http://localhost/v1/trace",
+            jaeger_user="auth",
+            jaeger_password="token",
+            reporter_batch_size=5,
+            reporter_queue_size=50,
+            reporter_flush_interval=0.5,
+        )
+    )
+    reporter = create_reporter(config, compression=True, backpressure="drop-oldest")
+    assert type(reporter._sender) is GzipHTTPSender
+    assert reporter._sender.url == "http://localhost/v1/trace"
+    assert reporter._sender.client.auth.password == "token"
+    assert reporter._sender.batch_size == 5
+    assert reporter.queue_capacity == 50
+    assert reporter.flush_interval == 0.5
+    assert reporter.backpressure == "drop-oldest"
+
+    reporter = create_reporter(config, backpressure="drop-all")
+    assert type(reporter._sender) is HTTPSender
+    assert reporter.backpressure == "drop-newest"
+
+
+@pytest.fixture
+def udp_listener():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.settimeout(5)
+    yield listener
+    listener.close()
+
+
+def received_batches(listener, span_count, max_packet_size=65535):
+    """Receives emitBatch packets until span_count spans arrive, returning the batch of each"""
+    batches = []
+    while sum(len(batch.spans) for batch in batches) < span_count:
+        packet = listener.recv(65535)
+        assert len(packet) <= max_packet_size
+        protocol = TCompactProtocol.TCompactProtocol(TMemoryBuffer(packet))
+        name, _, _ = protocol.readMessageBegin()
+        assert name == "emitBatch"
+        args = Agent.emitBatch_args()
+        args.read(protocol)
+        batches.append(args.batch)
+    return batches
+
+
+@pytest.mark.parametrize("max_packet_size", (512, 1500, 65000))
+def test_packet_sender_packs_batches_into_packets(tracer, udp_listener, max_packet_size):
+    metrics = CountingMetricsFactory()
+    host, port = udp_listener.getsockname()
+    sender = PacketSender(
+        TUDPTransport(host, port), batch_size=100, max_packet_size=max_packet_size, metrics_factory=metrics
+    )
+    sender.set_process("reporting", {}, 1024)
+    spans = finished_spans(tracer, 100, value="v" * 50)
+    for span in spans:
+        sender.append(span)
+
+    batches = received_batches(udp_listener, 100, max_packet_size)
+    assert [span.operationName for batch in batches for span in batch.spans] == [
+        span.operation_name for span in spans
+    ]
+    assert all(batch.process.serviceName == "reporting" for batch in batches)
+    if max_packet_size < 65000:
+        assert len(batches) > 1
+    assert metrics.count("sfx:export_packets", "sent") == len(batches)
+    assert metrics.count("sfx:export_spans", "sent") == 100
+    assert metrics.count("sfx:export_spans", "dropped") == 0
+
+
+def test_packet_sender_drops_spans_exceeding_a_packet(tracer, udp_listener):
+    metrics = CountingMetricsFactory()
+    sender = PacketSender(
+        TUDPTransport(*udp_listener.getsockname()), max_packet_size=512, metrics_factory=metrics
+    )
+    sender.set_process("reporting", {}, 1024)
+    small, = finished_spans(tracer, 1)
+    large, = finished_spans(tracer, 1, value="v" * 1000)
+    with mock.patch("signalfx_tracing.reporting.log") as log:
+        assert sender._batch_and_send([large, small, large], sender._process) == 3
+
+    batches = received_batches(udp_listener, 1)
+    assert [len(batch.spans) for batch in batches] == [1]
+    assert metrics.count("sfx:export_spans", "dropped") == 2
+    assert log.warning.call_count == 1
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires unix sockets")
+def test_packet_sender_over_unix_socket(tracer, tmpdir):
+    path = str(tmpdir.join("agent.sock"))
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    listener.bind(path)
+    listener.settimeout(5)
+    try:
+        sender = PacketSender(TUnixDatagramTransport(path), batch_size=3)
+        sender.set_process("reporting", {}, 1024)
+        for span in finished_spans(tracer, 3):
+            sender.append(span)
+        batches = received_batches(listener, 3)
+        assert [span.operationName for span in batches[0].spans] == ["span0", "span1", "span2"]
+    finally:
+        listener.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires unix sockets")
+def test_packet_sender_counts_failed_packets(tracer, tmpdir):
+    metrics = CountingMetricsFactory()
+    sender = PacketSender(
+        TUnixDatagramTransport(str(tmpdir.join("missing.sock"))), batch_size=3, metrics_factory=metrics
+    )
+    sender.set_process("reporting", {}, 1024)
+    for span in finished_spans(tracer, 2):
+        assert sender.append(span) == 0
+    assert sender.append(finished_spans(tracer, 1)[0]) == 3
+    assert metrics.count("sfx:export_packets", "failed") == 1
+    assert metrics.count("sfx:export_spans", "dropped") == 3
+
+
+def jaeger_config():
+    return Config(dict(service_name="reporting", jaeger_endpoint="http://localhost/v1/trace"))
+
+
+def test_reporter_from_settings_defaults_to_jaegers():
+    assert reporter_from_settings(jaeger_config(), settings.Settings({})) is None
+
+
+def test_reporter_from_settings_by_transport(tmpdir):
+    env = settings.Settings(
+        dict(
+            SIGNALFX_EXPORT_TRANSPORT="UDP",
+            SIGNALFX_EXPORT_MAX_PACKET_SIZE="1500",
+            SIGNALFX_AGENT_HOST="127.0.0.1",
+            SIGNALFX_AGENT_PORT="6832",
+        )
+    )
+    reporter = reporter_from_settings(jaeger_config(), env)
+    assert isinstance(reporter, BatchingReporter)
+    assert isinstance(reporter._sender, PacketSender)
+    assert reporter._sender.max_packet_size == 1500
+    transport = reporter._sender.transport
+    assert (transport.transport_host, transport.transport_port) == ("127.0.0.1", 6832)
+
+    if hasattr(socket, "AF_UNIX"):
+        path = str(tmpdir.join("agent.sock"))
+        env = settings.Settings(dict(SIGNALFX_EXPORT_TRANSPORT="unix", SIGNALFX_AGENT_SOCKET=path))
+        reporter = reporter_from_settings(jaeger_config(), env)
+        assert reporter._sender.transport.transport_path == path
+
+
+@pytest.mark.parametrize("transport", ("carrier-pigeon", "unix"))
+def test_reporter_from_settings_falls_back_to_http(transport):
+    env = settings.Settings(dict(SIGNALFX_EXPORT_TRANSPORT=transport))
+    with mock.patch("signalfx_tracing.reporting.log") as log:
+        assert reporter_from_settings(jaeger_config(), env) is None
+    assert log.warning.call_count == 1
+
+
+def test_close_replaced_reporter():
+    reporter = jaeger_config().new_tracer().reporter
+    with mock.patch.object(reporter._sender.client, "close") as close:
+        close_replaced_reporter(reporter)
+    assert close.call_count == 1
+    assert reporter.stopped
@@ -0,0 +1,95 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from opentracing.ext import tags
+import pytest
+
+from signalfx_tracing import sampling_rules, settings
+from signalfx_tracing.sampling_rules import SamplingRules, parse_rules
+
+
+@pytest.fixture
+def configured_rules():
+    settings.reload(dict(SIGNALFX_SAMPLING_RULES="path:^/health$=drop;operation:^Admin=0.5"))
+    yield
+    settings.reload()
+
+
+def test_parse_rules():
+    rules = parse_rules("path:^/health$=drop; operation:^Admin=0.5;PATH:(?=/x)/x=1")
+    assert [(kind, pattern.pattern, rate) for kind, pattern, rate in rules] == [
+        ("path", "^/health$", 0.0),
+        ("operation", "^Admin", 0.5),
+        ("path", "(?=/x)/x", 1.0),
+    ]
+
+
+@pytest.mark.parametrize(
+    "rule", ("", "path:^/health$", "url:^/health$=drop", "path:[=drop", "path:/=1.5", "path:/=-1", "path:/=often")
+)
+def test_parse_rules_ignores_invalid(rule):
+    assert parse_rules(rule) == []
+
+
+def test_first_matching_rule_rate():
+    rules = SamplingRules(parse_rules("path:^/health=drop;operation:^Admin=0.5;path:^/=1"))
+    assert rules.rate("health", "/health") == 0.0
+    assert rules.rate("AdminHandler", "/admin") == 0.5
+    assert rules.rate("UserHandler", "/users") == 1.0
+    assert SamplingRules(parse_rules("path:^/health=drop")).rate("UserHandler", "/users") is None
+    assert SamplingRules(parse_rules("operation:^Admin=0")).rate(None, "/admin") is None
+
+
+def test_rates_are_cached(monkeypatch):
+    monkeypatch.setattr(sampling_rules, "_decision_cache_size", 2)
+    rules = SamplingRules(parse_rules("path:^/health=drop"))
+    rules.rate("a", "/health")
+    rules.rate("b", "/users")
+    rules.rate("c", "/users")
+    assert list(rules._rates) == [("b", "/users"), ("c", "/users")]
+
+    rules.rules = ()  # Cached rates are still used
+    assert rules.rate("b", "/users") is None
+    assert rules.rate("c", "/users") is None
+
+
+def test_drops():
+    values = iter((0.1, 0.7))
+    rules = parse_rules("path:^/health=drop;path:^/sampled=0.5;path:^/kept=1")
+    rules = SamplingRules(rules, random=lambda: next(values))
+    assert rules.drops("op", "/health") is True
+    assert rules.drops("op", "/kept") is False
+    assert rules.drops("op", "/other") is False
+    assert rules.drops("op", "/sampled") is False
+    assert rules.drops("op", "/sampled") is True
+
+
+def test_start_tags(configured_rules):
+    assert sampling_rules.start_tags(None, "health", "/health") == {tags.SAMPLING_PRIORITY: 0}
+    assert sampling_rules.start_tags(None, "UserHandler", "/users") is None
+    assert sampling_rules.start_tags(object(), "health", "/health") is None
+
+
+def test_start_tags_without_rules():
+    settings.reload({})
+    try:
+        assert sampling_rules.get() is None
+        assert sampling_rules.start_tags(None, "health", "/health") is None
+    finally:
+        settings.reload()
+
+
+def test_dropped_jaeger_span_is_unsampled(configured_rules):
+    pytest.importorskip("jaeger_client")
+    from jaeger_client import Tracer
+    from jaeger_client.reporter import InMemoryReporter
+    from jaeger_client.sampler import ConstSampler
+
+    reporter = InMemoryReporter()
+    tracer = Tracer("rules", reporter, ConstSampler(True))
+    with tracer.start_active_span("health", tags=sampling_rules.start_tags(None, "health", "/health")) as scope:
+        assert not scope.span.is_sampled()
+        with tracer.start_active_span("child") as child:
+            assert not child.span.is_sampled()
+    with tracer.start_active_span("users", tags=sampling_rules.start_tags(None, "users", "/users")) as scope:
+        assert scope.span.is_sampled()
+    assert [span.operation_name for span in reporter.get_spans()] == ["users"]
+    tracer.close()
@@ -0,0 +1,129 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+import sys
+
+from opentracing.scope_managers import ThreadLocalScopeManager
+from opentracing.mocktracer import MockTracer
+import mock
+import pytest
+
+from signalfx_tracing import scope_managers, settings
+
+
+contextvars_only = pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="contextvars requires Python 3.7+"
+)
+
+
+@pytest.fixture
+def scope_manager_setting():
+    def configure(value):
+        settings.reload(dict(SIGNALFX_SCOPE_MANAGER=value))
+
+    yield configure
+    settings.reload()
+
+
+@pytest.fixture(autouse=True)
+def promoted():
+    with mock.patch.object(scope_managers, "_promoted", [None]) as promoted:
+        yield promoted
+
+
+class ReplaceableTracer(MockTracer):
+    """Records the scope manager a TracerProxy would have replaced its tracer with"""
+
+    def __init__(self, scope_manager=None):
+        super(ReplaceableTracer, self).__init__(scope_manager)
+        self.replacement_scope_manager = None
+
+    def set_scope_manager(self, scope_manager):
+        self.replacement_scope_manager = scope_manager
+        return True
+
+
+def test_thread_local_scope_manager_class():
+    assert (
+        scope_managers.scope_manager_class(scope_managers.THREAD_LOCAL)
+        is ThreadLocalScopeManager
+    )
+
+
+@contextvars_only
+@pytest.mark.parametrize("name", (scope_managers.CONTEXTVARS, scope_managers.ASYNCIO))
+def test_contextvars_scope_manager_class(name):
+    from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+
+    assert scope_managers.scope_manager_class(name) is ContextVarsScopeManager
+
+
+def test_unknown_scope_manager_class():
+    with pytest.raises(ValueError):
+        scope_managers.scope_manager_class("not_a_scope_manager")
+
+
+def test_auto_default_is_thread_local(scope_manager_setting):
+    scope_manager_setting("auto")
+    assert scope_managers.default_scope_manager() is ThreadLocalScopeManager
+
+
+@contextvars_only
+@pytest.mark.parametrize("value", ("contextvars", " ContextVars "))
+def test_configured_default(scope_manager_setting, value):
+    from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+
+    scope_manager_setting(value)
+    assert scope_managers.default_scope_manager() is ContextVarsScopeManager
+
+
+def test_invalid_default_falls_back_to_auto(scope_manager_setting):
+    scope_manager_setting("not_a_scope_manager")
+    assert scope_managers.default_scope_manager() is ThreadLocalScopeManager
+
+
+@contextvars_only
+def test_promote_replaces_thread_local_scope_manager(scope_manager_setting):
+    from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+
+    scope_manager_setting("auto")
+    tracer = ReplaceableTracer()
+    scope_managers.promote(tracer, scope_managers.CONTEXTVARS)
+    assert tracer.replacement_scope_manager is ContextVarsScopeManager
+    assert scope_managers.default_scope_manager() is ContextVarsScopeManager
+
+
+@contextvars_only
+def test_promote_leaves_other_tracers_unchanged(scope_manager_setting):
+    from opentracing.scope_managers.contextvars import ContextVarsScopeManager
+
+    scope_manager_setting("auto")
+    tracer = MockTracer()
+    scope_managers.promote(tracer, scope_managers.CONTEXTVARS)
+    assert type(tracer.scope_manager) is ThreadLocalScopeManager
+    assert scope_managers.default_scope_manager() is ContextVarsScopeManager  # For tracers created later
+
+
+@pytest.mark.parametrize("value", ("thread-local", "contextvars"))
+def test_promote_respects_configured_scope_manager(scope_manager_setting, promoted, value):
+    scope_manager_setting(value)
+    tracer = ReplaceableTracer()
+    scope_managers.promote(tracer, scope_managers.CONTEXTVARS)
+    assert tracer.replacement_scope_manager is None
+    assert promoted == [None]
+
+
+def test_promote_ignores_tracer_with_active_scope(scope_manager_setting):
+    scope_manager_setting("auto")
+    tracer = ReplaceableTracer()
+    with tracer.start_active_span("active"):
+        scope_managers.promote(tracer, scope_managers.CONTEXTVARS)
+    assert tracer.replacement_scope_manager is None
+
+
+def test_promote_ignores_other_scope_managers(scope_manager_setting):
+    class CustomScopeManager(ThreadLocalScopeManager):
+        pass
+
+    scope_manager_setting("auto")
+    tracer = ReplaceableTracer(CustomScopeManager())
+    scope_managers.promote(tracer, scope_managers.CONTEXTVARS)
+    assert tracer.replacement_scope_manager is None
@@ -0,0 +1,149 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+import os
+
+import pytest
+
+from signalfx_tracing import constants, settings
+
+
+def test_defaults():
+    s = settings.Settings({})
+    assert s.tracing_enabled is True
+    assert s.lazy_instrumentation is False
+    assert all(s.library_enabled(lib) for lib in constants.traceable_libraries)
+    assert s.service_name == "SignalFx-Tracing"
+    assert s.endpoint_url == "http://localhost:9080/v1/trace"
+    assert s.access_token is None
+    assert s.sampler_type == "const"
+    assert s.sampler_param == "1"
+    assert s.propagation == "b3"
+    assert s.sampling_rules == ""
+    assert s.reporter_max_batch == 10
+    assert s.reporter_flush_interval == 1.0
+    assert s.reporter_queue_size == 100
+    assert s.reporter_compression is False
+    assert s.reporter_backpressure == "drop-newest"
+    assert s.export_transport == "http"
+    assert s.export_max_packet_size == 65000
+    assert s.agent_host == "localhost"
+    assert s.agent_port == 6831
+    assert s.agent_socket == ""
+    assert s.tail_sampling is False
+    assert s.tail_sampling_latency_ms == 1000
+    assert s.tail_sampling_probability == 0.1
+    assert s.tail_sampling_max_traces == 1000
+    assert s.tail_sampling_max_spans == 10000
+    assert s.metrics_enabled is False
+    assert s.metrics_log_interval == 0.0
+    assert s.shutdown_timeout == 5.0
+    assert s.shutdown_on_sigterm is False
+    assert s.tracing_debug is False
+    assert s.environment == ""
+    assert s.recorded_value_max_length == constants.default_max_tag_value_length
+    assert s.trace_response_header_enabled is True
+    assert s.url_normalization is False
+    assert s.url_normalization_rules == ""
+    assert s.url_normalization_cache_size == 1024
+    assert s.logs_injection is False
+    assert s.logs_injection_lazy is False
+    assert s.logging_format == constants.logging_format
+
+
+def test_values_are_parsed():
+    s = settings.Settings(
+        dict(
+            SIGNALFX_TRACING_ENABLED="False",
+            SIGNALFX_REDIS_ENABLED="0",
+            SIGNALFX_INGEST_URL="http://ingest",
+            SIGNALFX_TRACING_DEBUG="false",
+            SIGNALFX_RECORDED_VALUE_MAX_LENGTH="10",
+            SPLUNK_TRACE_RESPONSE_HEADER_ENABLED="no",
+            SIGNALFX_LOGS_INJECTION="true",
+            SIGNALFX_LOGS_INJECTION_LAZY="true",
+            SIGNALFX_URL_NORMALIZATION="1",
+            SIGNALFX_URL_NORMALIZATION_CACHE_SIZE="64",
+            SIGNALFX_REPORTER_FLUSH_INTERVAL="0.25",
+            SIGNALFX_REPORTER_COMPRESSION="true",
+            SIGNALFX_TAIL_SAMPLING="true",
+            SIGNALFX_TAIL_SAMPLING_PROBABILITY="0.25",
+            SIGNALFX_METRICS_ENABLED="true",
+            SIGNALFX_METRICS_LOG_INTERVAL="60",
+            SIGNALFX_SHUTDOWN_TIMEOUT="2.5",
+            SIGNALFX_SHUTDOWN_ON_SIGTERM="yes",
+        )
+    )
+    assert s.tracing_enabled is False
+    assert s.library_enabled("redis") is False
+    assert s.library_enabled("flask") is True
+    assert s.library_enabled("not_a_traceable_library") is True
+    assert s.endpoint_url == "http://ingest"
+    assert s.tracing_debug is False
+    assert s.recorded_value_max_length == 10
+    assert s.trace_response_header_enabled is False
+    assert s.logs_injection is True
+    assert s.logs_injection_lazy is True
+    assert s.url_normalization is True
+    assert s.url_normalization_cache_size == 64
+    assert s.reporter_flush_interval == 0.25
+    assert s.reporter_compression is True
+    assert s.tail_sampling is True
+    assert s.tail_sampling_probability == 0.25
+    assert s.metrics_enabled is True
+    assert s.metrics_log_interval == 60.0
+    assert s.shutdown_timeout == 2.5
+    assert s.shutdown_on_sigterm is True
+
+
+def test_endpoint_url_precedes_ingest_url():
+    s = settings.Settings(
+        dict(SIGNALFX_ENDPOINT_URL="http://endpoint", SIGNALFX_INGEST_URL="http://ingest")
+    )
+    assert s.endpoint_url == "http://endpoint"
+
+
+def test_invalid_integer_uses_default():
+    s = settings.Settings(dict(SIGNALFX_RECORDED_VALUE_MAX_LENGTH="many"))
+    assert s.recorded_value_max_length == constants.default_max_tag_value_length
+
+
+def test_invalid_number_uses_default():
+    s = settings.Settings(dict(SIGNALFX_TAIL_SAMPLING_PROBABILITY="some"))
+    assert s.tail_sampling_probability == 0.1
+
+
+def test_settings_are_immutable():
+    s = settings.Settings({})
+    with pytest.raises(AttributeError):
+        s.tracing_enabled = False
+    with pytest.raises(AttributeError):
+        del s.tracing_enabled
+    with pytest.raises(AttributeError):
+        s.unknown = True
+
+
+def test_access_token_is_not_in_repr():
+    assert "secret" not in repr(settings.Settings(dict(SIGNALFX_ACCESS_TOKEN="secret")))
+
+
+def test_get_is_cached_until_reload():
+    current = settings.get()
+    assert settings.get() is current
+
+    os.environ["SIGNALFX_SERVICE_NAME"] = "ReloadedService"
+    try:
+        assert settings.get().service_name == current.service_name
+        reloaded = settings.reload()
+        assert reloaded is not current
+        assert settings.get() is reloaded
+        assert reloaded.service_name == "ReloadedService"
+    finally:
+        os.environ.pop("SIGNALFX_SERVICE_NAME")
+        settings.reload()
+
+
+def test_reload_accepts_mapping():
+    try:
+        assert settings.reload(dict(SIGNALFX_ENV="staging")).environment == "staging"
+        assert settings.get().environment == "staging"
+    finally:
+        settings.reload()
@@ -0,0 +1,230 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from threading import Event
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+from jaeger_client import Tracer
+from jaeger_client.reporter import InMemoryReporter, Reporter
+from jaeger_client.sampler import ConstSampler
+from jaeger_client.senders import Sender
+import mock
+import pytest
+
+from signalfx_tracing import settings, shutdown
+from signalfx_tracing.reporting import PacketSender, TUnixDatagramTransport
+from signalfx_tracing.tail_sampling import TailSamplingReporter
+
+
+class BlockingSender(Sender):
+    """Sends each span once released"""
+
+    def __init__(self):
+        super(BlockingSender, self).__init__(batch_size=1)
+        self.released = Event()
+        self.sent = 0
+
+    def send(self, batch):
+        self.released.wait(5)
+        self.sent += len(batch.spans)
+
+
+def tracer_for(sender, queue_capacity=100):
+    reporter = Reporter(sender, queue_capacity=queue_capacity, flush_interval=None)
+    return Tracer("shutdown", reporter, ConstSampler(True))
+
+
+def finish_spans(tracer, count):
+    for i in range(count):
+        tracer.start_span("span{}".format(i)).finish()
+
+
+@pytest.fixture(autouse=True)
+def registered_tracers():
+    with mock.patch.object(shutdown, "_tracers", []) as tracers:
+        with mock.patch.object(shutdown, "_exit_handler_registered", [True]):
+            yield tracers
+
+
+def test_pending_spans():
+    sender = BlockingSender()
+    tracer = tracer_for(sender)
+    finish_spans(tracer, 3)
+    assert shutdown.pending_spans(tracer.reporter) == 3  # One is being sent, and two are queued
+    assert shutdown.pending_spans(TailSamplingReporter(tracer.reporter)) == 3
+    assert shutdown.pending_spans(InMemoryReporter()) == 0
+    sender.released.set()
+    tracer.close()
+    assert shutdown.pending_spans(tracer.reporter) == 0
+
+
+class FailingSender(Sender):
+    def send(self, batch):
+        raise IOError("refused")
+
+
+def test_close_tracer_counts_sent_spans():
+    sender = BlockingSender()
+    sender.released.set()
+    tracer = tracer_for(sender)
+    finish_spans(tracer, 3)
+    tracer.reporter.flush()
+    finish_spans(tracer, 2)
+    assert shutdown.close_tracer(tracer, 5) == (2, 0, 0)
+    assert sender.sent == 5
+
+
+def test_close_tracer_counts_failed_spans():
+    tracer = tracer_for(FailingSender(batch_size=2))
+    finish_spans(tracer, 5)
+    assert shutdown.close_tracer(tracer, 5) == (0, 5, 0)
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires unix sockets")
+def test_close_tracer_counts_spans_dropped_by_packet_senders(tmpdir):
+    transport = TUnixDatagramTransport(str(tmpdir.join("missing.sock")))
+    tracer = tracer_for(PacketSender(transport, batch_size=2))
+    finish_spans(tracer, 3)
+    assert shutdown.close_tracer(tracer, 5) == (0, 3, 0)
+
+
+def test_close_tracer_abandons_spans_at_the_deadline():
+    sender = BlockingSender()
+    tracer = tracer_for(sender)
+    finish_spans(tracer, 3)
+    start = time.time()
+    assert shutdown.close_tracer(tracer, 0.1) == (0, 0, 3)
+    assert time.time() - start < 1
+    sender.released.set()
+
+
+def test_counting_stops_with_the_results():
+    tracer = tracer_for(FailingSender(batch_size=1))
+    success = tracer.reporter.metrics.reporter_success
+    finish_spans(tracer, 1)
+    assert shutdown.flush_tracer(tracer, 5) == (0, 1, 0)
+    assert tracer.reporter.metrics.reporter_success is success
+
+
+def test_flush_tracer_without_a_consumer_returns():
+    tracer = tracer_for(BlockingSender())
+    assert shutdown.flush_tracer(tracer, 5) == (0, 0, 0)
+
+
+def test_flush_tracer_leaves_it_open():
+    sender = BlockingSender()
+    sender.released.set()
+    tracer = tracer_for(sender)
+    finish_spans(tracer, 2)
+    assert shutdown.flush_tracer(tracer, 5) == (2, 0, 0)
+    finish_spans(tracer, 1)
+    assert shutdown.close_tracer(tracer, 5) == (1, 0, 0)
+    assert shutdown.flush_tracer(mock.Mock(reporter=InMemoryReporter()), 5) == (0, 0, 0)
+
+
+def test_shutdown_closes_registered_tracers_once(registered_tracers):
+    tracers = [mock.Mock(reporter=InMemoryReporter()) for _ in range(2)]
+    env = settings.Settings({})
+    for tracer in tracers:
+        shutdown.register(tracer, env)
+    assert registered_tracers == tracers
+    shutdown.shutdown(timeout=1)
+    shutdown.shutdown(timeout=1)
+    assert [tracer.close.call_count for tracer in tracers] == [1, 1]
+
+
+def test_close_unregisters_the_tracer(registered_tracers):
+    sender = BlockingSender()
+    sender.released.set()
+    tracers = [tracer_for(sender) for _ in range(2)]
+    env = settings.Settings({})
+    for tracer in tracers:
+        shutdown.register(tracer, env)
+    finish_spans(tracers[0], 2)
+    assert shutdown.close(tracers[0], timeout=5) == (2, 0, 0)
+    assert registered_tracers == tracers[1:]
+
+
+def test_shutdown_shares_its_deadline():
+    senders = [BlockingSender() for _ in range(2)]
+    env = settings.Settings({})
+    for sender in senders:
+        tracer = tracer_for(sender)
+        finish_spans(tracer, 2)
+        shutdown.register(tracer, env)
+    start = time.time()
+    with mock.patch("signalfx_tracing.shutdown.log") as log:
+        assert shutdown.shutdown(timeout=0.2) == (0, 0, 4)
+    assert time.time() - start < 1
+    assert log.warning.call_count == 1
+    for sender in senders:
+        sender.released.set()
+
+
+@pytest.fixture
+def sigterm_handler():
+    original = signal.getsignal(signal.SIGTERM)
+    with mock.patch.object(shutdown, "_previous_sigterm_handler", [None]):
+        yield
+    signal.signal(signal.SIGTERM, original)
+
+
+def test_sigterm_handler_flushes_and_chains_to_the_previous_handler(sigterm_handler):
+    previous = mock.Mock()
+    signal.signal(signal.SIGTERM, previous)
+    assert shutdown.install_sigterm_handler()
+    assert shutdown.install_sigterm_handler()
+    assert signal.getsignal(signal.SIGTERM) is shutdown._handle_sigterm
+    with mock.patch("signalfx_tracing.shutdown.flush") as flush:
+        with mock.patch("signalfx_tracing.shutdown.shutdown") as close:
+            shutdown._handle_sigterm(signal.SIGTERM, None)
+    assert flush.call_count == 1
+    assert close.call_count == 0
+    previous.assert_called_once_with(signal.SIGTERM, None)
+
+
+def test_ignored_sigterm_isnt_handled(sigterm_handler):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    assert not shutdown.install_sigterm_handler()
+    assert signal.getsignal(signal.SIGTERM) == signal.SIG_IGN
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="requires posix signals")
+def test_sigterm_flushes_spans_before_terminating(tmpdir):
+    script = textwrap.dedent(
+        """
+        import sys, time
+        from jaeger_client import Tracer
+        from jaeger_client.reporter import Reporter
+        from jaeger_client.sampler import ConstSampler
+        from jaeger_client.senders import Sender
+        from signalfx_tracing import settings, shutdown
+
+        class PrintingSender(Sender):
+            def send(self, batch):
+                sys.stdout.write("sent {}\\n".format(len(batch.spans)))
+                sys.stdout.flush()
+
+        tracer = Tracer("shutdown", Reporter(PrintingSender(batch_size=10), flush_interval=None), ConstSampler(True))
+        shutdown.register(tracer, settings.Settings(dict(SIGNALFX_SHUTDOWN_ON_SIGTERM="true")))
+        for _ in range(3):
+            tracer.start_span("span").finish()
+        sys.stdout.write("ready\\n")
+        sys.stdout.flush()
+        time.sleep(10)
+        """
+    )
+    process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        assert process.stdout.readline() == "ready\n"
+        os.kill(process.pid, signal.SIGTERM)
+        assert process.stdout.readline() == "sent 3\n"
+        assert process.wait(5) == -signal.SIGTERM
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
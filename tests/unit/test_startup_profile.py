@@ -0,0 +1,91 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+import types
+import json
+import sys
+import os
+
+import pytest
+
+from signalfx_tracing import settings, startup_profile, instrument
+
+
+profile_env_var = "SIGNALFX_STARTUP_PROFILE"
+
+
+@pytest.fixture
+def profiling():
+    os.environ[profile_env_var] = "true"
+    settings.reload()
+    startup_profile.reset()
+    try:
+        yield
+    finally:
+        os.environ.pop(profile_env_var)
+        settings.reload()
+        startup_profile.reset()
+
+
+def test_disabled_phases_are_not_recorded():
+    startup_profile.reset()
+    with startup_profile.phase("unprofiled"):
+        pass
+    assert startup_profile.report()["phases"] == []
+
+
+def test_phases_record_nesting_and_imports(profiling):
+    with startup_profile.phase("outer"):
+        with startup_profile.phase("inner"):
+            sys.modules["profiled_module_12345"] = types.ModuleType(
+                "profiled_module_12345"
+            )
+        with startup_profile.phase("empty"):
+            pass
+    del sys.modules["profiled_module_12345"]
+
+    report = startup_profile.report()
+    assert [(p["name"], p["depth"]) for p in report["phases"]] == [
+        ("outer", 0),
+        ("inner", 1),
+        ("empty", 1),
+    ]
+    outer, inner, empty = report["phases"]
+    assert outer["duration_ms"] >= inner["duration_ms"] + empty["duration_ms"]
+    assert inner["imported_modules"] == 1
+    assert empty["imported_modules"] == 0
+    assert report["total_ms"] == outer["duration_ms"]
+    assert report["imported_modules"] == outer["imported_modules"] == 1
+
+
+def test_phase_is_recorded_on_exception(profiling):
+    with pytest.raises(ValueError):
+        with startup_profile.phase("failing"):
+            raise ValueError()
+    assert [p["name"] for p in startup_profile.report()["phases"]] == ["failing"]
+
+
+def test_instrument_records_library_phase(profiling):
+    instrument(logging=True)
+    try:
+        assert [p["name"] for p in startup_profile.report()["phases"]] == [
+            "instrument logging"
+        ]
+    finally:
+        instrument(logging=False)
+
+
+def test_dump_writes_json_report(profiling, tmpdir):
+    with startup_profile.phase("dumped"):
+        pass
+    path = str(tmpdir.join("profile.json"))
+    startup_profile.dump(path)
+    with open(path) as f:
+        assert json.load(f) == startup_profile.report()
+
+
+def test_dump_writes_to_stderr_without_path(profiling, capsys):
+    with startup_profile.phase("dumped"):
+        pass
+    startup_profile.dump()
+    prefix, _, profile = capsys.readouterr().err.partition(": ")
+    assert prefix == "Startup profile"
+    assert json.loads(profile) == startup_profile.report()
@@ -0,0 +1,187 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+from collections import Counter
+
+from jaeger_client import Tracer
+from jaeger_client.reporter import InMemoryReporter
+from jaeger_client.sampler import ConstSampler
+from opentracing.ext import tags
+import pytest
+
+from signalfx_tracing import settings
+from signalfx_tracing.tags import SFX_TRACING_LIBRARY
+from signalfx_tracing.tail_sampling import TailSamplingReporter
+
+
+class CountingMetricsFactory(object):
+    def __init__(self):
+        self.counts = Counter()
+
+    def create_counter(self, name, tags=None):
+        key = (name, tuple(sorted((tags or {}).items())))
+
+        def increment(value):
+            self.counts[key] += value
+
+        return increment
+
+    def count(self, name, result):
+        return self.counts[(name, (("result", result),))]
+
+
+@pytest.fixture
+def metrics():
+    return CountingMetricsFactory()
+
+
+@pytest.fixture
+def reporter():
+    return InMemoryReporter()
+
+
+def tracer_for(reporter, metrics, **kwargs):
+    kwargs.setdefault("random", lambda: 1.0)  # Never kept by probability
+    kwargs.setdefault("metrics_factory", metrics)
+    tail = TailSamplingReporter(reporter, **kwargs)
+    return Tracer("tail", tail, ConstSampler(True), root_span_tags={SFX_TRACING_LIBRARY: "python-tracing"})
+
+
+def finish_trace(tracer, error=False, root_duration=0.0, children=2):
+    root = tracer.start_span("root", start_time=100.0)
+    for i in range(children):
+        child = tracer.start_span("child", child_of=root)
+        if error and i == children - 1:
+            child.set_tag(tags.ERROR, True)
+        child.finish()
+    root.finish(finish_time=100.0 + root_duration)
+    return root
+
+
+def test_traces_with_errors_are_kept(reporter, metrics):
+    tracer = tracer_for(reporter, metrics)
+    root = finish_trace(tracer, error=True)
+    assert [span.operation_name for span in reporter.get_spans()] == ["child", "child", "root"]
+    assert all(span.context.trace_id == root.context.trace_id for span in reporter.get_spans())
+    assert metrics.count("sfx:tail_sampling_traces", "kept") == 1
+
+
+def test_string_error_tags_are_errors(reporter, metrics):
+    tracer = tracer_for(reporter, metrics)
+    root = tracer.start_span("root")
+    root.set_tag(tags.ERROR, "true")
+    root.finish()
+    assert reporter.get_spans() == [root]
+
+
+def test_slow_traces_are_kept(reporter, metrics):
+    tracer = tracer_for(reporter, metrics, latency_threshold=0.5)
+    finish_trace(tracer, root_duration=0.5)
+    assert len(reporter.get_spans()) == 3
+
+
+def test_other_traces_are_dropped(reporter, metrics):
+    tracer = tracer_for(reporter, metrics, latency_threshold=0.5)
+    finish_trace(tracer, root_duration=0.25)
+    assert reporter.get_spans() == []
+    assert metrics.count("sfx:tail_sampling_traces", "dropped") == 1
+    assert tracer.reporter._traces == {}
+    assert tracer.reporter._span_count == 0
+
+
+def test_other_traces_are_kept_by_probability(reporter, metrics):
+    values = iter((0.05, 0.5))
+    tracer = tracer_for(reporter, metrics, probability=0.1, random=lambda: next(values))
+    kept = finish_trace(tracer)
+    finish_trace(tracer)
+    assert {span.context.trace_id for span in reporter.get_spans()} == {kept.context.trace_id}
+
+
+def test_spans_finishing_after_the_decision_follow_it(reporter, metrics):
+    tracer = tracer_for(reporter, metrics)
+    for error in (True, False):
+        root = tracer.start_span("root")
+        late = tracer.start_span("late", child_of=root)
+        root.set_tag(tags.ERROR, error)
+        root.finish()
+        late.finish()
+    assert [span.operation_name for span in reporter.get_spans()] == ["root", "late"]
+
+
+def test_propagated_parents_make_local_roots(reporter, metrics):
+    tracer = tracer_for(reporter, metrics)
+    upstream = tracer.start_span("upstream")
+    local_root = tracer.start_span("local", child_of=upstream.context)
+    assert local_root.context.parent_id is not None
+    local_root.set_tag(tags.ERROR, True)
+    local_root.finish()
+    assert reporter.get_spans() == [local_root]
+
+
+def test_oldest_traces_are_evicted_beyond_max_traces(reporter, metrics):
+    tracer = tracer_for(reporter, metrics, max_traces=2)
+    roots = [tracer.start_span("root") for _ in range(3)]
+    for root in roots:
+        tracer.start_span("child", child_of=root).finish()
+    assert list(tracer.reporter._traces) == [root.context.trace_id for root in roots[1:]]
+    assert metrics.count("sfx:tail_sampling_traces", "evicted") == 1
+    assert metrics.count("sfx:tail_sampling_spans", "evicted") == 1
+
+
+def test_oldest_traces_are_evicted_beyond_max_spans(reporter, metrics):
+    tracer = tracer_for(reporter, metrics, max_spans=3)
+    first, second = tracer.start_span("first"), tracer.start_span("second")
+    for _ in range(2):
+        tracer.start_span("child", child_of=first).finish()
+    for _ in range(2):
+        tracer.start_span("child", child_of=second).finish()
+    assert list(tracer.reporter._traces) == [second.context.trace_id]
+    assert tracer.reporter._span_count == 2
+    assert metrics.count("sfx:tail_sampling_spans", "evicted") == 2
+
+
+def test_oversized_trace_is_not_evicted(reporter, metrics):
+    tracer = tracer_for(reporter, metrics, max_spans=2)
+    root = finish_trace(tracer, error=True, children=2)
+    assert reporter.get_spans()[-1] is root
+    assert len(reporter.get_spans()) == 3
+    assert not tracer.reporter._traces
+    assert tracer.reporter._span_count == 0
+    assert metrics.count("sfx:tail_sampling_traces", "evicted") == 0
+
+
+def test_older_traces_are_evicted_for_an_oversized_trace(reporter, metrics):
+    tracer = tracer_for(reporter, metrics, max_spans=2)
+    older = tracer.start_span("older")
+    tracer.start_span("child", child_of=older).finish()
+    finish_trace(tracer, error=True, children=2)
+    assert len(reporter.get_spans()) == 3
+    assert metrics.count("sfx:tail_sampling_spans", "evicted") == 1
+
+
+def test_close_decides_pending_traces(reporter, metrics):
+    tracer = tracer_for(reporter, metrics)
+    for error in (True, False):
+        root = tracer.start_span("root")
+        child = tracer.start_span("child", child_of=root)
+        child.set_tag(tags.ERROR, error)
+        child.finish()
+    tracer.reporter.close()
+    assert len(reporter.get_spans()) == 1
+    assert tracer.reporter._traces == {}
+
+
+def test_from_settings(reporter):
+    env = settings.Settings(
+        dict(
+            SIGNALFX_TAIL_SAMPLING_LATENCY_MS="250",
+            SIGNALFX_TAIL_SAMPLING_PROBABILITY="0.5",
+            SIGNALFX_TAIL_SAMPLING_MAX_TRACES="10",
+            SIGNALFX_TAIL_SAMPLING_MAX_SPANS="100",
+        )
+    )
+    tail = TailSamplingReporter.from_settings(reporter, env=env)
+    assert tail.reporter is reporter
+    assert tail.latency_threshold == 0.25
+    assert tail.probability == 0.5
+    assert tail.max_traces == 10
+    assert tail.max_spans == 100
+    assert tail.metrics is None
@@ -0,0 +1,103 @@
+# Copyright (C) 2020 SignalFx. All rights reserved.
+import pytest
+
+from signalfx_tracing import settings, url_normalizer
+from signalfx_tracing.url_normalizer import URLNormalizer, parse_rules
+
+
+uuid = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+
+
+@pytest.fixture
+def normalization_enabled():
+    settings.reload(
+        dict(SIGNALFX_URL_NORMALIZATION="true", SIGNALFX_URL_NORMALIZATION_RULES=r"/v\d+/=/{version}/")
+    )
+    yield
+    settings.reload()
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    (
+        ("/", "/"),
+        ("/users", "/users"),
+        ("/users/123", "/users/{id}"),
+        ("/users/123/", "/users/{id}/"),
+        ("/users/123/orders/456", "/users/{id}/orders/{id}"),
+        ("/orders/" + uuid, "/orders/{uuid}"),
+        ("/orders/" + uuid.upper() + "/items", "/orders/{uuid}/items"),
+        ("/users/123abc", "/users/123abc"),
+        ("/users/v2", "/users/v2"),
+        ("/orders/" + uuid + "0", "/orders/" + uuid + "0"),
+    ),
+)
+def test_collapses_id_segments(path, expected):
+    assert URLNormalizer().normalize(path) == expected
+
+
+def test_rules_apply_before_collapsing():
+    rules = parse_rules(r"/users/[^/]+@[^/]+=/users/{email}; ^/api/v\d+=/api/{version}")
+    normalizer = URLNormalizer(rules)
+    assert normalizer.normalize("/api/v2/users/me@example.com/1") == "/api/{version}/users/{email}/{id}"
+    assert URLNormalizer(rules, collapse_ids=False).normalize("/api/v2/1") == "/api/{version}/1"
+
+
+def test_parse_rules_splits_at_last_equals_and_ignores_invalid():
+    rules = parse_rules(r"(?=/x)/x=/y;;missing;[=bad;/a=/b")
+    assert [(pattern.pattern, replacement) for pattern, replacement in rules] == [
+        ("(?=/x)/x", "/y"),
+        ("/a", "/b"),
+    ]
+
+
+def test_cache_is_bounded_lru():
+    normalizer = URLNormalizer(cache_size=2)
+    normalizer.normalize("/a/1")
+    normalizer.normalize("/b/2")
+    normalizer.normalize("/a/1")
+    normalizer.normalize("/c/3")
+    assert list(normalizer._cache) == ["/a/1", "/c/3"]
+
+    uncached = URLNormalizer(cache_size=0)
+    assert uncached.normalize("/a/1") == "/a/{id}"
+    assert not uncached._cache
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    (
+        ("http://example.com/users/123", "http://example.com/users/{id}"),
+        ("https://example.com:8080/users/123?id=456", "https://example.com:8080/users/{id}?id=456"),
+        ("http://example.com", "http://example.com"),
+        ("/users/123?q=1", "/users/{id}?q=1"),
+        ("", ""),
+    ),
+)
+def test_normalize_url(url, expected):
+    assert URLNormalizer().normalize_url(url) == expected
+
+
+def test_disabled_by_default():
+    settings.reload({})
+    try:
+        assert url_normalizer.get() is None
+        assert url_normalizer.normalize_path("/users/123") == "/users/123"
+        assert url_normalizer.normalize_url("http://host/users/123") == "http://host/users/123"
+    finally:
+        settings.reload()
+
+
+def test_configured_by_settings(normalization_enabled):
+    normalizer = url_normalizer.get()
+    assert url_normalizer.get() is normalizer
+    assert normalizer.cache_size == 1024
+    assert url_normalizer.normalize_path("/v1/users/123") == "/{version}/users/{id}"
+    assert url_normalizer.normalize_url("http://host/v1/users/123") == "http://host/{version}/users/{id}"
+    assert url_normalizer.normalize_attribute("path", "/users/123") == "/users/{id}"
+    assert url_normalizer.normalize_attribute("method", "/users/123") == "/users/123"
+
+    settings.reload(dict(SIGNALFX_URL_NORMALIZATION="true", SIGNALFX_URL_NORMALIZATION_CACHE_SIZE="10"))
+    assert url_normalizer.get() is not normalizer
+    assert url_normalizer.get().cache_size == 10
+    assert url_normalizer.get().rules == ()
@@ -1,12 +1,14 @@
 # Copyright (C) 2018 SignalFx. All rights reserved.
+import traceback
 import sys
 
 from opentracing.mocktracer import MockTracer
+from opentracing.scope_managers import ThreadLocalScopeManager
 from wrapt import wrap_function_wrapper
 import opentracing
 import pytest
 
-from signalfx_tracing import utils, constants
+from signalfx_tracing import utils, constants, settings, tags
 
 
 def test_get_module_imports_unimported_modules():
@@ -111,3 +113,198 @@ def test_tracer_proxy():
     proxy.set_tracer(mock)
     assert proxy == mock
     assert proxy.start_active_span == mock.start_active_span
+    assert not proxy.set_scope_manager(ThreadLocalScopeManager)  # Without create_fork_safe_tracer()'s factory
+    assert proxy == mock
+
+
+def _raise_nested(depth):
+    if depth:
+        _raise_nested(depth - 1)
+    raise ValueError("nested")
+
+
+def _nested_exc_info(depth=5):
+    try:
+        _raise_nested(depth)
+    except ValueError:
+        return sys.exc_info()
+
+
+@pytest.fixture
+def error_stack_max_frames():
+    def configure(value):
+        settings.reload(dict(SIGNALFX_ERROR_STACK_MAX_FRAMES=str(value)))
+
+    yield configure
+    settings.reload()
+
+
+def test_format_error_stack_matches_format_tb():
+    exc_type, _, exc_tb = _nested_exc_info()
+    assert utils.format_error_stack(exc_type, exc_tb) == traceback.format_tb(exc_tb)
+    assert utils.format_error_stack(exc_type, None) == []
+
+
+def test_format_error_stack_keeps_innermost_frames(error_stack_max_frames):
+    error_stack_max_frames(2)
+    exc_type, _, exc_tb = _nested_exc_info()
+    innermost = [exc_tb]
+    while innermost[-1].tb_next is not None:
+        innermost.append(innermost[-1].tb_next)
+    expected = traceback.format_tb(innermost[-2])
+    assert utils.format_error_stack(exc_type, exc_tb) == expected
+
+
+def test_format_error_stack_caches_identical_stacks():
+    utils._stack_cache.clear()
+    first = utils.format_error_stack(*_nested_exc_info()[::2])
+    second = utils.format_error_stack(*_nested_exc_info()[::2])
+    assert first == second
+    assert first is not second
+    assert len(utils._stack_cache) == 1
+
+    utils.format_error_stack(*_nested_exc_info(depth=2)[::2])
+    assert len(utils._stack_cache) == 2
+
+
+def test_format_error_stack_cache_is_bounded(monkeypatch):
+    utils._stack_cache.clear()
+    monkeypatch.setattr(utils, "_stack_cache_size", 2)
+    for depth in range(4):
+        utils.format_error_stack(*_nested_exc_info(depth)[::2])
+    assert len(utils._stack_cache) == 2
+
+
+class _SampledSpan(opentracing.Span):
+    def __init__(self, sampled):
+        super(_SampledSpan, self).__init__(None, None)
+        self.sampled = sampled
+        self.tags = {}
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+
+    def is_sampled(self):
+        return self.sampled
+
+
+def test_hex_ids_are_stored_on_context():
+    span = MockTracer().start_span("span")
+    trace_id, span_id = utils.hex_ids(span.context)
+    assert trace_id == utils.padded_hex(span.context.trace_id)
+    assert span_id == utils.padded_hex(span.context.span_id)
+    assert utils.hex_ids(span.context) is utils.hex_ids(span.context)
+
+
+def test_hex_ids_of_slotted_context():
+    class SlottedContext(object):
+        __slots__ = ("trace_id", "span_id")
+
+        def __init__(self):
+            self.trace_id = 1
+            self.span_id = 255
+
+    assert utils.hex_ids(SlottedContext()) == ("0000000000000001", "00000000000000ff")
+
+
+def test_server_timing_headers():
+    span = MockTracer().start_span("span")
+    assert utils.server_timing_headers(span) == (
+        ("Access-Control-Expose-Headers", "Server-Timing"),
+        (
+            "Server-Timing",
+            'traceparent;desc="00-{}-{}-01"'.format(
+                utils.padded_hex(span.context.trace_id), utils.padded_hex(span.context.span_id)
+            ),
+        ),
+    )
+    assert utils.server_timing_headers(opentracing.Tracer().start_span("noop")) == ()
+
+
+def test_extract_span_context_with_unknown_headers():
+    tracer = MockTracer()
+    parent = tracer.start_span("parent")
+    headers = {}
+    tracer.inject(parent.context, opentracing.Format.HTTP_HEADERS, headers)
+
+    context = utils.extract_span_context(tracer, headers.get, lambda: headers)
+    assert (context.trace_id, context.span_id) == (parent.context.trace_id, parent.context.span_id)
+    assert utils.extract_span_context(tracer, {}.get, lambda: {"ot-tracer-traceid": "a"}) is None
+
+
+class _Request(object):
+    path = "/users/123"
+    empty = ""
+
+
+def test_start_request_scope():
+    tracer = MockTracer()
+    parent = tracer.start_span("parent")
+    headers = {}
+    tracer.inject(parent.context, opentracing.Format.HTTP_HEADERS, headers)
+    started = []
+
+    settings.reload(dict(SIGNALFX_URL_NORMALIZATION="true"))
+    try:
+        scope = utils.start_request_scope(
+            tracer,
+            _Request(),
+            "handler",
+            headers.get,
+            lambda: headers,
+            component="framework",
+            method="GET",
+            url="/users/123?q=1",
+            path="/users/123",
+            attributes=["path", "empty", "missing"],
+            start_span_cb=lambda span, request: started.append(span),
+        )
+    finally:
+        settings.reload()
+    scope.close()
+
+    span = tracer.finished_spans()[0]
+    assert tracer.active_span is None
+    assert started == [span]
+    assert span.parent_id == parent.context.span_id
+    assert span.tags == {
+        "component": "framework",
+        "span.kind": "server",
+        "http.method": "GET",
+        "http.url": "/users/{id}?q=1",
+        "path": "/users/{id}",
+    }
+
+
+def test_is_sampled():
+    assert utils.is_sampled(_SampledSpan(True)) is True
+    assert utils.is_sampled(_SampledSpan(False)) is False
+    assert utils.is_sampled(MockTracer().start_span("no sampling decision")) is True
+    assert utils.is_sampled(None) is False
+
+
+def test_is_active_span_sampled():
+    tracer = MockTracer()
+    assert utils.is_active_span_sampled(tracer) is False
+    with tracer.start_active_span("sampled"):
+        assert utils.is_active_span_sampled(tracer) is True
+    with tracer.scope_manager.activate(_SampledSpan(False), finish_on_close=False):
+        assert utils.is_active_span_sampled(tracer) is False
+
+
+def test_sampled_span_error_has_tags():
+    span = _SampledSpan(True)
+    with pytest.raises(ValueError):
+        with span:
+            _raise_nested(1)
+    assert span.tags[tags.ERROR] is True
+    assert span.tags[tags.ERROR_KIND] == "ValueError"
+    assert tags.ERROR_STACK in span.tags
+
+
+def test_unsampled_span_error_has_no_tags():
+    span = _SampledSpan(False)
+    with pytest.raises(ValueError):
+        with span:
+            _raise_nested(1)
+    assert span.tags == {}